@@ -1,15 +1,49 @@
 import logging
-from typing import Dict, List, Optional, Union
-
-from sqlalchemy import delete, func, or_, text
+import os
+import uuid
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from sqlalchemy import (
+    JSON,
+    Column,
+    Connection,
+    Enum,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    Text,
+    bindparam,
+    delete,
+    func,
+    insert,
+    inspect,
+    or_,
+    select,
+    text,
+    type_coerce,
+    update,
+)
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session, query
-from sqlalchemy.sql.expression import Delete
-
-from chanjo2.models import SQLExon, SQLGene, SQLTranscript
-from chanjo2.models.pydantic_models import Builds, TranscriptBase, TranscriptTag
+from sqlalchemy.sql.compiler import Compiled
+from sqlalchemy.sql.expression import ColumnElement, Delete, Select
+
+from chanjo2.models import (
+    SQLExon,
+    SQLGene,
+    SQLGeneEnsemblId,
+    SQLIntervalsVersion,
+    SQLTranscript,
+)
+from chanjo2.models.pydantic_models import Builds, TranscriptTag
 
 LOG = logging.getLogger(__name__)
 
+IN_QUERY_CHUNK_SIZE = int(os.getenv("IN_QUERY_CHUNK_SIZE", 2000))
+STAGING_METADATA = MetaData()
+STAGING_LOAD_ID_COLUMN = "load_id"
+
 
 def delete_intervals_for_build(
     db: Session, interval_type: Union[SQLGene, SQLTranscript, SQLExon], build: Builds
@@ -26,6 +60,25 @@ def count_intervals_for_build(
     return db.query(interval_type).where(interval_type.build == build).count()
 
 
+def get_intervals_version(db: Session, build: Builds) -> int:
+    """Return the number of changes made to the intervals of a genome build, as saved in the database."""
+    version: Optional[int] = db.execute(
+        select(SQLIntervalsVersion.version).where(SQLIntervalsVersion.build == build)
+    ).scalar_one_or_none()
+    return version or 0
+
+
+def increment_intervals_version(db: Session, build: Builds) -> None:
+    """Count a change to the intervals of a genome build. Not committed, so that it's saved in the transaction of the change."""
+    result = db.execute(
+        update(SQLIntervalsVersion)
+        .where(SQLIntervalsVersion.build == build)
+        .values(version=SQLIntervalsVersion.version + 1)
+    )
+    if result.rowcount == 0:
+        db.execute(insert(SQLIntervalsVersion).values(build=build, version=1))
+
+
 def _filter_intervals_by_build(
     intervals: query.Query,
     interval_type: Union[SQLGene, SQLTranscript, SQLExon],
@@ -35,12 +88,316 @@ def _filter_intervals_by_build(
     return intervals.filter(interval_type.build == build)
 
 
-def bulk_insert_genes(db: Session, genes: List[SQLGene]):
-    """Bulk insert genes into the database."""
-    db.bulk_save_objects(genes)
+def get_staging_table(
+    db: Session, interval_type: Union[SQLGene, SQLTranscript, SQLExon]
+) -> Table:
+    """Return the staging table where intervals of a given type are loaded before replacing those of the interval table.
+    Staging tables have the columns of the interval table, an own primary key and the ID of the load that staged each row, so that loads running at the same time never mix their rows.
+    They are created the first time they are used, and created again if they were created without load IDs.
+    """
+    table: Table = interval_type.__table__
+    staging_name: str = f"{table.name}_staging"
+    if staging_name not in STAGING_METADATA.tables:
+        Table(
+            staging_name,
+            STAGING_METADATA,
+            Column("id", Integer, primary_key=True, autoincrement=True),
+            Column(STAGING_LOAD_ID_COLUMN, String(32), nullable=False, index=True),
+            *[
+                Column(column.name, column.type)
+                for column in table.columns
+                if column.primary_key is False
+            ],
+        )
+    staging_table: Table = STAGING_METADATA.tables[staging_name]
+    connection: Connection = db.connection()
+    staging_inspector = inspect(connection)
+    if staging_inspector.has_table(staging_name) and STAGING_LOAD_ID_COLUMN not in {
+        column["name"] for column in staging_inspector.get_columns(staging_name)
+    }:
+        staging_table.drop(bind=connection)
+    staging_table.create(bind=connection, checkfirst=True)
+    return staging_table
+
+
+def new_staging_load_id() -> str:
+    """Return a new ID identifying the rows staged by one load of intervals."""
+    return uuid.uuid4().hex
+
+
+def delete_staged_intervals(db: Session, staging_table: Table, load_id: str) -> None:
+    """Delete the intervals staged by a load from a staging table."""
+    db.execute(
+        delete(staging_table).where(staging_table.c[STAGING_LOAD_ID_COLUMN] == load_id)
+    )
     db.commit()
 
 
+def count_staged_intervals(db: Session, staging_table: Table, load_id: str) -> int:
+    """Count the intervals staged by a load in a staging table."""
+    return db.execute(
+        select(func.count())
+        .select_from(staging_table)
+        .where(staging_table.c[STAGING_LOAD_ID_COLUMN] == load_id)
+    ).scalar()
+
+
+def replace_intervals_for_build(
+    db: Session,
+    interval_type: Union[SQLGene, SQLTranscript, SQLExon],
+    staging_table: Table,
+    columns: Tuple[str, ...],
+    build: Builds,
+    load_id: str,
+    batch_size: int,
+) -> None:
+    """Replace the intervals of a genome build with those staged by a load, in the transaction of the session.
+    Intervals are deleted by ID in chunks and staged ones are copied in ranges of batch_size staging IDs, so that no single statement locks or copies a whole build.
+    Changes are visible to other sessions when the caller commits them.
+    """
+    table: Table = interval_type.__table__
+    delete_intervals_by_id(
+        db=db,
+        interval_type=interval_type,
+        interval_ids=list(
+            db.execute(select(table.c.id).where(table.c.build == build)).scalars()
+        ),
+    )
+
+    load_filter: ColumnElement = staging_table.c[STAGING_LOAD_ID_COLUMN] == load_id
+    first_id, last_id = db.execute(
+        select(func.min(staging_table.c.id), func.max(staging_table.c.id)).where(
+            load_filter
+        )
+    ).one()
+    if first_id is None:
+        return
+    for batch_start in range(first_id, last_id + 1, batch_size):
+        db.execute(
+            insert(table).from_select(
+                columns,
+                select(*[staging_table.c[column] for column in columns])
+                .where(load_filter)
+                .where(staging_table.c.id >= batch_start)
+                .where(staging_table.c.id < batch_start + batch_size),
+            )
+        )
+    db.execute(delete(staging_table).where(load_filter))
+
+
+def get_build_interval_rows(
+    db: Session,
+    interval_type: Union[SQLGene, SQLTranscript, SQLExon],
+    columns: Tuple[str, ...],
+    build: Builds,
+) -> Iterator[Tuple[int, tuple]]:
+    """Return the ID and the database values of the given columns of all intervals of a genome build.
+    Genome builds and JSON values are returned as stored, as text, without converting them to Python objects.
+    """
+    table: Table = interval_type.__table__
+    for row in db.execute(
+        select(
+            table.c.id,
+            *[
+                (
+                    type_coerce(table.c[column], Text)
+                    if isinstance(table.c[column].type, (Enum, JSON))
+                    else table.c[column]
+                )
+                for column in columns
+            ],
+        ).where(table.c.build == build)
+    ):
+        yield row[0], tuple(row[1:])
+
+
+def update_intervals_by_id(
+    db: Session,
+    interval_type: Union[SQLGene, SQLTranscript, SQLExon],
+    columns: Tuple[str, ...],
+    id_rows: List[Tuple[int, tuple]],
+) -> None:
+    """Update the values of the given columns of intervals by ID, with one executemany statement and without committing."""
+    table: Table = interval_type.__table__
+    db.execute(
+        update(table)
+        .where(table.c.id == bindparam("interval_id"))
+        .values({column: bindparam(f"new_{column}") for column in columns}),
+        [
+            {
+                "interval_id": interval_id,
+                **{f"new_{column}": value for column, value in zip(columns, row)},
+            }
+            for interval_id, row in id_rows
+        ],
+    )
+
+
+def delete_intervals_by_id(
+    db: Session,
+    interval_type: Union[SQLGene, SQLTranscript, SQLExon],
+    interval_ids: List[int],
+) -> None:
+    """Delete intervals by ID, in chunks of IN_QUERY_CHUNK_SIZE IDs and without committing."""
+    chunk_size: int = (
+        IN_QUERY_CHUNK_SIZE if IN_QUERY_CHUNK_SIZE > 0 else len(interval_ids) or 1
+    )
+    for chunk_start in range(0, len(interval_ids), chunk_size):
+        db.execute(
+            delete(interval_type.__table__).where(
+                interval_type.id.in_(
+                    interval_ids[chunk_start : chunk_start + chunk_size]
+                )
+            )
+        )
+
+
+def bulk_insert_intervals(
+    db: Session,
+    table: Table,
+    columns: Tuple[str, ...],
+    rows: List[tuple],
+) -> None:
+    """Bulk insert rows of database values of the given columns into an interval or staging table, without committing.
+    The Core insert statement is compiled once and its rows are passed as plain tuples to the executemany of the database driver.
+    """
+    connection: Connection = db.connection()
+    statement: Compiled = (
+        insert(table)
+        .values({column: bindparam(column) for column in columns})
+        .compile(dialect=connection.dialect)
+    )
+    # Values are bound in the order of the table columns
+    positions: List[int] = [columns.index(name) for name in statement.positiontup]
+    if positions != list(range(len(columns))):
+        rows = [tuple(row[position] for position in positions) for row in rows]
+    connection.exec_driver_sql(str(statement), rows)
+
+
+def load_intervals_data_infile(
+    db: Session,
+    table: Table,
+    columns: Tuple[str, ...],
+    file_path: str,
+) -> None:
+    """Load a tab-separated file with the values of the given columns into an interval or staging table, with a MySQL LOAD DATA LOCAL INFILE statement."""
+    db.execute(
+        text(
+            f"LOAD DATA LOCAL INFILE :file_path INTO TABLE {table.name} "
+            f"FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' ({', '.join(columns)})"
+        ),
+        {"file_path": file_path},
+    )
+    db.commit()
+
+
+def insert_gene_ensembl_ids(db: Session, build: Builds) -> None:
+    """Associate each Ensembl ID of the genes of a genome build to its gene, in the gene Ensembl IDs table, without committing."""
+    gene_ensembl_ids: List[dict] = [
+        {"gene_id": gene_id, "ensembl_id": ensembl_id, "build": build}
+        for gene_id, ensembl_ids in db.query(SQLGene.id, SQLGene.ensembl_ids).filter(
+            SQLGene.build == build
+        )
+        for ensembl_id in ensembl_ids
+    ]
+    if gene_ensembl_ids:
+        db.execute(insert(SQLGeneEnsemblId), gene_ensembl_ids)
+
+
+def insert_missing_gene_ensembl_ids(db: Session) -> None:
+    """Fill the gene Ensembl IDs table for the genome builds whose genes were loaded before the table existed.
+    Builds filled meanwhile by another app worker starting at the same time are skipped.
+    """
+    for build in Builds:
+        if count_intervals_for_build(
+            db=db, interval_type=SQLGeneEnsemblId, build=build
+        ) or not count_intervals_for_build(db=db, interval_type=SQLGene, build=build):
+            continue
+        LOG.warning(f"Indexing the Ensembl IDs of the genes in build {build.value}")
+        try:
+            insert_gene_ensembl_ids(db=db, build=build)
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            LOG.warning(
+                f"Ensembl IDs of the genes in build {build.value} were indexed by another app worker"
+            )
+
+
+def _get_all_in_chunks(
+    intervals: query.Query,
+    values_filter: Callable[[List], ColumnElement],
+    values: List,
+    limit: Optional[int],
+) -> list:
+    """Return the results of a query filtered by a list of values.
+
+    Lists longer than IN_QUERY_CHUNK_SIZE are split into chunks and the query is run once for each chunk,
+    so that very large gene panels do not produce SQL statements too long to compile or send to the database.
+    """
+    values: list = list(dict.fromkeys(values))
+    if IN_QUERY_CHUNK_SIZE <= 0 or len(values) <= IN_QUERY_CHUNK_SIZE:
+        intervals = intervals.filter(values_filter(values))
+        if limit:
+            return intervals.limit(limit).all()
+        return intervals.all()
+
+    results: dict = {}
+    for chunk_start in range(0, len(values), IN_QUERY_CHUNK_SIZE):
+        chunk_query: query.Query = intervals.filter(
+            values_filter(values[chunk_start : chunk_start + IN_QUERY_CHUNK_SIZE])
+        )
+        if limit:
+            chunk_query = chunk_query.limit(limit - len(results))
+        # Rows matched by values of different chunks are the same objects of the session and are returned once
+        for row in chunk_query:
+            results[id(row)] = row
+        if limit and len(results) >= limit:
+            break
+    return list(results.values())
+
+
+def _get_all_in_chunks_of_both(
+    intervals: query.Query,
+    first_values_filter: Callable[[List], ColumnElement],
+    first_values: List,
+    second_values_filter: Callable[[List], ColumnElement],
+    second_values: List,
+    limit: Optional[int],
+) -> list:
+    """Return the results of a query filtered by two lists of values, each of them split into chunks of at most IN_QUERY_CHUNK_SIZE values."""
+    first_values: list = list(dict.fromkeys(first_values))
+    chunk_size: int = (
+        IN_QUERY_CHUNK_SIZE if IN_QUERY_CHUNK_SIZE > 0 else len(first_values) or 1
+    )
+    results: dict = {}
+    for chunk_start in range(0, len(first_values), chunk_size):
+        for row in _get_all_in_chunks(
+            intervals=intervals.filter(
+                first_values_filter(
+                    first_values[chunk_start : chunk_start + chunk_size]
+                )
+            ),
+            values_filter=second_values_filter,
+            values=second_values,
+            limit=limit - len(results) if limit else None,
+        ):
+            results[id(row)] = row
+        if limit and len(results) >= limit:
+            break
+    return list(results.values())
+
+
+def _select_genes_ensembl_ids(build: Builds, gene_filter: ColumnElement) -> Select:
+    """Return a query selecting the Ensembl IDs of the genes of a genome build matching a filter, from the gene Ensembl IDs table."""
+    return (
+        select(SQLGeneEnsemblId.ensembl_id)
+        .join(SQLGene, SQLGene.id == SQLGeneEnsemblId.gene_id)
+        .where(SQLGeneEnsemblId.build == build)
+        .where(gene_filter)
+    )
+
+
 def get_genes(
     db: Session,
     build: Builds,
@@ -50,39 +407,40 @@ def get_genes(
     limit: Optional[int],
 ) -> List[SQLGene]:
     """Return genes according to specified fields."""
-    genes: query.Query = db.query(SQLGene)
+    genes: query.Query = _filter_intervals_by_build(
+        intervals=db.query(SQLGene), interval_type=SQLGene, build=build
+    )
     if ensembl_ids:
-        ensembl_ids_placeholder = ", ".join(f"'{e}'" for e in ensembl_ids)
-        genes = genes.filter(
-            text(
-                f"""
-                EXISTS (
-                    SELECT 1
-                    FROM json_each(genes.ensembl_ids)
-                    WHERE value IN ({ensembl_ids_placeholder})
-                )
-                """
-            )
+        return _get_all_in_chunks(
+            intervals=genes,
+            values_filter=lambda chunk: SQLGene.id.in_(
+                select(SQLGeneEnsemblId.gene_id)
+                .where(SQLGeneEnsemblId.ensembl_id.in_(chunk))
+                .where(SQLGeneEnsemblId.build == build)
+            ),
+            values=ensembl_ids,
+            limit=limit,
+        )
+    if hgnc_ids:
+        return _get_all_in_chunks(
+            intervals=genes,
+            values_filter=SQLGene.hgnc_id.in_,
+            values=hgnc_ids,
+            limit=limit,
+        )
+    if hgnc_symbols:
+        return _get_all_in_chunks(
+            intervals=genes,
+            values_filter=SQLGene.hgnc_symbol.in_,
+            values=hgnc_symbols,
+            limit=limit,
         )
-    elif hgnc_ids:
-        genes: query.Query = genes.filter(SQLGene.hgnc_id.in_(hgnc_ids))
-    elif hgnc_symbols:
-        genes: query.Query = genes.filter(SQLGene.hgnc_symbol.in_(hgnc_symbols))
 
-    genes: query.Query = _filter_intervals_by_build(
-        intervals=genes, interval_type=SQLGene, build=build
-    )
     if limit:
         return genes.limit(limit).all()
     return genes.all()
 
 
-def bulk_insert_transcripts(db: Session, transcripts: List[TranscriptBase]):
-    """Bulk insert transcripts into the database."""
-    db.bulk_save_objects(transcripts)
-    db.commit()
-
-
 def get_hgnc_gene(db: Session, build: Builds, hgnc_id: int) -> SQLGene:
     """Return a gene object by its HGNC ID."""
     gene_query: query.Query = (
@@ -145,35 +503,56 @@ def get_gene_intervals(
 
     intervals = db.query(interval_type).filter(interval_type.build == build)
 
-    def get_ensembl_gene_ids_from_gene_filter(
-        filter_value: List[Union[str, int]], filter_column: str
-    ) -> List[str]:
-        """Helper function to get ensembl_gene_ids from either hgnc_ids or hgnc_symbols."""
-        genes = (
-            db.query(SQLGene.ensembl_ids).filter(filter_column.in_(filter_value)).all()
+    if interval_type == SQLTranscript and transcript_tags:
+        intervals = _filter_transcripts_by_tag(
+            transcripts=intervals, transcript_tags=transcript_tags
         )
-        return [ensembl_id for gene in genes for ensembl_id in gene.ensembl_ids]
 
+    values_filter: Optional[Callable[[List], ColumnElement]] = None
+    values: List = []
     if ensembl_ids:
-        intervals: query.Query = intervals.filter(
-            interval_type.ensembl_id.in_(ensembl_ids)
-        )
+        values_filter, values = interval_type.ensembl_id.in_, ensembl_ids
     elif hgnc_ids:
-        ensembl_gene_ids = get_ensembl_gene_ids_from_gene_filter(
-            hgnc_ids, SQLGene.hgnc_id
+        values_filter, values = (
+            lambda chunk: interval_type.ensembl_gene_id.in_(
+                _select_genes_ensembl_ids(
+                    build=build, gene_filter=SQLGene.hgnc_id.in_(chunk)
+                )
+            ),
+            hgnc_ids,
         )
     elif hgnc_symbols:
-        ensembl_gene_ids = get_ensembl_gene_ids_from_gene_filter(
-            hgnc_symbols, SQLGene.hgnc_symbol
+        values_filter, values = (
+            lambda chunk: interval_type.ensembl_gene_id.in_(
+                _select_genes_ensembl_ids(
+                    build=build, gene_filter=SQLGene.hgnc_symbol.in_(chunk)
+                )
+            ),
+            hgnc_symbols,
+        )
+
+    if ensembl_gene_ids and values:
+        return _get_all_in_chunks_of_both(
+            intervals=intervals,
+            first_values_filter=interval_type.ensembl_gene_id.in_,
+            first_values=ensembl_gene_ids,
+            second_values_filter=values_filter,
+            second_values=values,
+            limit=limit,
         )
     if ensembl_gene_ids:
-        intervals = intervals.filter(
-            interval_type.ensembl_gene_id.in_(ensembl_gene_ids)
+        return _get_all_in_chunks(
+            intervals=intervals,
+            values_filter=interval_type.ensembl_gene_id.in_,
+            values=ensembl_gene_ids,
+            limit=limit,
         )
-
-    if interval_type == SQLTranscript and transcript_tags:
-        intervals = _filter_transcripts_by_tag(
-            transcripts=intervals, transcript_tags=transcript_tags
+    if values:
+        return _get_all_in_chunks(
+            intervals=intervals,
+            values_filter=values_filter,
+            values=values,
+            limit=limit,
         )
 
     if limit:
@@ -182,12 +561,6 @@ def get_gene_intervals(
     return intervals.all()
 
 
-def bulk_insert_exons(db: Session, exons: List[SQLExon]) -> None:
-    """Bulk insert exons into the database."""
-    db.bulk_save_objects(exons)
-    db.commit()
-
-
 def get_interval_counts(db: Session) -> Dict:
     counts = {}
     for build in Builds.get_enum_values():
@@ -203,3 +576,26 @@ def get_interval_counts(db: Session) -> Dict:
             .scalar(),
         }
     return counts
+
+
+def get_build_interval_ids_coords(
+    db: Session, interval_type: Union[SQLGene, SQLTranscript, SQLExon], build: Builds
+) -> List[Tuple[str, Tuple[str, int, int]]]:
+    """Return the Ensembl IDs and coordinates of all intervals of a given type and genome build."""
+    if interval_type == SQLGene:
+        return [
+            (ensembl_id, (chromosome, start, stop))
+            for ensembl_ids, chromosome, start, stop in db.query(
+                SQLGene.ensembl_ids, SQLGene.chromosome, SQLGene.start, SQLGene.stop
+            ).filter(SQLGene.build == build)
+            for ensembl_id in ensembl_ids
+        ]
+    return [
+        (ensembl_id, (chromosome, start, stop))
+        for ensembl_id, chromosome, start, stop in db.query(
+            interval_type.ensembl_id,
+            interval_type.chromosome,
+            interval_type.start,
+            interval_type.stop,
+        ).filter(interval_type.build == build)
+    ]
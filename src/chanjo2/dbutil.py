@@ -30,7 +30,18 @@ else:
         host = ":".join([host_name, port_no])
 
     mysql_url = f"mysql://{db_user}:{db_password}@{host}/{db_name}"
-    engine = create_engine(mysql_url, echo=True, future=True, pool_pre_ping=True)
+    engine = create_engine(
+        mysql_url,
+        echo=True,
+        future=True,
+        pool_pre_ping=True,
+        # Allow loading intervals from local files with LOAD DATA LOCAL INFILE
+        connect_args=(
+            {"local_infile": True}
+            if os.getenv("INTERVALS_LOAD_DATA_INFILE", "false").lower() == "true"
+            else {}
+        ),
+    )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, future=True)
 Base = declarative_base()
@@ -42,3 +53,8 @@ def get_session():
         yield db
     finally:
         db.close()
+
+
+def get_session_factory() -> sessionmaker:
+    """Return the factory of the sessions used by tasks that outlive the request starting them."""
+    return SessionLocal
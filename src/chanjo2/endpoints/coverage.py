@@ -4,7 +4,8 @@ import time
 from os.path import isfile
 from typing import Dict, List, Tuple
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Response, status
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 
 from chanjo2.auth import get_token
@@ -12,29 +13,38 @@ from chanjo2.constants import WRONG_BED_FILE_MSG, WRONG_COVERAGE_FILE_MSG
 from chanjo2.crud.intervals import get_genes, set_sql_intervals
 from chanjo2.dbutil import get_session
 from chanjo2.meta.handle_bed import (
+    RegionSet,
     bed_file_interval_id_coords,
     sort_interval_ids_coords,
 )
-from chanjo2.meta.handle_completeness_stats import get_completeness_stats
-from chanjo2.meta.handle_coverage_stats import (
+from chanjo2.meta.handle_coverage_backend import (
+    get_chromosomes_mean,
     get_chromosomes_prefix,
-    get_d4tools_chromosome_mean_coverage,
-    get_d4tools_intervals_mean_coverage,
 )
 from chanjo2.meta.handle_d4 import (
-    get_chromosomes_prefix,
     get_samples_sex_metrics,
-    set_interval_ids_coords,
+    get_sql_intervals_region_set,
+)
+from chanjo2.meta.handle_d4tools_scheduler import D4TOOLS_SCHEDULER
+from chanjo2.meta.handle_interval_stats import (
+    get_interval_completeness,
+    get_intervals_stats,
+)
+from chanjo2.meta.handle_report_contents import (
+    INTERVAL_TYPE_SQL_TYPE,
+    get_genes_coverage_matrix,
 )
-from chanjo2.meta.handle_report_contents import INTERVAL_TYPE_SQL_TYPE
+from chanjo2.meta.handle_summary_index import build_summary_index
 from chanjo2.meta.utils import get_mean
 from chanjo2.models import SQLGene
 from chanjo2.models.pydantic_models import (
+    Builds,
     CoverageSummaryQuery,
     FileCoverageIntervalsFileQuery,
     FileCoverageQuery,
     IntervalCoverage,
     IntervalType,
+    ReportQuery,
     TranscriptTag,
     is_valid_url,
 )
@@ -56,7 +66,7 @@ def d4_interval_coverage(
 
     if None in [query.start, query.end]:  # Coverage over an entire chromosome
         return IntervalCoverage(
-            mean_coverage=get_d4tools_chromosome_mean_coverage(
+            mean_coverage=get_chromosomes_mean(
                 d4_file_path=query.coverage_file_path,
                 chromosomes=[chromosome],
             )[0][1],
@@ -64,29 +74,21 @@ def d4_interval_coverage(
             interval_id=chromosome,
         )
 
-    interval_ids_coords = [
-        (
-            f"{chromosome}:{query.start}-{query.end}",
-            (chromosome, query.start, query.end),
+    with RegionSet(
+        interval_ids_coords=[(chrom, (chrom, query.start, query.end))]
+    ) as region_set:
+        intervals_coverage, intervals_completeness = get_intervals_stats(
+            d4_file_path=query.coverage_file_path,
+            thresholds=query.completeness_thresholds,
+            region_set=region_set,
+            chrom_prefix=chrom_prefix,
         )
-    ]
-
-    mean_coverage: float = get_d4tools_intervals_mean_coverage(
-        d4_file_path=query.coverage_file_path,
-        interval_ids_coords=interval_ids_coords,
-        chrom_prefix=chrom_prefix,
-    )[0]
-
-    completeness_stats = get_completeness_stats(
-        d4_file_path=query.coverage_file_path,
-        interval_ids_coords=[(chrom, (chrom, query.start, query.end))],
-        thresholds=query.completeness_thresholds,
-        chrom_prefix=chrom_prefix,
-    )
 
     return IntervalCoverage(
-        mean_coverage=mean_coverage,
-        completeness=completeness_stats[chrom],
+        mean_coverage=intervals_coverage[0],
+        completeness=get_interval_completeness(
+            intervals_completeness=intervals_completeness, row=0
+        ),
         interval_id=f"{chromosome}:{query.start}-{query.end}",
     )
 
@@ -113,18 +115,13 @@ def d4_intervals_coverage(
     interval_ids_coords = sort_interval_ids_coords(interval_ids_coords)
 
     chrom_prefix: str = get_chromosomes_prefix(query.coverage_file_path)
-    intervals_coverage = get_d4tools_intervals_mean_coverage(
-        d4_file_path=query.coverage_file_path,
-        interval_ids_coords=interval_ids_coords,
-        chrom_prefix=chrom_prefix,
-    )
-
-    intervals_completeness: Dict[str, Dict[int, float]] = get_completeness_stats(
-        d4_file_path=query.coverage_file_path,
-        thresholds=query.completeness_thresholds,
-        interval_ids_coords=interval_ids_coords,
-        chrom_prefix=chrom_prefix,
-    )
+    with RegionSet(interval_ids_coords=interval_ids_coords) as region_set:
+        intervals_coverage, intervals_completeness = get_intervals_stats(
+            d4_file_path=query.coverage_file_path,
+            thresholds=query.completeness_thresholds,
+            region_set=region_set,
+            chrom_prefix=chrom_prefix,
+        )
 
     results: List[IntervalCoverage] = []
     for counter, interval_data in enumerate(interval_ids_coords):
@@ -133,7 +130,9 @@ def d4_intervals_coverage(
             "interval_type": IntervalType.CUSTOM,
             "interval_id": coords,
             "mean_coverage": intervals_coverage[counter],
-            "completeness": intervals_completeness[interval_data[0]],
+            "completeness": get_interval_completeness(
+                intervals_completeness=intervals_completeness, row=counter
+            ),
         }
         results.append(IntervalCoverage.model_validate(interval_coverage))
 
@@ -167,55 +166,64 @@ def d4_genes_condensed_summary(
         transcript_tags=[TranscriptTag.REFSEQ_MRNA],
     )
 
+    # Make sure paths to d4 files provided in the query exist
     for sample in query.samples:
-        # Make sure path to d4 files provided in the query exists
         if isfile(sample.coverage_file_path) is False:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=WRONG_COVERAGE_FILE_MSG,
             )
 
-        interval_ids_coords: List[Tuple[str, Tuple[str, int, int]]] = (
-            set_interval_ids_coords(sql_intervals=sql_intervals)
-        )
-
-        # Sort intervals by chrom, start & stop
-        interval_ids_coords = sort_interval_ids_coords(interval_ids_coords)
+    # Intervals are sorted by chrom, start & stop once and shared by all samples
+    with get_sql_intervals_region_set(sql_intervals=sql_intervals) as region_set:
+        for sample in query.samples:
+            chrom_prefix: str = get_chromosomes_prefix(sample.coverage_file_path)
+
+            # Compute mean coverage and coverage completeness over genomic intervals
+            genes_mean_coverage, genes_coverage_completeness = get_intervals_stats(
+                d4_file_path=sample.coverage_file_path,
+                thresholds=[query.coverage_threshold],
+                region_set=region_set,
+                chrom_prefix=chrom_prefix,
+            )
+            threshold_completeness = genes_coverage_completeness.get(
+                query.coverage_threshold, []
+            )
+            genes_coverage_completeness_values: List[float] = [
+                threshold_completeness[row] * 100
+                for row in region_set.interval_indexes.values()
+            ]
+
+            condensed_stats[sample.name] = {
+                "mean_coverage": get_mean(float_list=genes_mean_coverage),
+                "coverage_completeness_percent": (
+                    get_mean(genes_coverage_completeness_values)
+                    if genes_coverage_completeness_values
+                    else "NA"
+                ),
+            }
 
-        chrom_prefix: str = get_chromosomes_prefix(sample.coverage_file_path)
+    return condensed_stats
 
-        # Compute mean coverage over genomic intervals
-        genes_mean_coverage: List[float] = get_d4tools_intervals_mean_coverage(
-            d4_file_path=sample.coverage_file_path,
-            interval_ids_coords=interval_ids_coords,
-            chrom_prefix=chrom_prefix,
-        )
-        # Compute coverage completeness over genomic intervals
-        genes_coverage_completeness: Dict[str, dict] = get_completeness_stats(
-            d4_file_path=sample.coverage_file_path,
-            thresholds=[query.coverage_threshold],
-            interval_ids_coords=interval_ids_coords,
-            chrom_prefix=chrom_prefix,
-        )
-        genes_coverage_completeness_values: List[float] = [
-            value[query.coverage_threshold] * 100
-            for value in genes_coverage_completeness.values()
-        ]
-
-        condensed_stats[sample.name] = {
-            "mean_coverage": get_mean(float_list=genes_mean_coverage),
-            "coverage_completeness_percent": (
-                get_mean(genes_coverage_completeness_values)
-                if genes_coverage_completeness_values
-                else "NA"
-            ),
-        }
 
-    return condensed_stats
+@router.post("/coverage/d4/genes/matrix", response_model=Dict)
+def d4_genes_coverage_matrix(
+    query: ReportQuery,
+    db: Session = Depends(get_session),
+    token_data: Tuple[str, datetime.datetime] = Depends(get_token),
+):
+    """Return mean coverage and coverage completeness over a list of genes, or over their transcripts or exons, for a list of samples.
+    Stats are returned as JSON columns: one list for each sample, with one value for each interval ID.
+    """
+    return {
+        "build": query.build.value,
+        "interval_type": query.interval_type.value,
+        **get_genes_coverage_matrix(query=query, session=db).to_json(),
+    }
 
 
 @router.get("/coverage/samples/predicted_sex", response_model=Dict)
-async def get_samples_predicted_sex(
+def get_samples_predicted_sex(
     coverage_file_path: str,
     token_data: Tuple[str, datetime.datetime] = Depends(get_token),
 ):
@@ -232,3 +240,34 @@ async def get_samples_predicted_sex(
     return get_samples_sex_metrics(
         d4_file_path=coverage_file_path, chr_prefix=chr_prefix
     )
+
+
+@router.get("/coverage/d4tools/scheduler", response_model=Dict)
+def d4tools_scheduler_stats(
+    token_data: Tuple[str, datetime.datetime] = Depends(get_token),
+):
+    """Return the number of d4tools processes running and queued by this app worker, and how long they waited for a slot."""
+    return D4TOOLS_SCHEDULER.stats()
+
+
+@router.post("/coverage/d4/summary_index/{build}")
+def d4_summary_index(
+    background_tasks: BackgroundTasks,
+    build: Builds,
+    coverage_file_path: str,
+    db: Session = Depends(get_session),
+    token_data: Tuple[str, datetime.datetime] = Depends(get_token),
+) -> Response:
+    """Precompute the stats of all genes, transcripts and exons of a genome build over a D4 file located on the disk."""
+    if isfile(coverage_file_path) is False:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=WRONG_COVERAGE_FILE_MSG,
+        )
+
+    background_tasks.add_task(build_summary_index, db, build, coverage_file_path)
+    return JSONResponse(
+        content={
+            "detail": "Summary index will be built in background. Reports on this file will use it once it's ready."
+        }
+    )
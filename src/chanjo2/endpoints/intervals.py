@@ -32,13 +32,19 @@ def load_genes(
     background_tasks: BackgroundTasks,
     build: Builds,
     file_path: str,
+    incremental: bool = False,
     session: Session = Depends(get_session),
 ) -> Response:
-    """Load genes in the given genome build."""
+    """Load genes in the given genome build. In incremental mode, only genes that changed are inserted, updated or deleted."""
 
     print(f"Loading {build} genes.")
     background_tasks.add_task(
-        update_interval_table, IntervalType.GENES, build, file_path, session
+        update_interval_table,
+        IntervalType.GENES,
+        build,
+        file_path,
+        session,
+        incremental,
     )
     return JSONResponse(
         content={
@@ -48,7 +54,7 @@ def load_genes(
 
 
 @router.post("/intervals/genes", response_model=List[GeneBase])
-async def genes(query: GeneQuery, session: Session = Depends(get_session)):
+def genes(query: GeneQuery, session: Session = Depends(get_session)):
     """Return genes according to query parameters."""
     nr_filters = count_nr_filters(
         filters=[query.ensembl_ids, query.hgnc_ids, query.hgnc_symbols]
@@ -74,13 +80,19 @@ def load_transcripts(
     background_tasks: BackgroundTasks,
     build: Builds,
     file_path: str,
+    incremental: bool = False,
     session: Session = Depends(get_session),
 ) -> Response:
-    """Load transcripts in the given genome build."""
+    """Load transcripts in the given genome build. In incremental mode, only transcripts that changed are inserted, updated or deleted."""
 
     print(f"Loading {build} transcripts.")
     background_tasks.add_task(
-        update_interval_table, IntervalType.TRANSCRIPTS, build, file_path, session
+        update_interval_table,
+        IntervalType.TRANSCRIPTS,
+        build,
+        file_path,
+        session,
+        incremental,
     )
     return JSONResponse(
         content={
@@ -90,9 +102,7 @@ def load_transcripts(
 
 
 @router.post("/intervals/transcripts", response_model=List[TranscriptBase])
-async def transcripts(
-    query: GeneIntervalQuery, session: Session = Depends(get_session)
-):
+def transcripts(query: GeneIntervalQuery, session: Session = Depends(get_session)):
     """Return transcripts according to query parameters."""
     nr_filters = count_nr_filters(
         filters=[
@@ -124,13 +134,19 @@ def load_exons(
     background_tasks: BackgroundTasks,
     build: Builds,
     file_path: str,
+    incremental: bool = False,
     session: Session = Depends(get_session),
 ) -> Response:
-    """Load exons in the given genome build."""
+    """Load exons in the given genome build. In incremental mode, only exons that changed are inserted, updated or deleted."""
 
     print(f"Loading {build} exons.")
     background_tasks.add_task(
-        update_interval_table, IntervalType.EXONS, build, file_path, session
+        update_interval_table,
+        IntervalType.EXONS,
+        build,
+        file_path,
+        session,
+        incremental,
     )
     return JSONResponse(
         content={
@@ -140,7 +156,7 @@ def load_exons(
 
 
 @router.post("/intervals/exons", response_model=List[ExonBase])
-async def exons(query: GeneIntervalQuery, session: Session = Depends(get_session)):
+def exons(query: GeneIntervalQuery, session: Session = Depends(get_session)):
     """Return exons in the given genome build."""
     nr_filters = count_nr_filters(
         filters=[
@@ -1,6 +1,6 @@
 import datetime
 from os import path
-from typing import Dict, Optional, Tuple
+from typing import Dict, List, Optional, Tuple, Union
 
 from fastapi import APIRouter, Depends, Form, HTTPException, Request, status
 from fastapi.encoders import jsonable_encoder
@@ -8,6 +8,7 @@ from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
 from pydantic_core._pydantic_core import ValidationError
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from starlette.datastructures import FormData
 from typing_extensions import Annotated
 
@@ -16,11 +17,13 @@ from chanjo2.auth import get_token
 from chanjo2.constants import DEFAULT_COVERAGE_LEVEL
 from chanjo2.dbutil import get_session
 from chanjo2.demo import DEMO_COVERAGE_QUERY_FORM, DEMO_GENE_OVERVIEW_QUERY_FORM
+from chanjo2.meta.handle_html_rendering import get_html_response
 from chanjo2.meta.handle_report_contents import (
     get_gene_overview_coverage_stats,
     get_mane_overview_coverage_stats,
     get_report_data,
 )
+from chanjo2.meta.handle_report_table import IncompleteCoverageRows
 from chanjo2.models.pydantic_models import (
     Builds,
     GeneCoverage,
@@ -40,23 +43,40 @@ templates = Jinja2Templates(directory=get_templates_path())
 router = APIRouter()
 
 
+def get_overview_context(overview_content: Dict) -> Dict:
+    """Return the context used to render the genes overview template from the overview data.
+    Levels and incompletely covered intervals saved as JSON by report jobs are converted back to the types of the overview data.
+    """
+    incomplete_coverage_rows: Union[IncompleteCoverageRows, List] = overview_content[
+        "incomplete_coverage_rows"
+    ]
+    return {
+        "software_version": __version__,
+        "extras": overview_content["extras"],
+        "levels": {
+            int(level): key for level, key in overview_content["levels"].items()
+        },
+        "incomplete_coverage_rows": (
+            incomplete_coverage_rows.sorted_rows()
+            if isinstance(incomplete_coverage_rows, IncompleteCoverageRows)
+            else incomplete_coverage_rows
+        ),
+    }
+
+
 @router.get("/overview/demo", response_class=HTMLResponse)
 async def demo_overview(request: Request, db: Session = Depends(get_session)):
     """Return a demo genes overview page over a list of genes for a list of samples."""
 
     overview_query = ReportQuery.as_form(DEMO_COVERAGE_QUERY_FORM)
-    overview_content: dict = get_report_data(
-        query=overview_query, session=db, is_overview=True
+    overview_content: dict = await run_in_threadpool(
+        get_report_data, query=overview_query, session=db, is_overview=True
     )
-    return templates.TemplateResponse(
+    return get_html_response(
+        templates=templates,
         request=request,
         name="overview.html",
-        context={
-            "software_version": __version__,
-            "extras": overview_content["extras"],
-            "levels": overview_content["levels"],
-            "incomplete_coverage_rows": overview_content["incomplete_coverage_rows"],
-        },
+        context=get_overview_context(overview_content=overview_content),
     )
 
 
@@ -86,18 +106,14 @@ async def overview(
             detail=ve.json(),
         )
 
-    overview_content: dict = get_report_data(
-        query=overview_query, session=db, is_overview=True
+    overview_content: dict = await run_in_threadpool(
+        get_report_data, query=overview_query, session=db, is_overview=True
     )
-    response = templates.TemplateResponse(
+    response = get_html_response(
+        templates=templates,
         request=request,
         name="overview.html",
-        context={
-            "software_version": __version__,
-            "extras": overview_content["extras"],
-            "levels": overview_content["levels"],
-            "incomplete_coverage_rows": overview_content["incomplete_coverage_rows"],
-        },
+        context=get_overview_context(overview_content=overview_content),
     )
 
     response.set_cookie(
@@ -132,12 +148,15 @@ async def gene_overview(
             detail=ve.json(),
         )
 
-    gene_overview_content: Dict[str, List[GeneCoverage]] = (
-        get_gene_overview_coverage_stats(form_data=validated_form, session=db)
+    gene_overview_content: Dict[str, List[GeneCoverage]] = await run_in_threadpool(
+        get_gene_overview_coverage_stats, form_data=validated_form, session=db
     )
 
     response = templates.TemplateResponse(
-        request=request, name="gene-overview.html", context=gene_overview_content
+        request=request,
+        name="gene-overview.html",
+        # Cached stats are shared by all requests and must not be modified
+        context={**gene_overview_content},
     )
 
     response.set_cookie(
@@ -159,12 +178,15 @@ async def demo_gene_overview(
     """Returns coverage overview stats for a group of samples over genomic intervals of a single demo gene."""
     validated_form = GeneReportForm(**DEMO_GENE_OVERVIEW_QUERY_FORM)
 
-    gene_overview_content: Dict[str, List[GeneCoverage]] = (
-        get_gene_overview_coverage_stats(form_data=validated_form, session=db)
+    gene_overview_content: Dict[str, List[GeneCoverage]] = await run_in_threadpool(
+        get_gene_overview_coverage_stats, form_data=validated_form, session=db
     )
 
     return templates.TemplateResponse(
-        request=request, name="gene-overview.html", context=gene_overview_content
+        request=request,
+        name="gene-overview.html",
+        # Cached stats are shared by all requests and must not be modified
+        context={**gene_overview_content},
     )
 
 
@@ -178,10 +200,14 @@ async def demo_mane_overview(
     overview_query.interval_type = IntervalType.TRANSCRIPTS
     overview_query.build = Builds.build_38
 
+    mane_overview_content: Dict = await run_in_threadpool(
+        get_mane_overview_coverage_stats, query=overview_query, session=db
+    )
     return templates.TemplateResponse(
         request=request,
         name="mane-overview.html",
-        context=get_mane_overview_coverage_stats(query=overview_query, session=db),
+        # Cached stats are shared by all requests and must not be modified
+        context={**mane_overview_content},
     )
 
 
@@ -211,10 +237,14 @@ async def mane_overview(
             detail=ve.json(),
         )
 
+    mane_overview_content: Dict = await run_in_threadpool(
+        get_mane_overview_coverage_stats, query=overview_query, session=db
+    )
     response = templates.TemplateResponse(
         request=request,
         name="mane-overview.html",
-        context=get_mane_overview_coverage_stats(query=overview_query, session=db),
+        # Cached stats are shared by all requests and must not be modified
+        context={**mane_overview_content},
     )
 
     response.set_cookie(
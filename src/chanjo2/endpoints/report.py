@@ -7,6 +7,7 @@ from typing import Dict, Optional, Tuple
 from fastapi import APIRouter, Depends, Form, HTTPException, Request, status
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
+from starlette.concurrency import run_in_threadpool
 from pydantic_core._pydantic_core import ValidationError
 from sqlalchemy.orm import Session
 from typing_extensions import Annotated
@@ -16,8 +17,14 @@ from chanjo2.auth import get_token
 from chanjo2.constants import DEFAULT_COVERAGE_LEVEL
 from chanjo2.dbutil import get_session
 from chanjo2.demo import DEMO_COVERAGE_QUERY_FORM
+from chanjo2.meta.handle_html_rendering import get_html_response
 from chanjo2.meta.handle_report_contents import get_report_data
-from chanjo2.models.pydantic_models import Builds, IntervalType, ReportQuery
+from chanjo2.models.pydantic_models import (
+    Builds,
+    IntervalType,
+    ReportQuery,
+    SampleSexRow,
+)
 
 LOG = logging.getLogger(__name__)
 
@@ -33,27 +40,40 @@ templates: Jinja2Templates = Jinja2Templates(directory=get_templates_path())
 router = APIRouter()
 
 
+def get_report_context(report_content: Dict) -> Dict:
+    """Return the context used to render the coverage report template from the report data.
+    Levels and sex rows saved as JSON by report jobs are converted back to the types of the report data.
+    """
+    return {
+        "software_version": __version__,
+        "levels": {int(level): key for level, key in report_content["levels"].items()},
+        "extras": report_content["extras"],
+        "sex_rows": [
+            SampleSexRow.model_validate(sex_row)
+            for sex_row in report_content["sex_rows"]
+        ],
+        "completeness_rows": report_content["completeness_rows"],
+        "default_level_completeness_rows": report_content[
+            "default_level_completeness_rows"
+        ],
+        "interval_type": report_content["extras"]["interval_type"],
+        "errors": report_content["errors"],
+    }
+
+
 @router.get("/report/demo", response_class=HTMLResponse)
 async def demo_report(request: Request, db: Session = Depends(get_session)):
     """Return a demo coverage report over a list of genes for a list of samples."""
 
     report_query = ReportQuery.as_form(DEMO_COVERAGE_QUERY_FORM)
-    report_content: Dict = get_report_data(query=report_query, session=db)
-    return templates.TemplateResponse(
+    report_content: Dict = await run_in_threadpool(
+        get_report_data, query=report_query, session=db
+    )
+    return get_html_response(
+        templates=templates,
         request=request,
         name="report.html",
-        context={
-            "software_version": __version__,
-            "levels": report_content["levels"],
-            "extras": report_content["extras"],
-            "sex_rows": report_content["sex_rows"],
-            "completeness_rows": report_content["completeness_rows"],
-            "default_level_completeness_rows": report_content[
-                "default_level_completeness_rows"
-            ],
-            "interval_type": report_query.interval_type.value,
-            "errors": report_content["errors"],
-        },
+        context=get_report_context(report_content=report_content),
     )
 
 
@@ -87,23 +107,15 @@ async def report(
             detail=ve.json(),
         )
 
-    report_content: dict = get_report_data(query=report_query, session=db)
+    report_content: dict = await run_in_threadpool(
+        get_report_data, query=report_query, session=db
+    )
     LOG.debug(f"Time to compute stats: {time.time() - start_time} seconds.")
-    response = templates.TemplateResponse(
+    response = get_html_response(
+        templates=templates,
         request=request,
         name="report.html",
-        context={
-            "software_version": __version__,
-            "levels": report_content["levels"],
-            "extras": report_content["extras"],
-            "sex_rows": report_content["sex_rows"],
-            "completeness_rows": report_content["completeness_rows"],
-            "default_level_completeness_rows": report_content[
-                "default_level_completeness_rows"
-            ],
-            "interval_type": report_query.interval_type.value,
-            "errors": report_content["errors"],
-        },
+        context=get_report_context(report_content=report_content),
     )
 
     response.set_cookie(
@@ -0,0 +1,235 @@
+import datetime
+import logging
+from typing import Callable, Dict, Tuple, Union
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import HTMLResponse, JSONResponse
+from pydantic_core._pydantic_core import ValidationError
+from sqlalchemy.orm import Session, sessionmaker
+
+from chanjo2.auth import get_token
+from chanjo2.dbutil import get_session_factory
+from chanjo2.endpoints.overview import get_overview_context
+from chanjo2.endpoints.report import get_report_context, templates
+from chanjo2.meta.handle_html_rendering import get_html_response
+from chanjo2.meta.handle_report_contents import (
+    get_gene_overview_coverage_stats,
+    get_mane_overview_coverage_stats,
+    get_report_data,
+)
+from chanjo2.meta.handle_report_jobs import REPORT_JOB_RUNNER
+from chanjo2.meta.handle_report_table import IncompleteCoverageRows
+from chanjo2.models.pydantic_models import (
+    GeneReportForm,
+    ReportJob,
+    ReportJobStatus,
+    ReportJobType,
+    ReportQuery,
+)
+
+LOG = logging.getLogger(__name__)
+router = APIRouter()
+
+REPORT_JOB_NOT_FOUND_MSG = "Report job not found"
+REPORT_JOB_NOT_DONE_MSG = "Report job is not done"
+
+# Function computing the data of each type of report, given a query, a database session and a progress callback
+REPORT_JOB_FUNCTIONS: Dict[ReportJobType, Callable] = {
+    ReportJobType.REPORT: lambda query, session, progress: get_report_data(
+        query=query, session=session, progress=progress
+    ),
+    ReportJobType.OVERVIEW: lambda query, session, progress: get_report_data(
+        query=query, session=session, is_overview=True, progress=progress
+    ),
+    ReportJobType.GENE_OVERVIEW: lambda query, session, progress: get_gene_overview_coverage_stats(
+        form_data=query, session=session
+    ),
+    ReportJobType.MANE_OVERVIEW: lambda query, session, progress: get_mane_overview_coverage_stats(
+        query=query, session=session
+    ),
+}
+
+# Template and function returning the template context of each type of report
+REPORT_JOB_TEMPLATES: Dict[ReportJobType, Tuple[str, Callable[[Dict], Dict]]] = {
+    ReportJobType.REPORT: ("report.html", get_report_context),
+    ReportJobType.OVERVIEW: ("overview.html", get_overview_context),
+    ReportJobType.GENE_OVERVIEW: ("gene-overview.html", lambda content: content),
+    ReportJobType.MANE_OVERVIEW: ("mane-overview.html", lambda content: content),
+}
+
+
+def get_report_json(report_content: Dict) -> Dict:
+    """Return the report data as values that can be saved as JSON. Incompletely covered intervals are saved as the rows
+    of the overview page, sorted by gene, interval and sample."""
+    return jsonable_encoder(
+        report_content,
+        custom_encoder={
+            IncompleteCoverageRows: lambda rows: jsonable_encoder(
+                list(rows.sorted_rows())
+            )
+        },
+    )
+
+
+async def submit_report_job(
+    request: Request, report_type: ReportJobType, session_factory: sessionmaker
+) -> JSONResponse:
+    """Validate the form of a report job, as the form of the endpoint returning the same report, and start computing it in the background."""
+    form_data = await request.form()
+    try:
+        if report_type == ReportJobType.GENE_OVERVIEW:
+            query: Union[ReportQuery, GeneReportForm] = GeneReportForm(
+                **jsonable_encoder(form_data)
+            )
+        else:
+            query: Union[ReportQuery, GeneReportForm] = ReportQuery.as_form(form_data)
+    except ValidationError as ve:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=ve.json(),
+        )
+
+    def compute_report(progress: Callable[[int], None]) -> Dict:
+        """Compute the report data with a database session of its own, since the one of the request is closed when it returns."""
+        session: Session = session_factory()
+        try:
+            return get_report_json(
+                REPORT_JOB_FUNCTIONS[report_type](query, session, progress)
+            )
+        finally:
+            session.close()
+
+    job: ReportJob = REPORT_JOB_RUNNER.submit(
+        report_type=report_type,
+        nr_samples=len(query.samples),
+        compute_report=compute_report,
+    )
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED, content=jsonable_encoder(job)
+    )
+
+
+def get_report_job(job_id: str) -> ReportJob:
+    """Return a report job or raise a 404 error if it doesn't exist."""
+    job: ReportJob = REPORT_JOB_RUNNER.store.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=REPORT_JOB_NOT_FOUND_MSG
+        )
+    return job
+
+
+def get_report_job_result(job_id: str) -> Tuple[ReportJob, Dict]:
+    """Return a report job and its report data, or raise an error if the job doesn't exist or is not done."""
+    job: ReportJob = get_report_job(job_id)
+    if job.status != ReportJobStatus.DONE:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=job.error or REPORT_JOB_NOT_DONE_MSG,
+        )
+    return job, REPORT_JOB_RUNNER.store.get_result(job_id)
+
+
+@router.post(
+    "/report/jobs", status_code=status.HTTP_202_ACCEPTED, response_model=ReportJob
+)
+async def report_job(
+    request: Request,
+    session_factory: sessionmaker = Depends(get_session_factory),
+    token_data: Tuple[str, datetime.datetime] = Depends(get_token),
+):
+    """Start computing a coverage report in the background. Accepts the same form as the /report endpoint."""
+    return await submit_report_job(
+        request=request,
+        report_type=ReportJobType.REPORT,
+        session_factory=session_factory,
+    )
+
+
+@router.post(
+    "/overview/jobs", status_code=status.HTTP_202_ACCEPTED, response_model=ReportJob
+)
+async def overview_job(
+    request: Request,
+    session_factory: sessionmaker = Depends(get_session_factory),
+    token_data: Tuple[str, datetime.datetime] = Depends(get_token),
+):
+    """Start computing a genes overview page in the background. Accepts the same form as the /overview endpoint."""
+    return await submit_report_job(
+        request=request,
+        report_type=ReportJobType.OVERVIEW,
+        session_factory=session_factory,
+    )
+
+
+@router.post(
+    "/gene_overview/jobs",
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model=ReportJob,
+)
+async def gene_overview_job(
+    request: Request,
+    session_factory: sessionmaker = Depends(get_session_factory),
+    token_data: Tuple[str, datetime.datetime] = Depends(get_token),
+):
+    """Start computing a gene overview page in the background. Accepts the same form as the /gene_overview endpoint."""
+    return await submit_report_job(
+        request=request,
+        report_type=ReportJobType.GENE_OVERVIEW,
+        session_factory=session_factory,
+    )
+
+
+@router.post(
+    "/mane_overview/jobs",
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model=ReportJob,
+)
+async def mane_overview_job(
+    request: Request,
+    session_factory: sessionmaker = Depends(get_session_factory),
+    token_data: Tuple[str, datetime.datetime] = Depends(get_token),
+):
+    """Start computing a MANE overview page in the background. Accepts the same form as the /mane_overview endpoint."""
+    return await submit_report_job(
+        request=request,
+        report_type=ReportJobType.MANE_OVERVIEW,
+        session_factory=session_factory,
+    )
+
+
+@router.get("/report/jobs/{job_id}", response_model=ReportJob)
+def report_job_status(
+    job_id: str,
+    token_data: Tuple[str, datetime.datetime] = Depends(get_token),
+):
+    """Return the status of a report job and the number of samples processed so far."""
+    return get_report_job(job_id)
+
+
+@router.get("/report/jobs/{job_id}/html", response_class=HTMLResponse)
+def report_job_html(
+    request: Request,
+    job_id: str,
+    token_data: Tuple[str, datetime.datetime] = Depends(get_token),
+):
+    """Return the HTML page of a report job that is done."""
+    job, report_content = get_report_job_result(job_id)
+    template_name, get_context = REPORT_JOB_TEMPLATES[job.report_type]
+    return get_html_response(
+        templates=templates,
+        request=request,
+        name=template_name,
+        context=get_context(report_content),
+    )
+
+
+@router.get("/report/jobs/{job_id}/json")
+def report_job_json(
+    job_id: str,
+    token_data: Tuple[str, datetime.datetime] = Depends(get_token),
+):
+    """Return the data of a report job that is done."""
+    _, report_content = get_report_job_result(job_id)
+    return JSONResponse(content=report_content)
@@ -7,8 +7,9 @@ from fastapi import FastAPI, status
 from fastapi.staticfiles import StaticFiles
 
 from chanjo2 import __version__
-from chanjo2.dbutil import engine
-from chanjo2.endpoints import coverage, intervals, overview, report
+from chanjo2.crud.intervals import insert_missing_gene_ensembl_ids
+from chanjo2.dbutil import SessionLocal, engine
+from chanjo2.endpoints import coverage, intervals, overview, report, report_jobs
 from chanjo2.logger import configure_log
 from chanjo2.models.sql_models import Base
 from chanjo2.populate_demo import load_demo_data
@@ -19,11 +20,14 @@ APP_ROUTER_TAGS: List[Tuple] = [
     (coverage.router, "coverage"),
     (report.router, "report"),
     (overview.router, "overview"),
+    (report_jobs.router, "report jobs"),
 ]
 
 
 def create_db_and_tables():
     Base.metadata.create_all(engine)
+    with SessionLocal() as db:
+        insert_missing_gene_ensembl_ids(db=db)
 
 
 @asynccontextmanager
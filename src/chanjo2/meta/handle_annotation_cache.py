@@ -0,0 +1,442 @@
+import logging
+import os
+import threading
+import time
+from array import array
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from sqlalchemy.orm import Session
+
+from chanjo2.crud.intervals import (
+    get_genes,
+    get_hgnc_gene,
+    get_intervals_version,
+    set_sql_intervals,
+)
+from chanjo2.meta.handle_cache import LRUCache
+from chanjo2.models import SQLExon, SQLGene, SQLTranscript
+from chanjo2.models.pydantic_models import Builds, TranscriptTag
+
+LOG = logging.getLogger(__name__)
+
+ANNOTATION_CACHE_BUILDS = int(os.getenv("ANNOTATION_CACHE_BUILDS", 2))
+ANNOTATION_CACHE = LRUCache(max_size=ANNOTATION_CACHE_BUILDS)
+_annotation_cache_lock = threading.Lock()
+_annotation_load_locks: Dict[Tuple[str, str], threading.Lock] = {}
+
+MISSING_HGNC_ID = -1  # Stored in place of genes without HGNC ID
+
+
+@dataclass(frozen=True, slots=True)
+class GeneAnnotation:
+    """A gene of the annotation cache, with the same fields as a SQL gene."""
+
+    chromosome: str
+    start: int
+    stop: int
+    ensembl_ids: List[str]
+    hgnc_id: Optional[int]
+    hgnc_symbol: Optional[str]
+    build: Builds
+
+
+@dataclass(frozen=True, slots=True)
+class TranscriptAnnotation:
+    """A transcript of the annotation cache, with the same fields as a SQL transcript."""
+
+    chromosome: str
+    start: int
+    stop: int
+    ensembl_id: str
+    refseq_mrna: Optional[str]
+    refseq_mrna_pred: Optional[str]
+    refseq_ncrna: Optional[str]
+    refseq_mane_select: Optional[str]
+    refseq_mane_plus_clinical: Optional[str]
+    ensembl_gene_id: str
+    build: Builds
+
+
+@dataclass(frozen=True, slots=True)
+class ExonAnnotation:
+    """An exon of the annotation cache, with the same fields as a SQL exon."""
+
+    chromosome: str
+    start: int
+    stop: int
+    rank_in_transcript: int
+    ensembl_id: str
+    ensembl_transcript_id: str
+    ensembl_gene_id: str
+    build: Builds
+
+
+# SQL and annotation cache classes of each type of interval, used to check the type of an interval of either source
+GENE_TYPES: Tuple[type, type] = (SQLGene, GeneAnnotation)
+TRANSCRIPT_TYPES: Tuple[type, type] = (SQLTranscript, TranscriptAnnotation)
+
+TRANSCRIPT_REFSEQ_COLUMNS: List[str] = [
+    "refseq_mrna",
+    "refseq_mrna_pred",
+    "refseq_ncrna",
+    "refseq_mane_select",
+    "refseq_mane_plus_clinical",
+]
+
+
+class BuildAnnotations:
+    """Genes, transcripts and exons of a genome build held in memory as columns, in the order of the database tables.
+
+    Genes are indexed by HGNC ID, HGNC symbol and Ensembl ID, while transcripts and exons are indexed by Ensembl gene ID.
+    Annotation objects are only created for the intervals returned by a query.
+    """
+
+    def __init__(self, build: Builds, version: int):
+        self.build: Builds = Builds(build)
+        self.version: int = version
+        self.chromosomes: List[str] = []
+        self._chromosome_indexes: Dict[str, int] = {}
+
+        self.gene_chromosomes = array("B")
+        self.gene_starts = array("q")
+        self.gene_stops = array("q")
+        self.gene_ensembl_ids: List[List[str]] = []
+        self.gene_hgnc_ids = array("q")
+        self.gene_hgnc_symbols: List[Optional[str]] = []
+        self.genes_by_hgnc_id: Dict[int, array] = {}
+        self.genes_by_hgnc_symbol: Dict[str, array] = {}
+        self.genes_by_ensembl_id: Dict[str, array] = {}
+
+        self.transcript_chromosomes = array("B")
+        self.transcript_starts = array("q")
+        self.transcript_stops = array("q")
+        self.transcript_ensembl_ids: List[str] = []
+        self.transcript_refseq: Dict[str, List[Optional[str]]] = {
+            column: [] for column in TRANSCRIPT_REFSEQ_COLUMNS
+        }
+        self.transcript_genes: List[str] = []
+        self.transcripts_by_gene: Dict[str, array] = {}
+
+        self.exon_chromosomes = array("B")
+        self.exon_starts = array("q")
+        self.exon_stops = array("q")
+        self.exon_ranks = array("l")
+        self.exon_ensembl_ids: List[str] = []
+        self.exon_transcripts: List[str] = []
+        self.exon_genes: List[str] = []
+        self.exons_by_gene: Dict[str, array] = {}
+
+    def _chromosome_index(self, chromosome: str) -> int:
+        if chromosome not in self._chromosome_indexes:
+            self._chromosome_indexes[chromosome] = len(self.chromosomes)
+            self.chromosomes.append(chromosome)
+        return self._chromosome_indexes[chromosome]
+
+    @staticmethod
+    def _add_to_index(index: Dict, key, row: int) -> None:
+        if key is None:
+            return
+        if key not in index:
+            index[key] = array("l")
+        index[key].append(row)
+
+    def load(self, db: Session) -> "BuildAnnotations":
+        """Read all the intervals of the build from the database, selecting columns only."""
+        for row, (
+            chromosome,
+            start,
+            stop,
+            ensembl_ids,
+            hgnc_id,
+            hgnc_symbol,
+        ) in enumerate(
+            db.query(
+                SQLGene.chromosome,
+                SQLGene.start,
+                SQLGene.stop,
+                SQLGene.ensembl_ids,
+                SQLGene.hgnc_id,
+                SQLGene.hgnc_symbol,
+            )
+            .filter(SQLGene.build == self.build)
+            .order_by(SQLGene.id)
+        ):
+            self.gene_chromosomes.append(self._chromosome_index(chromosome))
+            self.gene_starts.append(start)
+            self.gene_stops.append(stop)
+            self.gene_ensembl_ids.append(ensembl_ids)
+            self.gene_hgnc_ids.append(MISSING_HGNC_ID if hgnc_id is None else hgnc_id)
+            self.gene_hgnc_symbols.append(hgnc_symbol)
+            self._add_to_index(self.genes_by_hgnc_id, hgnc_id, row)
+            self._add_to_index(self.genes_by_hgnc_symbol, hgnc_symbol, row)
+            for ensembl_id in ensembl_ids:
+                self._add_to_index(self.genes_by_ensembl_id, ensembl_id, row)
+
+        # Gene and transcript IDs repeated over many rows point to the same string
+        shared_ids: Dict[str, str] = {}
+        for row, (
+            chromosome,
+            start,
+            stop,
+            ensembl_id,
+            ensembl_gene_id,
+            *refseq,
+        ) in enumerate(
+            db.query(
+                SQLTranscript.chromosome,
+                SQLTranscript.start,
+                SQLTranscript.stop,
+                SQLTranscript.ensembl_id,
+                SQLTranscript.ensembl_gene_id,
+                *[
+                    getattr(SQLTranscript, column)
+                    for column in TRANSCRIPT_REFSEQ_COLUMNS
+                ],
+            )
+            .filter(SQLTranscript.build == self.build)
+            .order_by(SQLTranscript.id)
+        ):
+            ensembl_gene_id = shared_ids.setdefault(ensembl_gene_id, ensembl_gene_id)
+            self.transcript_chromosomes.append(self._chromosome_index(chromosome))
+            self.transcript_starts.append(start)
+            self.transcript_stops.append(stop)
+            self.transcript_ensembl_ids.append(
+                shared_ids.setdefault(ensembl_id, ensembl_id)
+            )
+            for column, value in zip(TRANSCRIPT_REFSEQ_COLUMNS, refseq):
+                self.transcript_refseq[column].append(value)
+            self.transcript_genes.append(ensembl_gene_id)
+            self._add_to_index(self.transcripts_by_gene, ensembl_gene_id, row)
+
+        for row, (
+            chromosome,
+            start,
+            stop,
+            rank_in_transcript,
+            ensembl_id,
+            ensembl_transcript_id,
+            ensembl_gene_id,
+        ) in enumerate(
+            db.query(
+                SQLExon.chromosome,
+                SQLExon.start,
+                SQLExon.stop,
+                SQLExon.rank_in_transcript,
+                SQLExon.ensembl_id,
+                SQLExon.ensembl_transcript_id,
+                SQLExon.ensembl_gene_id,
+            )
+            .filter(SQLExon.build == self.build)
+            .order_by(SQLExon.id)
+        ):
+            ensembl_gene_id = shared_ids.setdefault(ensembl_gene_id, ensembl_gene_id)
+            self.exon_chromosomes.append(self._chromosome_index(chromosome))
+            self.exon_starts.append(start)
+            self.exon_stops.append(stop)
+            self.exon_ranks.append(rank_in_transcript)
+            self.exon_ensembl_ids.append(ensembl_id)
+            self.exon_transcripts.append(
+                shared_ids.setdefault(ensembl_transcript_id, ensembl_transcript_id)
+            )
+            self.exon_genes.append(ensembl_gene_id)
+            self._add_to_index(self.exons_by_gene, ensembl_gene_id, row)
+
+        return self
+
+    def _get_gene(self, row: int) -> GeneAnnotation:
+        hgnc_id: int = self.gene_hgnc_ids[row]
+        return GeneAnnotation(
+            chromosome=self.chromosomes[self.gene_chromosomes[row]],
+            start=self.gene_starts[row],
+            stop=self.gene_stops[row],
+            ensembl_ids=self.gene_ensembl_ids[row],
+            hgnc_id=None if hgnc_id == MISSING_HGNC_ID else hgnc_id,
+            hgnc_symbol=self.gene_hgnc_symbols[row],
+            build=self.build,
+        )
+
+    def _get_transcript(self, row: int) -> TranscriptAnnotation:
+        return TranscriptAnnotation(
+            chromosome=self.chromosomes[self.transcript_chromosomes[row]],
+            start=self.transcript_starts[row],
+            stop=self.transcript_stops[row],
+            ensembl_id=self.transcript_ensembl_ids[row],
+            ensembl_gene_id=self.transcript_genes[row],
+            build=self.build,
+            **{
+                column: values[row] for column, values in self.transcript_refseq.items()
+            },
+        )
+
+    def _get_exon(self, row: int) -> ExonAnnotation:
+        return ExonAnnotation(
+            chromosome=self.chromosomes[self.exon_chromosomes[row]],
+            start=self.exon_starts[row],
+            stop=self.exon_stops[row],
+            rank_in_transcript=self.exon_ranks[row],
+            ensembl_id=self.exon_ensembl_ids[row],
+            ensembl_transcript_id=self.exon_transcripts[row],
+            ensembl_gene_id=self.exon_genes[row],
+            build=self.build,
+        )
+
+    @staticmethod
+    def _get_rows(index: Dict, keys: Iterable) -> List[int]:
+        """Return the sorted rows of a table matching any of the keys of one of its indexes."""
+        return sorted({row for key in keys if key in index for row in index[key]})
+
+    def get_genes(
+        self,
+        ensembl_ids: Optional[List[str]],
+        hgnc_ids: Optional[List[int]],
+        hgnc_symbols: Optional[List[str]],
+    ) -> List[GeneAnnotation]:
+        """Return the genes matching any of the Ensembl IDs, or HGNC IDs, or HGNC symbols, or all genes if none is provided."""
+        if ensembl_ids:
+            rows = self._get_rows(self.genes_by_ensembl_id, ensembl_ids)
+        elif hgnc_ids:
+            rows = self._get_rows(self.genes_by_hgnc_id, hgnc_ids)
+        elif hgnc_symbols:
+            rows = self._get_rows(self.genes_by_hgnc_symbol, hgnc_symbols)
+        else:
+            rows = range(len(self.gene_hgnc_symbols))
+        return [self._get_gene(row) for row in rows]
+
+    def get_gene_intervals(
+        self,
+        interval_type: Union[SQLTranscript, SQLExon],
+        ensembl_gene_ids: List[str],
+        transcript_tags: Optional[List[TranscriptTag]] = None,
+    ) -> List[Union[TranscriptAnnotation, ExonAnnotation]]:
+        """Return the transcripts, optionally with any of the given RefSeq tags, or the exons of a list of genes."""
+        if interval_type == SQLExon:
+            return [
+                self._get_exon(row)
+                for row in self._get_rows(self.exons_by_gene, ensembl_gene_ids)
+            ]
+
+        rows: List[int] = self._get_rows(self.transcripts_by_gene, ensembl_gene_ids)
+        if transcript_tags:
+            tags_columns: List[List[Optional[str]]] = [
+                self.transcript_refseq[TranscriptTag(tag).value]
+                for tag in transcript_tags
+            ]
+            rows = [
+                row
+                for row in rows
+                if any(column[row] is not None for column in tags_columns)
+            ]
+        return [self._get_transcript(row) for row in rows]
+
+
+def _get_annotation_load_lock(cache_key: Tuple[str, str]) -> threading.Lock:
+    """Return the lock held while loading the annotation cache of a genome build, so that builds are loaded at the same time and each of them once."""
+    with _annotation_cache_lock:
+        return _annotation_load_locks.setdefault(cache_key, threading.Lock())
+
+
+def get_build_annotations(db: Session, build: Builds) -> Optional[BuildAnnotations]:
+    """Return the annotation cache of a genome build, loading it from the database if it's missing or its intervals changed.
+    Changes are found by the version of the build intervals saved in the database, so that intervals reloaded by any app worker are read again.
+    Up-to-date annotations are returned without waiting for other builds being loaded.
+    Returns None if the cache is disabled by setting the ANNOTATION_CACHE_BUILDS env variable to 0.
+    """
+    if ANNOTATION_CACHE_BUILDS <= 0:
+        return None
+
+    build_value: str = Builds(build).value
+    cache_key: Tuple[str, str] = (str(db.get_bind().url), build_value)
+    # The version is read before the tables, so that intervals changed meanwhile are read again next time
+    version: int = get_intervals_version(db=db, build=build)
+    annotations: Optional[BuildAnnotations] = ANNOTATION_CACHE.get(cache_key)
+    if annotations is not None and annotations.version == version:
+        return annotations
+
+    with _get_annotation_load_lock(cache_key):
+        # The build may have been loaded by another request while this one was waiting
+        annotations = ANNOTATION_CACHE.get(cache_key)
+        if annotations is None or annotations.version != version:
+            start_time = time.time()
+            annotations = BuildAnnotations(build=build, version=version).load(db=db)
+            ANNOTATION_CACHE.set(cache_key, annotations)
+            LOG.info(
+                f"{build_value} annotation cache loaded in {time.time() - start_time:.1f} seconds"
+            )
+    return annotations
+
+
+def get_cached_genes(
+    db: Session,
+    build: Builds,
+    ensembl_ids: Optional[List[str]],
+    hgnc_ids: Optional[List[int]],
+    hgnc_symbols: Optional[List[str]],
+) -> List[Union[SQLGene, GeneAnnotation]]:
+    """Return genes according to specified fields from the annotation cache, or from the database if the cache is disabled."""
+    annotations: Optional[BuildAnnotations] = get_build_annotations(db=db, build=build)
+    if annotations is None:
+        return get_genes(
+            db=db,
+            build=build,
+            ensembl_ids=ensembl_ids,
+            hgnc_ids=hgnc_ids,
+            hgnc_symbols=hgnc_symbols,
+            limit=None,
+        )
+    return annotations.get_genes(
+        ensembl_ids=ensembl_ids, hgnc_ids=hgnc_ids, hgnc_symbols=hgnc_symbols
+    )
+
+
+def get_cached_hgnc_gene(
+    db: Session, build: Builds, hgnc_id: int
+) -> Optional[Union[SQLGene, GeneAnnotation]]:
+    """Return a gene by its HGNC ID from the annotation cache, or from the database if the cache is disabled."""
+    annotations: Optional[BuildAnnotations] = get_build_annotations(db=db, build=build)
+    if annotations is None:
+        return get_hgnc_gene(db=db, build=build, hgnc_id=hgnc_id)
+    genes: List[GeneAnnotation] = annotations.get_genes(
+        ensembl_ids=None, hgnc_ids=[hgnc_id], hgnc_symbols=None
+    )
+    return genes[0] if genes else None
+
+
+def get_cached_sql_intervals(
+    db: Session,
+    interval_type: Union[SQLExon, SQLGene, SQLTranscript],
+    genes: List[Union[SQLGene, GeneAnnotation]],
+    transcript_tags: Optional[List[TranscriptTag]] = None,
+) -> List[
+    Union[
+        SQLGene,
+        SQLTranscript,
+        SQLExon,
+        GeneAnnotation,
+        TranscriptAnnotation,
+        ExonAnnotation,
+    ]
+]:
+    """Return the genes themselves, or their transcripts or exons, from the annotation cache,
+    or from the database if the cache is disabled."""
+    if interval_type == SQLGene:
+        return genes
+    if not genes:
+        return []
+    annotations: Optional[BuildAnnotations] = get_build_annotations(
+        db=db, build=genes[0].build
+    )
+    if annotations is None:
+        return set_sql_intervals(
+            db=db,
+            interval_type=interval_type,
+            genes=genes,
+            transcript_tags=transcript_tags or [],
+        )
+    return annotations.get_gene_intervals(
+        interval_type=interval_type,
+        ensembl_gene_ids=[
+            ensembl_id for gene in genes for ensembl_id in gene.ensembl_ids
+        ],
+        transcript_tags=transcript_tags,
+    )
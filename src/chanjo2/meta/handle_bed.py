@@ -1,15 +1,31 @@
-from typing import Iterator, List, Tuple
+import hashlib
+import os
+import tempfile
+import threading
+from array import array
+from functools import cached_property
+from typing import IO, Dict, Iterator, List, Optional, Sequence, Tuple
 
 CHROM_INDEX = 0
 START_INDEX = 1
 STOP_INDEX = 2
+RAM_BACKED_DIR = "/dev/shm"
+
+
+def get_regions_scratch_dir() -> Optional[str]:
+    """Return the folder where shared regions bed files are written: REGIONS_SCRATCH_DIR if set, otherwise a RAM-backed folder when available."""
+    if os.getenv("REGIONS_SCRATCH_DIR"):
+        return os.getenv("REGIONS_SCRATCH_DIR")
+    if os.path.isdir(RAM_BACKED_DIR) and os.access(RAM_BACKED_DIR, os.W_OK):
+        return RAM_BACKED_DIR
+    return None  # Use the system's default temp folder
 
 
 def resource_lines(file_path: str) -> Iterator[str]:
-    resource = open(file_path, "r", encoding="utf-8")
-    lines: List = resource.readlines()
-    lines: List = [line.rstrip("\n") for line in lines]
-    return iter(lines)
+    """Return the lines of a file one at a time, without reading the whole file into memory."""
+    with open(file_path, "r", encoding="utf-8") as resource:
+        for line in resource:
+            yield line.rstrip("\n")
 
 
 def bed_file_interval_id_coords(
@@ -42,6 +58,21 @@ def bed_file_interval_id_coords(
     return interval_id_coords
 
 
+def bed_file_regions(file_path: str) -> List[Tuple[str, int, int]]:
+    """Return the genomic regions of a bed file, with chromosome names as they are written in the file."""
+
+    with open(file_path, "r") as bed_file:
+        return [
+            (
+                cols[CHROM_INDEX],
+                int(cols[START_INDEX]),
+                int(cols[STOP_INDEX]),
+            )
+            for cols in (line.rstrip().split("\t") for line in bed_file)
+            if len(cols) > STOP_INDEX and cols[CHROM_INDEX].startswith("#") is False
+        ]
+
+
 def sort_interval_ids_coords(
     interval_ids_coords: List[Tuple[str, Tuple[str, int, int]]],
 ) -> List[Tuple[str, Tuple[str, int, int]]]:
@@ -54,3 +85,128 @@ def sort_interval_ids_coords(
             interval_coord[1][STOP_INDEX],
         ),
     )
+
+
+class RegionSet:
+    """Sorted genomic intervals of a request, shared by all samples and stats computed over them.
+    Intervals with the same coordinates, such as exons shared by several transcripts, are collapsed into one region:
+    stats are computed once for each region and then expanded to every interval (row) of the set.
+    The regions are written to a bed file at most once for each chromosome prefix, and the files are deleted when the set is closed.
+    """
+
+    def __init__(self, interval_ids_coords: Sequence[Tuple[str, Tuple[str, int, int]]]):
+        self.interval_ids_coords: Sequence[Tuple[str, Tuple[str, int, int]]] = (
+            interval_ids_coords
+        )
+        self._bed_files: Dict[str, IO] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.interval_ids_coords)
+
+    @cached_property
+    def interval_indexes(self) -> Dict[str, int]:
+        """Return the row of each interval ID in the set. IDs present more than once point to their last row."""
+        return {
+            interval_id: index
+            for index, (interval_id, _) in enumerate(self.interval_ids_coords)
+        }
+
+    def __enter__(self) -> "RegionSet":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    @cached_property
+    def digest(self) -> str:
+        """Return a hash of the intervals coordinates, identifying sets containing the same intervals in the same order."""
+        coords_hash = hashlib.sha1()
+        for _, (chrom, start, stop) in self.interval_ids_coords:
+            coords_hash.update(f"{chrom}:{start}-{stop};".encode())
+        return coords_hash.hexdigest()
+
+    def joined(
+        self, interval_ids_coords: Sequence[Tuple[str, Tuple[str, int, int]]]
+    ) -> "RegionSet":
+        """Return a new region set containing the intervals of this set followed by the given intervals.
+        Its regions are sorted before computing stats, which are then returned in the order of the intervals.
+        """
+        return RegionSet(
+            interval_ids_coords=list(self.interval_ids_coords)
+            + list(interval_ids_coords)
+        )
+
+    @cached_property
+    def _unique_regions(self) -> Tuple[List[Tuple[str, int, int]], array]:
+        """Return the distinct coordinates of the intervals sorted by chrom, start and stop positions, and the index of the region of each interval.
+        Sets whose intervals are not sorted, such as report intervals joined with the sex chromosomes intervals, are thus sent sorted to the coverage tools.
+        """
+        unique_regions: List[Tuple[str, int, int]] = sorted(
+            {tuple(coords) for _, coords in self.interval_ids_coords}
+        )
+        region_indexes: Dict[Tuple[str, int, int], int] = {
+            coords: index for index, coords in enumerate(unique_regions)
+        }
+        interval_regions = array(
+            "q",
+            [region_indexes[tuple(coords)] for _, coords in self.interval_ids_coords],
+        )
+        return unique_regions, interval_regions
+
+    @cached_property
+    def _regions_match_intervals(self) -> bool:
+        """Return True if each interval is a distinct region, in the same order as the sorted regions."""
+        unique_regions, interval_regions = self._unique_regions
+        return len(unique_regions) == len(interval_regions) and all(
+            region == index for index, region in enumerate(interval_regions)
+        )
+
+    @property
+    def nr_regions(self) -> int:
+        """Number of distinct regions over which stats are computed."""
+        return len(self._unique_regions[0])
+
+    def regions(self, chrom_prefix: str) -> List[Tuple[str, int, int]]:
+        """Return the sorted distinct coordinates of the intervals with the given prefix prepended to the chromosome names."""
+        return [
+            (f"{chrom_prefix}{chrom}", start, stop)
+            for chrom, start, stop in self._unique_regions[0]
+        ]
+
+    def expand(self, regions_column: array) -> array:
+        """Return a column with one value for each interval of the set in its order, from a column with one value for each sorted region."""
+        if self._regions_match_intervals:
+            return regions_column
+        return array(
+            regions_column.typecode,
+            [regions_column[region] for region in self._unique_regions[1]],
+        )
+
+    def expand_columns(self, regions_columns: Dict[int, array]) -> Dict[int, array]:
+        """Expand several columns with one value for each region, such as coverage completeness by threshold."""
+        return {key: self.expand(column) for key, column in regions_columns.items()}
+
+    def bed_file_path(self, chrom_prefix: str) -> str:
+        """Return the path to a bed file with the intervals, writing it the first time it's requested for a chromosome prefix."""
+        with self._lock:
+            if chrom_prefix not in self._bed_files:
+                bed_file = tempfile.NamedTemporaryFile(
+                    mode="w", suffix=".bed", dir=get_regions_scratch_dir()
+                )
+                bed_file.write(
+                    "\n".join(
+                        f"{chrom}\t{start}\t{stop}"
+                        for chrom, start, stop in self.regions(chrom_prefix)
+                    )
+                )
+                bed_file.flush()
+                self._bed_files[chrom_prefix] = bed_file
+            return self._bed_files[chrom_prefix].name
+
+    def close(self) -> None:
+        """Delete the bed files written for this set of intervals."""
+        with self._lock:
+            for bed_file in self._bed_files.values():
+                bed_file.close()
+            self._bed_files = {}
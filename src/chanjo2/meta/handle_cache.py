@@ -0,0 +1,142 @@
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Set, Tuple
+
+
+def file_fingerprint(
+    file_path: str,
+) -> Tuple[str, Optional[int], Optional[int], Optional[int]]:
+    """Return a tuple identifying a file and its current version: path, inode, size and modification time.
+    Remote files (URLs) are identified by their path only."""
+    try:
+        file_stat: os.stat_result = os.stat(file_path)
+    except (OSError, ValueError):
+        return file_path, None, None, None
+    return file_path, file_stat.st_ino, file_stat.st_size, file_stat.st_mtime_ns
+
+
+class LRUCache:
+    """Thread-safe mapping that evicts its least recently used entries when it grows over max_size items."""
+
+    def __init__(self, max_size: int):
+        self.max_size: int = max_size
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the value stored for a key and mark it as most recently used."""
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store a value, evicting the least recently used entries if needed."""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove all entries from the cache."""
+        with self._lock:
+            self._entries.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+def get_object_size(obj: Any, seen: Optional[Set[int]] = None) -> int:
+    """Return an estimate of the memory taken by an object and the containers, strings and numbers it refers to, in bytes.
+    Attributes starting with an underscore are skipped, so that the internal state of ORM objects isn't followed.
+    """
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size: int = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(
+            get_object_size(key, seen) + get_object_size(value, seen)
+            for key, value in obj.items()
+        )
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(get_object_size(item, seen) for item in obj)
+    elif hasattr(obj, "__dict__"):
+        size += sum(
+            get_object_size(value, seen)
+            for key, value in vars(obj).items()
+            if key.startswith("_") is False
+        )
+    return size
+
+
+class TTLCache(LRUCache):
+    """LRU cache whose entries expire ttl seconds after being stored,
+    and which also evicts its least recently used entries when their estimated size grows over max_bytes.
+    """
+
+    def __init__(self, max_size: int, ttl: float, max_bytes: int):
+        super().__init__(max_size=max_size)
+        self.ttl: float = ttl
+        self.max_bytes: int = max_bytes
+        self._nr_bytes: int = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the value stored for a key if it hasn't expired, and mark it as most recently used."""
+        with self._lock:
+            if key not in self._entries:
+                return default
+            expires_at, nr_bytes, value = self._entries[key]
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                self._nr_bytes -= nr_bytes
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store a value, evicting the least recently used entries if there are too many or they take too much memory.
+        Values larger than max_bytes are not stored."""
+        if self.max_size <= 0 or self.ttl <= 0:
+            return
+        nr_bytes: int = get_object_size(value)
+        if nr_bytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._nr_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (time.monotonic() + self.ttl, nr_bytes, value)
+            self._nr_bytes += nr_bytes
+            while len(self._entries) > self.max_size or self._nr_bytes > self.max_bytes:
+                self._nr_bytes -= self._entries.popitem(last=False)[1][1]
+
+    def clear(self) -> None:
+        """Remove all entries from the cache."""
+        with self._lock:
+            self._entries.clear()
+            self._nr_bytes = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        sentinel = object()
+        return self.get(key, default=sentinel) is not sentinel
+
+    @property
+    def nr_bytes(self) -> int:
+        """Estimated memory taken by the values stored in the cache, in bytes."""
+        with self._lock:
+            return self._nr_bytes
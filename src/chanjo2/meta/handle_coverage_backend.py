@@ -0,0 +1,327 @@
+import logging
+import os
+from abc import ABC, abstractmethod
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+from chanjo2.meta.handle_bed import RegionSet, bed_file_regions
+from chanjo2.meta.handle_cache import LRUCache, file_fingerprint
+from chanjo2.meta.handle_completeness_stats import get_d4tools_intervals_completeness
+from chanjo2.meta.handle_coverage_stats import (
+    D4Header,
+    aggregate_chromosomes_mean_coverage,
+    get_d4tools_chromosome_mean_coverage,
+    get_d4tools_header,
+    get_d4tools_intervals_coverage,
+    get_d4tools_intervals_stats,
+)
+
+try:
+    from pyd4 import D4File
+except ImportError:
+    D4File = None
+
+LOG = logging.getLogger(__name__)
+
+D4TOOLS_BACKEND = "d4tools"
+PYD4_BACKEND = "pyd4"
+
+Region = Tuple[str, int, int]
+
+
+class CoverageBackend(ABC):
+    """Computes coverage stats over the genomic regions of a d4 file.
+    Stats are computed once for each distinct region of a region set, and returned with one value for each of its intervals.
+    """
+
+    name: str
+
+    @abstractmethod
+    def header(self, d4_file_path: str) -> D4Header:
+        """Return chromosome names, lengths and prefix of a d4 file."""
+
+    @abstractmethod
+    def intervals_mean(
+        self, d4_file_path: str, region_set: RegionSet, chrom_prefix: str
+    ) -> array:
+        """Return the mean coverage over each interval of a region set."""
+
+    @abstractmethod
+    def intervals_completeness(
+        self,
+        d4_file_path: str,
+        region_set: RegionSet,
+        chrom_prefix: str,
+        thresholds: List[int],
+    ) -> Dict[int, array]:
+        """Return the fraction of bases covered at least at each threshold, as one column with the value of every interval of a region set by threshold."""
+
+    @abstractmethod
+    def chromosomes_mean(
+        self,
+        d4_file_path: str,
+        chromosomes: List[str],
+        bed_file_path: Optional[str] = None,
+    ) -> List[Tuple[str, float]]:
+        """Return the mean coverage over entire chromosomes, or over the regions of a bed file grouped by chromosome."""
+
+    def intervals_stats(
+        self,
+        d4_file_path: str,
+        region_set: RegionSet,
+        chrom_prefix: str,
+        thresholds: List[int],
+    ) -> Tuple[array, Dict[int, array]]:
+        """Return mean coverage and coverage completeness by threshold over each interval of a region set."""
+        intervals_mean: array = self.intervals_mean(
+            d4_file_path=d4_file_path, region_set=region_set, chrom_prefix=chrom_prefix
+        )
+        if not thresholds:
+            return intervals_mean, {}
+        return intervals_mean, self.intervals_completeness(
+            d4_file_path=d4_file_path,
+            region_set=region_set,
+            chrom_prefix=chrom_prefix,
+            thresholds=thresholds,
+        )
+
+
+class D4toolsBackend(CoverageBackend):
+    """Coverage backend running d4tools in a subprocess, over the bed files shared by the region sets."""
+
+    name = D4TOOLS_BACKEND
+
+    def header(self, d4_file_path: str) -> D4Header:
+        return get_d4tools_header(d4_file_path)
+
+    def intervals_mean(
+        self, d4_file_path: str, region_set: RegionSet, chrom_prefix: str
+    ) -> array:
+        return region_set.expand(
+            get_d4tools_intervals_coverage(
+                d4_file_path=d4_file_path,
+                bed_file_path=region_set.bed_file_path(chrom_prefix),
+            )
+        )
+
+    def intervals_completeness(
+        self,
+        d4_file_path: str,
+        region_set: RegionSet,
+        chrom_prefix: str,
+        thresholds: List[int],
+    ) -> Dict[int, array]:
+        return region_set.expand_columns(
+            get_d4tools_intervals_completeness(
+                d4_file_path=d4_file_path,
+                bed_file_path=region_set.bed_file_path(chrom_prefix),
+                completeness_thresholds=thresholds,
+            )
+        )
+
+    def intervals_stats(
+        self,
+        d4_file_path: str,
+        region_set: RegionSet,
+        chrom_prefix: str,
+        thresholds: List[int],
+    ) -> Tuple[array, Dict[int, array]]:
+        regions_mean, regions_completeness = get_d4tools_intervals_stats(
+            d4_file_path=d4_file_path,
+            bed_file_path=region_set.bed_file_path(chrom_prefix),
+            completeness_thresholds=thresholds,
+        )
+        return region_set.expand(regions_mean), region_set.expand_columns(
+            regions_completeness
+        )
+
+    def chromosomes_mean(
+        self,
+        d4_file_path: str,
+        chromosomes: List[str],
+        bed_file_path: Optional[str] = None,
+    ) -> List[Tuple[str, float]]:
+        return get_d4tools_chromosome_mean_coverage(
+            d4_file_path=d4_file_path,
+            chromosomes=chromosomes,
+            bed_file_path=bed_file_path,
+        )
+
+
+class Pyd4Backend(CoverageBackend):
+    """Coverage backend reading d4 files in-process with the pyd4 library."""
+
+    name = PYD4_BACKEND
+
+    def header(self, d4_file_path: str) -> D4Header:
+        chroms: List[Tuple[str, int]] = D4File(d4_file_path).chroms()
+        chromosomes: List[str] = [chrom for chrom, _ in chroms]
+        return D4Header(
+            chromosomes=chromosomes,
+            lengths=dict(chroms),
+            prefix="chr" if chromosomes and "chr" in chromosomes[0] else "",
+        )
+
+    def _regions_mean(self, d4_file_path: str, regions: List[Region]) -> array:
+        if not regions:
+            return array("d")
+        return array("d", D4File(d4_file_path).mean(regions))
+
+    def intervals_mean(
+        self, d4_file_path: str, region_set: RegionSet, chrom_prefix: str
+    ) -> array:
+        return region_set.expand(
+            self._regions_mean(
+                d4_file_path=d4_file_path, regions=region_set.regions(chrom_prefix)
+            )
+        )
+
+    def intervals_completeness(
+        self,
+        d4_file_path: str,
+        region_set: RegionSet,
+        chrom_prefix: str,
+        thresholds: List[int],
+    ) -> Dict[int, array]:
+        return self.intervals_stats(
+            d4_file_path=d4_file_path,
+            region_set=region_set,
+            chrom_prefix=chrom_prefix,
+            thresholds=thresholds,
+        )[1]
+
+    def intervals_stats(
+        self,
+        d4_file_path: str,
+        region_set: RegionSet,
+        chrom_prefix: str,
+        thresholds: List[int],
+    ) -> Tuple[array, Dict[int, array]]:
+        """Load the depth of each region once and derive both its mean and its completeness from it."""
+        d4_file = D4File(d4_file_path)
+        intervals_mean = array("d")
+        intervals_completeness: Dict[int, array] = {
+            threshold: array("d") for threshold in thresholds
+        }
+        for region in region_set.regions(chrom_prefix):
+            depths = d4_file.load_to_np(region)
+            if len(depths) == 0:
+                intervals_mean.append(float("nan"))
+                for threshold in thresholds:
+                    intervals_completeness[threshold].append(0.0)
+                continue
+            intervals_mean.append(float(depths.mean()))
+            for threshold in thresholds:
+                intervals_completeness[threshold].append(
+                    float((depths >= threshold).mean())
+                )
+        return region_set.expand(intervals_mean), region_set.expand_columns(
+            intervals_completeness
+        )
+
+    def chromosomes_mean(
+        self,
+        d4_file_path: str,
+        chromosomes: List[str],
+        bed_file_path: Optional[str] = None,
+    ) -> List[Tuple[str, float]]:
+        if bed_file_path:
+            regions: List[Region] = [
+                region
+                for region in bed_file_regions(file_path=bed_file_path)
+                if region[0] in chromosomes
+            ]
+        else:
+            lengths: Dict[str, int] = self.header(d4_file_path).lengths
+            regions: List[Region] = [
+                (chrom, 0, lengths[chrom]) for chrom in chromosomes if chrom in lengths
+            ]
+        regions_mean: array = self._regions_mean(
+            d4_file_path=d4_file_path, regions=regions
+        )
+        return aggregate_chromosomes_mean_coverage(
+            regions_stats=[
+                (chrom, start, stop, mean)
+                for (chrom, start, stop), mean in zip(regions, regions_mean)
+            ],
+            chromosomes=chromosomes,
+        )
+
+
+COVERAGE_BACKENDS: Dict[str, type] = {
+    D4TOOLS_BACKEND: D4toolsBackend,
+    PYD4_BACKEND: Pyd4Backend,
+}
+
+
+def _configured_coverage_backend() -> CoverageBackend:
+    """Instantiate the coverage backend set by the COVERAGE_BACKEND env variable."""
+    backend_name: str = os.getenv("COVERAGE_BACKEND", D4TOOLS_BACKEND).lower()
+    if backend_name not in COVERAGE_BACKENDS:
+        LOG.warning(
+            f"Unknown coverage backend '{backend_name}', using {D4TOOLS_BACKEND} instead."
+        )
+        backend_name = D4TOOLS_BACKEND
+    if backend_name == PYD4_BACKEND and D4File is None:
+        LOG.warning(
+            f"The pyd4 library is not installed, using {D4TOOLS_BACKEND} instead."
+        )
+        backend_name = D4TOOLS_BACKEND
+    return COVERAGE_BACKENDS[backend_name]()
+
+
+COVERAGE_BACKEND: CoverageBackend = _configured_coverage_backend()
+
+
+def get_coverage_backend() -> CoverageBackend:
+    """Return the coverage backend used by the app."""
+    return COVERAGE_BACKEND
+
+
+D4_HEADER_CACHE = LRUCache(max_size=int(os.getenv("D4_HEADER_CACHE_SIZE", 256)))
+
+
+def get_d4_header(d4_file_path: str) -> D4Header:
+    """Return the header of a d4 file, reading it only if the file changed since it was last read."""
+
+    fingerprint: tuple = file_fingerprint(d4_file_path)
+    header: Optional[D4Header] = D4_HEADER_CACHE.get(fingerprint)
+    if header is None:
+        header = get_coverage_backend().header(d4_file_path)
+        D4_HEADER_CACHE.set(fingerprint, header)
+    return header
+
+
+def get_chromosomes_prefix(d4_file_path: str) -> str:
+    """Extracts the prefix to be prepended to genomic intervals when calculating stats."""
+    return get_d4_header(d4_file_path).prefix
+
+
+CHROMOSOMES_MEAN_CACHE = LRUCache(
+    max_size=int(os.getenv("CHROMOSOMES_MEAN_CACHE_SIZE", 256))
+)
+
+
+def get_chromosomes_mean(
+    d4_file_path: str, chromosomes: List[str]
+) -> List[Tuple[str, float]]:
+    """Return the mean coverage over entire chromosomes of a d4 file.
+    The mean coverage of all chromosomes is computed in one go the first time a file is used, and reused until the file changes.
+    """
+    fingerprint: tuple = file_fingerprint(d4_file_path)
+    chromosomes_mean: Optional[Dict[str, float]] = CHROMOSOMES_MEAN_CACHE.get(
+        fingerprint
+    )
+    if chromosomes_mean is None:
+        chromosomes_mean = dict(
+            get_coverage_backend().chromosomes_mean(
+                d4_file_path=d4_file_path,
+                chromosomes=get_d4_header(d4_file_path).chromosomes,
+            )
+        )
+        CHROMOSOMES_MEAN_CACHE.set(fingerprint, chromosomes_mean)
+    return [
+        (chrom, chromosomes_mean[chrom])
+        for chrom in chromosomes
+        if chrom in chromosomes_mean
+    ]
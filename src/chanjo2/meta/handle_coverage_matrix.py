@@ -0,0 +1,118 @@
+from array import array
+from typing import Dict, List, Tuple, Union
+
+from chanjo2.meta.handle_bed import RegionSet, sort_interval_ids_coords
+from chanjo2.meta.handle_coverage_backend import get_chromosomes_prefix
+from chanjo2.meta.handle_d4 import set_interval_ids_coords
+from chanjo2.meta.handle_interval_stats import get_intervals_stats
+from chanjo2.models import SQLExon, SQLGene, SQLTranscript
+from chanjo2.models.pydantic_models import ReportQuerySample
+
+
+class CoverageMatrix:
+    """Mean coverage and coverage completeness of a list of intervals in a list of samples.
+
+    Stats are stored as one column for each sample, with one value for each interval of the matrix,
+    sorted by chromosome, start and stop. Completeness columns are stored by threshold.
+    """
+
+    def __init__(
+        self,
+        interval_ids: List[str],
+        samples: List[str],
+        completeness_thresholds: List[int],
+    ):
+        self.interval_ids: List[str] = interval_ids
+        self.samples: List[str] = samples
+        self.completeness_thresholds: List[int] = completeness_thresholds
+        self.mean_coverage: List[array] = []
+        self.completeness: Dict[int, List[array]] = {
+            threshold: [] for threshold in completeness_thresholds
+        }
+
+    def add_sample_columns(
+        self, intervals_mean: array, intervals_completeness: Dict[int, array]
+    ) -> None:
+        """Add the stats of the next sample of the matrix."""
+        self.mean_coverage.append(intervals_mean)
+        for threshold, columns in self.completeness.items():
+            columns.append(intervals_completeness[threshold])
+
+    def get_intervals_samples_stats(
+        self,
+    ) -> Dict[str, List[Tuple[str, float, Dict[int, float]]]]:
+        """Return, for each interval ID, the sample name, mean coverage and completeness by threshold of every sample.
+        This is the format of the stats shown on the gene and MANE overview pages."""
+        intervals_stats: Dict[str, List[Tuple[str, float, Dict[int, float]]]] = {
+            interval_id: [] for interval_id in self.interval_ids
+        }
+        for row, interval_id in enumerate(self.interval_ids):
+            for column, sample_name in enumerate(self.samples):
+                intervals_stats[interval_id].append(
+                    (
+                        sample_name,
+                        self.mean_coverage[column][row],
+                        {
+                            threshold: columns[column][row]
+                            for threshold, columns in self.completeness.items()
+                        },
+                    )
+                )
+        return intervals_stats
+
+    def to_json(self) -> Dict[str, Union[list, dict]]:
+        """Return the matrix as JSON columns: one list of values for each sample, with one value for each interval."""
+        return {
+            "interval_ids": self.interval_ids,
+            "samples": self.samples,
+            "completeness_thresholds": self.completeness_thresholds,
+            "mean_coverage": [column.tolist() for column in self.mean_coverage],
+            "completeness": {
+                str(threshold): [column.tolist() for column in columns]
+                for threshold, columns in self.completeness.items()
+            },
+        }
+
+
+def get_coverage_matrix(
+    sql_intervals: List[Union[SQLGene, SQLTranscript, SQLExon]],
+    samples: List[ReportQuerySample],
+    completeness_thresholds: List[int],
+) -> CoverageMatrix:
+    """Compute mean coverage and coverage completeness over a list of SQL intervals for a list of samples.
+    Intervals are deduplicated, sorted and written to a region set once, shared by all samples.
+    """
+    interval_ids_coords: Tuple[Tuple[str, Tuple[str, int, int]], ...] = tuple(
+        sort_interval_ids_coords(
+            set(set_interval_ids_coords(sql_intervals=sql_intervals))
+        )
+    )
+    matrix = CoverageMatrix(
+        interval_ids=[interval_id for interval_id, _ in interval_ids_coords],
+        samples=[sample.name for sample in samples],
+        completeness_thresholds=completeness_thresholds,
+    )
+    if not interval_ids_coords:
+        for _ in samples:
+            matrix.add_sample_columns(
+                intervals_mean=array("d"),
+                intervals_completeness={
+                    threshold: array("d") for threshold in completeness_thresholds
+                },
+            )
+        return matrix
+
+    with RegionSet(interval_ids_coords=interval_ids_coords) as region_set:
+        for sample in samples:
+            intervals_mean, intervals_completeness = get_intervals_stats(
+                d4_file_path=sample.coverage_file_path,
+                thresholds=completeness_thresholds,
+                region_set=region_set,
+                chrom_prefix=get_chromosomes_prefix(sample.coverage_file_path),
+            )
+            matrix.add_sample_columns(
+                intervals_mean=intervals_mean,
+                intervals_completeness=intervals_completeness,
+            )
+
+    return matrix
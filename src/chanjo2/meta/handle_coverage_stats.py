@@ -1,9 +1,12 @@
 import subprocess
-import tempfile
+from array import array
 from collections import defaultdict
-from typing import List, Optional, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
 
-from chanjo2.constants import CHROMOSOMES
+from chanjo2.meta.handle_completeness_stats import stream_d4tools_perc_cov
+from chanjo2.meta.handle_d4tools_scheduler import D4TOOLS_SCHEDULER, HIGH_PRIORITY
+from chanjo2.meta.utils import stream_d4tools_stat
 
 CHROM_INDEX = 0
 START_INDEX = 1
@@ -11,61 +14,117 @@ STOP_INDEX = 2
 STATS_MEAN_COVERAGE_INDEX = 3
 
 
-def get_chromosomes_prefix(d4_file_path: str) -> str:
-    """Extracts the prefix to be prepended to genomic intervals when calculating stats."""
+class D4Header(NamedTuple):
+    """Genome dictionary stored in the header of a d4 file."""
 
-    # SonarCloud: d4_file_path is validated upstream
-    result = subprocess.run(
-        ["d4tools", "view", "-g", d4_file_path],
-        capture_output=True,
-        text=True,
-        check=True,
-    )
-    first_line = result.stdout.splitlines()[0] if result.stdout else ""
-
-    if "chr" in first_line:
-        return "chr"
-    return ""
+    chromosomes: List[str]
+    lengths: Dict[str, int]
+    prefix: str
 
 
-def get_d4tools_intervals_mean_coverage(
-    d4_file_path: str, interval_ids_coords: List[Tuple[str, tuple]], chrom_prefix: str
-) -> List[float]:
-    """Return the mean value over a list of intervals of a d4 file."""
+def get_d4tools_header(d4_file_path: str) -> D4Header:
+    """Read the chromosomes and their lengths from the header of a d4 file."""
 
-    if interval_ids_coords:
-        bed_lines = [
-            f"{chrom_prefix}{coords[CHROM_INDEX]}\t{coords[START_INDEX]}\t{coords[STOP_INDEX]}"
-            for _, coords in interval_ids_coords
-        ]
-        # Write genomic intervals to a temporary file
-        with tempfile.NamedTemporaryFile(mode="w") as intervals_bed:
-            intervals_bed.write("\n".join(bed_lines))
-            intervals_bed.flush()
+    # SonarCloud: d4_file_path is validated upstream
+    with D4TOOLS_SCHEDULER.slots(priority=HIGH_PRIORITY):
+        result = subprocess.run(
+            ["d4tools", "view", "-g", d4_file_path],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    chromosomes: List[str] = []
+    lengths: Dict[str, int] = {}
+    for line in result.stdout.splitlines():
+        chrom_data: List[str] = line.rstrip().split("\t")
+        chromosomes.append(chrom_data[CHROM_INDEX])
+        if len(chrom_data) > 1:
+            lengths[chrom_data[CHROM_INDEX]] = int(chrom_data[1])
 
-            return get_d4tools_intervals_coverage(
-                d4_file_path=d4_file_path, bed_file_path=intervals_bed.name
-            )
-    chromosomes_mean_cov = get_d4tools_chromosome_mean_coverage(
-        d4_file_path=d4_file_path, chromosomes=CHROMOSOMES
+    first_line = result.stdout.splitlines()[0] if result.stdout else ""
+    return D4Header(
+        chromosomes=chromosomes,
+        lengths=lengths,
+        prefix="chr" if "chr" in first_line else "",
     )
 
-    return [chrom_cov[1] for chrom_cov in chromosomes_mean_cov]
+
+def get_d4tools_mean_cmd(d4_file_path: str, bed_file_path: str) -> List[str]:
+    """Return the d4tools command computing the mean coverage over the intervals of a bed file."""
+    return [
+        "d4tools",
+        "stat",
+        "--region",
+        bed_file_path,
+        d4_file_path,
+        "--stat",
+        "mean",
+    ]
 
 
-def get_d4tools_intervals_coverage(
-    d4_file_path: str, bed_file_path: str
-) -> List[float]:
+def stream_d4tools_mean(d4_file_path: str, bed_file_path: str) -> array:
+    """Run a d4tools stat mean command and return a column with the mean coverage of every interval of a bed file."""
+    return stream_d4tools_stat(
+        command=get_d4tools_mean_cmd(
+            d4_file_path=d4_file_path, bed_file_path=bed_file_path
+        ),
+        nr_stats=1,
+    )[3][0]
+
+
+def get_d4tools_intervals_coverage(d4_file_path: str, bed_file_path: str) -> array:
     """Return the coverage for intervals of a d4 file that are found in a bed file."""
 
-    d4tools_stats_mean_cmd: str = subprocess.check_output(
-        ["d4tools", "stat", "--region", bed_file_path, d4_file_path, "--stat", "mean"],
-        text=True,
-    )
-    return [
-        float(line.rstrip().split("\t")[3])
-        for line in d4tools_stats_mean_cmd.splitlines()
-    ]
+    with D4TOOLS_SCHEDULER.slots():
+        return stream_d4tools_mean(
+            d4_file_path=d4_file_path, bed_file_path=bed_file_path
+        )
+
+
+def get_d4tools_intervals_stats(
+    d4_file_path: str, bed_file_path: str, completeness_thresholds: List[int]
+) -> Tuple[array, Dict[int, array]]:
+    """Return mean coverage and coverage completeness by threshold over all intervals of a bed file.
+
+    d4tools computes one statistic per invocation, so the mean and the perc_cov scans run side by side
+    over the same bed file, each parsed as it's produced by its own thread. Their two slots are requested at once,
+    so that no request holds one slot while waiting for the other. When only one d4tools process
+    may run at a time, they run one after the other in one slot instead.
+    """
+    if not completeness_thresholds:
+        return (
+            get_d4tools_intervals_coverage(
+                d4_file_path=d4_file_path, bed_file_path=bed_file_path
+            ),
+            {},
+        )
+
+    if D4TOOLS_SCHEDULER.max_processes < 2:
+        with D4TOOLS_SCHEDULER.slots():
+            intervals_mean: array = stream_d4tools_mean(
+                d4_file_path=d4_file_path, bed_file_path=bed_file_path
+            )
+            intervals_completeness: Dict[int, array] = stream_d4tools_perc_cov(
+                d4_file_path=d4_file_path,
+                bed_file_path=bed_file_path,
+                completeness_thresholds=completeness_thresholds,
+            )
+        return intervals_mean, intervals_completeness
+
+    with D4TOOLS_SCHEDULER.slots(nr_processes=2):
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            completeness_future: Future = executor.submit(
+                stream_d4tools_perc_cov,
+                d4_file_path=d4_file_path,
+                bed_file_path=bed_file_path,
+                completeness_thresholds=completeness_thresholds,
+            )
+            intervals_mean: array = stream_d4tools_mean(
+                d4_file_path=d4_file_path, bed_file_path=bed_file_path
+            )
+            intervals_completeness: Dict[int, array] = completeness_future.result()
+
+    return intervals_mean, intervals_completeness
 
 
 def get_d4tools_chromosome_mean_coverage(
@@ -74,29 +133,37 @@ def get_d4tools_chromosome_mean_coverage(
     """Return mean coverage over entire chromosomes."""
 
     if bed_file_path:
-        chromosomes_stats_mean_cmd: List[str] = subprocess.check_output(
-            [
-                "d4tools",
-                "stat",
-                "--region",
-                bed_file_path,
-                d4_file_path,
-                "--stat",
-                "mean",
-            ],
-            text=True,
-        ).splitlines()
+        command: List[str] = [
+            "d4tools",
+            "stat",
+            "--region",
+            bed_file_path,
+            d4_file_path,
+            "--stat",
+            "mean",
+        ]
     else:
-        chromosomes_stats_mean_cmd: List[str] = subprocess.check_output(
-            ["d4tools", "stat", "-s" "mean", d4_file_path],
-            text=True,
-        ).splitlines()
+        command: List[str] = ["d4tools", "stat", "-s" "mean", d4_file_path]
+
+    with D4TOOLS_SCHEDULER.slots():
+        chroms, starts, stops, (means,) = stream_d4tools_stat(
+            command=command, nr_stats=1, with_coords=True
+        )
+    return aggregate_chromosomes_mean_coverage(
+        regions_stats=zip(chroms, starts, stops, means),
+        chromosomes=chromosomes,
+    )
+
+
+def aggregate_chromosomes_mean_coverage(
+    regions_stats: Iterable[Tuple[str, int, int, float]], chromosomes: List[str]
+) -> List[Tuple[str, float]]:
+    """Return the mean coverage of each chromosome from the mean coverage over its regions, weighted by region length."""
 
     total_cov = defaultdict(float)
     total_len = defaultdict(int)
 
-    for line in chromosomes_stats_mean_cmd:
-        stats_data = line.split("\t")
+    for stats_data in regions_stats:
         chrom = stats_data[CHROM_INDEX]
         if chrom not in chromosomes:
             continue
@@ -1,21 +1,19 @@
 import logging
-import tempfile
+from array import array
 from typing import Dict, List, Optional, Tuple, Union
 
-from chanjo2.meta.handle_bed import sort_interval_ids_coords
-from chanjo2.meta.handle_completeness_stats import (
-    get_completeness_stats,
-    get_d4tools_intervals_completeness,
-)
-from chanjo2.meta.handle_coverage_stats import (
-    get_chromosomes_prefix,
-    get_d4tools_chromosome_mean_coverage,
-    get_d4tools_intervals_coverage,
-    get_d4tools_intervals_mean_coverage,
+from chanjo2.meta.handle_annotation_cache import GENE_TYPES
+from chanjo2.meta.handle_bed import RegionSet, sort_interval_ids_coords
+from chanjo2.meta.handle_coverage_backend import (
+    get_chromosomes_mean,
+    get_coverage_backend,
 )
+from chanjo2.meta.handle_coverage_stats import aggregate_chromosomes_mean_coverage
+from chanjo2.meta.handle_interval_stats import get_intervals_stats
+from chanjo2.meta.handle_report_table import IncompleteCoverageRows, ReportIntervals
 from chanjo2.meta.utils import get_mean
 from chanjo2.models import SQLExon, SQLGene, SQLTranscript
-from chanjo2.models.pydantic_models import ReportQuerySample, Sex
+from chanjo2.models.pydantic_models import Sex
 
 LOG = logging.getLogger(__name__)
 
@@ -27,7 +25,7 @@ def set_interval_ids_coords(
 
     if not sql_intervals:
         return []
-    if isinstance(sql_intervals[0], SQLGene):
+    if isinstance(sql_intervals[0], GENE_TYPES):
         return [
             (ensembl_id, (interval.chromosome, interval.start, interval.stop))
             for interval in sql_intervals
@@ -40,125 +38,151 @@ def set_interval_ids_coords(
         ]
 
 
-def get_report_sample_interval_coverage(
-    d4_file_path: str,
-    sample_name: str,
-    gene_ids_mapping: Dict[str, dict],
+def get_sql_intervals_region_set(
     sql_intervals: List[Union[SQLGene, SQLTranscript, SQLExon]],
-    completeness_thresholds: List[Optional[int]],
-    default_threshold: int,
-    report_data: dict,
-) -> None:
-    """Compute stats to populate a coverage report for one sample."""
-
-    # Compute intervals coverage completeness
-    interval_ids_coords: List[Tuple[str, Tuple[str, int, int]]] = (
-        set_interval_ids_coords(sql_intervals=sql_intervals)
+) -> RegionSet:
+    """Returns the intervals IDs and coordinates of a list of SQL intervals, sorted by chromosome, start and stop, as a region set."""
+    return RegionSet(
+        interval_ids_coords=sort_interval_ids_coords(
+            set_interval_ids_coords(sql_intervals=sql_intervals)
+        )
     )
-    interval_ids_coords = sort_interval_ids_coords(interval_ids_coords)
 
-    chrom_prefix: str = get_chromosomes_prefix(d4_file_path)
 
-    # Compute intervals coverage
-    intervals_coverage: List[float] = get_d4tools_intervals_mean_coverage(
-        d4_file_path=d4_file_path,
-        interval_ids_coords=interval_ids_coords,
-        chrom_prefix=chrom_prefix,
-    )
-    completeness_row_dict: dict = {"mean_coverage": get_mean(intervals_coverage)}
+def get_sample_intervals_and_sex_stats(
+    d4_file_path: str,
+    thresholds: List[int],
+    region_set: RegionSet,
+    stats_region_set: RegionSet,
+    chrom_prefix: str,
+) -> Tuple[array, Dict[int, array], List[Tuple[str, float]]]:
+    """Compute coverage stats over the intervals of a region set and mean coverage over the sex chromosomes of a sample.
+
+    stats_region_set contains the intervals of region_set followed by regions of the sex chromosomes,
+    which are all computed in the same pass over the d4 file and split afterwards.
+    If stats_region_set contains no other regions, mean coverage over entire sex chromosomes is used instead.
+    """
+    sex_chromosomes: List[str] = [f"{chrom_prefix}X", f"{chrom_prefix}Y"]
+    nr_intervals: int = len(region_set)
+
+    if len(stats_region_set) == nr_intervals:
+        intervals_mean, intervals_completeness = get_intervals_stats(
+            d4_file_path=d4_file_path,
+            thresholds=thresholds,
+            region_set=region_set,
+            chrom_prefix=chrom_prefix,
+        )
+        return (
+            intervals_mean,
+            intervals_completeness,
+            get_chromosomes_mean(
+                d4_file_path=d4_file_path, chromosomes=sex_chromosomes
+            ),
+        )
 
-    # Compute intervals coverage completeness
-    intervals_coverage_completeness: Dict[str, dict] = get_completeness_stats(
-        d4_file_path=d4_file_path,
-        thresholds=completeness_thresholds,
-        interval_ids_coords=interval_ids_coords,
-        chrom_prefix=chrom_prefix,
+    if region_set:
+        stats_mean, stats_completeness = get_intervals_stats(
+            d4_file_path=d4_file_path,
+            thresholds=thresholds,
+            region_set=stats_region_set,
+            chrom_prefix=chrom_prefix,
+        )
+        intervals_mean: array = stats_mean[:nr_intervals]
+        intervals_completeness: Dict[int, array] = {
+            threshold: column[:nr_intervals]
+            for threshold, column in stats_completeness.items()
+        }
+    else:  # No intervals, stats are computed over entire chromosomes
+        intervals_mean, intervals_completeness = get_intervals_stats(
+            d4_file_path=d4_file_path,
+            thresholds=thresholds,
+            region_set=region_set,
+            chrom_prefix=chrom_prefix,
+        )
+        stats_mean, _ = get_intervals_stats(
+            d4_file_path=d4_file_path,
+            thresholds=[],
+            region_set=stats_region_set,
+            chrom_prefix=chrom_prefix,
+        )
+
+    sex_chroms_coverage: List[Tuple[str, float]] = aggregate_chromosomes_mean_coverage(
+        regions_stats=(
+            (f"{chrom_prefix}{chrom}", start, stop, mean)
+            for (_, (chrom, start, stop)), mean in zip(
+                stats_region_set.interval_ids_coords[nr_intervals:],
+                stats_mean[nr_intervals:],
+            )
+        ),
+        chromosomes=sex_chromosomes,
     )
+    return intervals_mean, intervals_completeness, sex_chroms_coverage
 
-    interval_ids = set()
-    thresholds_dict = {threshold: [] for threshold in completeness_thresholds}
-    incomplete_coverages_rows: List[Tuple[int, str, str, str, float]] = []
-    nr_intervals_covered_under_custom_threshold: int = 0
-    genes_covered_under_custom_threshold = set()
 
-    for interval in sql_intervals:
+def get_report_sample_interval_coverage(
+    sample_name: str,
+    report_intervals: ReportIntervals,
+    region_set: RegionSet,
+    intervals_coverage: array,
+    intervals_coverage_completeness: Dict[int, array],
+    completeness_thresholds: List[Optional[int]],
+    default_threshold: int,
+    report_data: dict,
+) -> None:
+    """Populate a coverage report with the stats computed over the intervals of a region set for one sample."""
 
-        if hasattr(interval, "ensembl_ids"):
-            ensembl_ids = interval.ensembl_ids
-        else:
-            ensembl_ids = [interval.ensembl_id]
-
-        for ensembl_id in ensembl_ids:
-
-            if ensembl_id in interval_ids:
-                continue
-            for threshold in completeness_thresholds:
-                interval_coverage_at_threshold: float = intervals_coverage_completeness[
-                    ensembl_id
-                ][threshold]
-                thresholds_dict[threshold].append(interval_coverage_at_threshold)
-
-                # Collect intervals which are not completely covered at the custom threshold
-                if (
-                    threshold == default_threshold
-                    and interval_coverage_at_threshold < 1
-                ):
-                    nr_intervals_covered_under_custom_threshold += 1
-                    interval_ensembl_gene: str = (
-                        ensembl_id
-                        if ensembl_id.startswith("ENSG")
-                        else interval.ensembl_gene_id
-                    )
-                    interval_hgnc_id: int = gene_ids_mapping[interval_ensembl_gene][
-                        "hgnc_id"
-                    ]
-                    interval_hgnc_symbol: str = gene_ids_mapping[interval_ensembl_gene][
-                        "hgnc_symbol"
-                    ]
-                    genes_covered_under_custom_threshold.add(interval_hgnc_symbol)
-                    incomplete_coverages_rows.append(
-                        (
-                            interval_hgnc_symbol,
-                            interval_hgnc_id,
-                            ensembl_id,
-                            (
-                                {
-                                    "mane_select": interval.refseq_mane_select,
-                                    "mane_plus_clinical": interval.refseq_mane_plus_clinical,
-                                    "mrna": interval.refseq_mrna,
-                                }
-                                if isinstance(interval, SQLTranscript)
-                                else {}
-                            ),
-                            sample_name,
-                            round(interval_coverage_at_threshold * 100, 2),
-                        )
-                    )
-
-            interval_ids.add(ensembl_id)
+    completeness_row_dict: dict = {"mean_coverage": get_mean(intervals_coverage)}
 
+    # Each interval ID is counted once, at its row in the completeness columns
+    interval_rows = array(
+        "q", region_set.interval_indexes.values() if region_set else []
+    )
     for threshold in completeness_thresholds:
-        if thresholds_dict[threshold]:
-
+        threshold_completeness = intervals_coverage_completeness.get(threshold)
+        if threshold_completeness and interval_rows:
             completeness_row_dict[f"completeness_{threshold}"] = round(
-                get_mean(float_list=thresholds_dict[threshold], round_by=None) * 100, 2
+                get_mean(
+                    float_list=array(
+                        "d", map(threshold_completeness.__getitem__, interval_rows)
+                    ),
+                    round_by=None,
+                )
+                * 100,
+                2,
             )
 
+    # Collect intervals which are not completely covered at the custom threshold
+    incomplete_coverage_rows = IncompleteCoverageRows(report_intervals=report_intervals)
+    default_completeness = (
+        intervals_coverage_completeness.get(default_threshold)
+        if default_threshold in completeness_thresholds
+        else None
+    )
+    if default_completeness:
+        incomplete_coverage_rows.add_sample(
+            sample_name=sample_name, default_completeness=default_completeness
+        )
+    nr_intervals_covered_under_custom_threshold: int = len(incomplete_coverage_rows)
+
     report_data["completeness_rows"].append((sample_name, completeness_row_dict))
-    report_data["incomplete_coverage_rows"] += incomplete_coverages_rows
-    if interval_ids_coords:
+    report_data["incomplete_coverage_rows"] += incomplete_coverage_rows
+    if region_set:
         fully_covered_intervals_percent = round(
             100
-            * (len(interval_ids) - nr_intervals_covered_under_custom_threshold)
-            / len(interval_ids),
+            * (len(interval_rows) - nr_intervals_covered_under_custom_threshold)
+            / len(interval_rows),
             2,
         )
         report_data["default_level_completeness_rows"].append(
             (
                 sample_name,
                 fully_covered_intervals_percent,
-                f"{nr_intervals_covered_under_custom_threshold}/{len(interval_ids)}",
-                genes_covered_under_custom_threshold,
+                f"{nr_intervals_covered_under_custom_threshold}/{len(interval_rows)}",
+                (
+                    incomplete_coverage_rows.sample_gene_symbols(sample_name)
+                    if default_completeness
+                    else []
+                ),
             )
         )
 
@@ -186,12 +210,25 @@ def get_samples_sex_metrics(
 ) -> Dict:
     """Compute coverage over sex chromosomes and predicted sex."""
 
-    sex_chroms_coverage: List[Tuple[str, float]] = get_d4tools_chromosome_mean_coverage(
-        d4_file_path=d4_file_path,
-        chromosomes=[f"{chr_prefix}X", f"{chr_prefix}Y"],
-        bed_file_path=bed_file_path,
-    )
+    sex_chromosomes: List[str] = [f"{chr_prefix}X", f"{chr_prefix}Y"]
+    if bed_file_path:
+        sex_chroms_coverage: List[
+            Tuple[str, float]
+        ] = get_coverage_backend().chromosomes_mean(
+            d4_file_path=d4_file_path,
+            chromosomes=sex_chromosomes,
+            bed_file_path=bed_file_path,
+        )
+    else:  # Mean coverage over entire chromosomes is cached for each d4 file
+        sex_chroms_coverage: List[Tuple[str, float]] = get_chromosomes_mean(
+            d4_file_path=d4_file_path, chromosomes=sex_chromosomes
+        )
+
+    return get_sex_metrics(sex_chroms_coverage=sex_chroms_coverage)
 
+
+def get_sex_metrics(sex_chroms_coverage: List[Tuple[str, float]]) -> Dict:
+    """Return coverage over sex chromosomes and predicted sex, given the mean coverage over the X and the Y chromosomes."""
     return {
         "x_coverage": round(sex_chroms_coverage[0][1], 1),
         "y_coverage": round(sex_chroms_coverage[1][1], 1),
@@ -199,51 +236,3 @@ def get_samples_sex_metrics(
             x_cov=sex_chroms_coverage[0][1], y_cov=sex_chroms_coverage[1][1]
         ),
     }
-
-
-def get_gene_overview_stats(
-    sql_intervals: List[SQLTranscript],
-    samples: List[ReportQuerySample],
-    completeness_thresholds: List[int],
-) -> Dict[str, list]:
-    """Returns stats to be included in the gene overview page."""
-    interval_ids_coords: List[Tuple[str, Tuple[str, int, int]]] = (
-        set_interval_ids_coords(sql_intervals=sql_intervals)
-    )
-    interval_ids_coords = tuple(
-        sort_interval_ids_coords(set(interval_ids_coords))
-    )  # removes duplicates and orders intervals by chromosome, start and stop
-    transcripts_stats = {interval_id: [] for interval_id, _ in interval_ids_coords}
-
-    chrom_prefix: str = get_chromosomes_prefix(
-        samples[0].coverage_file_path
-    )  # Assume they are all using the same reference
-
-    # create a temp bed file containing transcripts coordinates
-    bed_lines = [
-        f"{chrom_prefix}{coords[0]}\t{coords[1]}\t{coords[2]}"
-        for _, coords in interval_ids_coords
-    ]
-    temp_bed_file = tempfile.NamedTemporaryFile()
-    with open(temp_bed_file.name, "w") as intervals_bed:
-        intervals_bed.write("\n".join(bed_lines))
-        intervals_bed.flush()
-
-    for sample in samples:
-        transcripts_coverage = get_d4tools_intervals_coverage(
-            d4_file_path=sample.coverage_file_path, bed_file_path=temp_bed_file.name
-        )
-        transcripts_completeness = get_d4tools_intervals_completeness(
-            d4_file_path=sample.coverage_file_path,
-            bed_file_path=temp_bed_file.name,
-            completeness_thresholds=completeness_thresholds,
-        )
-        for idx, transcripts_coords in enumerate(interval_ids_coords):
-            append_tuple = (
-                sample.name,
-                transcripts_coverage[idx],
-                transcripts_completeness[idx],
-            )
-            transcripts_stats[transcripts_coords[0]].append(append_tuple)
-
-    return transcripts_stats
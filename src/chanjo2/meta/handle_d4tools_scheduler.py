@@ -0,0 +1,157 @@
+import fcntl
+import heapq
+import itertools
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import IO, Dict, Iterator, List, Optional, Tuple, Union
+
+HIGH_PRIORITY = 0
+DEFAULT_PRIORITY = 10
+SLOT_POLL_INTERVAL = (
+    0.05  # Seconds between attempts to get slots held by other app workers
+)
+
+
+def default_max_processes() -> int:
+    """Max number of d4tools processes running at the same time on the host, set by the D4TOOLS_MAX_PROCESSES env variable."""
+    if os.getenv("D4TOOLS_MAX_PROCESSES"):
+        return max(1, int(os.getenv("D4TOOLS_MAX_PROCESSES")))
+    return os.cpu_count() or 4
+
+
+def default_slots_dir() -> str:
+    """Folder containing the lock files shared by all app workers, set by the D4TOOLS_SLOTS_DIR env variable."""
+    return os.getenv("D4TOOLS_SLOTS_DIR") or os.path.join(
+        tempfile.gettempdir(), "chanjo2_d4tools_slots"
+    )
+
+
+class D4toolsScheduler:
+    """Limits the number of d4tools processes running at the same time across all app workers of a host.
+
+    Each running process holds a slot: an exclusive lock on one of max_processes lock files, shared by all workers.
+    Within a worker, waiting requests are served by priority (lower values first) and then in order of arrival.
+    Slots are not re-entrant: a thread holding slots can't request more, since it could wait forever for its own slots.
+    Callers needing several processes request all their slots at once.
+    """
+
+    def __init__(self, max_processes: int, slots_dir: str):
+        self.max_processes: int = max_processes
+        self.slots_dir: str = slots_dir
+        os.makedirs(self.slots_dir, exist_ok=True)
+
+        self._condition = threading.Condition()
+        self._queue: List[Tuple[int, int]] = []
+        self._tickets: Iterator[int] = itertools.count()
+        self._nr_running: int = 0
+        self._nr_served: int = 0
+        self._total_wait: float = 0.0
+        self._max_wait: float = 0.0
+        self._holders = threading.local()
+
+    def _try_acquire_slots(self, nr_slots: int) -> Optional[List[IO]]:
+        """Lock nr_slots free slot files without waiting. Return the locked files or None if not enough slots are free."""
+        locked_files: List[IO] = []
+        try:
+            for slot_index in range(self.max_processes):
+                slot_file: IO = open(
+                    os.path.join(self.slots_dir, f"slot_{slot_index}.lock"), "a"
+                )
+                try:
+                    fcntl.flock(slot_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    slot_file.close()
+                    continue
+                locked_files.append(slot_file)
+                if len(locked_files) == nr_slots:
+                    return locked_files
+        except BaseException:
+            self._release_slots(locked_files)
+            raise
+
+        self._release_slots(locked_files)
+        return None
+
+    @staticmethod
+    def _release_slots(slot_files: List[IO]) -> None:
+        for slot_file in slot_files:
+            fcntl.flock(slot_file.fileno(), fcntl.LOCK_UN)
+            slot_file.close()
+
+    @contextmanager
+    def slots(
+        self, nr_processes: int = 1, priority: int = DEFAULT_PRIORITY
+    ) -> Iterator[None]:
+        """Wait until nr_processes d4tools processes can be started, and keep their slots until the context is exited.
+
+        No more than max_processes slots are held, so callers wanting more processes than that should start them one after the other.
+        A request failing or interrupted while waiting leaves the queue, so that the following ones are still served.
+        Raises a RuntimeError if the calling thread already holds slots.
+        """
+        if getattr(self._holders, "nr_slots", 0):
+            raise RuntimeError(
+                "d4tools slots are not re-entrant: this thread already holds slots, request all slots at once"
+            )
+        nr_slots: int = min(nr_processes, self.max_processes)
+        entry: Tuple[int, int] = (priority, next(self._tickets))
+        queued_at: float = time.monotonic()
+
+        with self._condition:
+            heapq.heappush(self._queue, entry)
+            try:
+                while True:
+                    if self._queue[0] == entry:
+                        slot_files: Optional[List[IO]] = self._try_acquire_slots(
+                            nr_slots
+                        )
+                        if slot_files:
+                            heapq.heappop(self._queue)
+                            break
+                        # Slots are held by this or another worker, try again shortly
+                        self._condition.wait(timeout=SLOT_POLL_INTERVAL)
+                    else:
+                        self._condition.wait()
+            except BaseException:
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                self._condition.notify_all()
+                raise
+
+            waited: float = time.monotonic() - queued_at
+            self._nr_running += nr_slots
+            self._nr_served += 1
+            self._total_wait += waited
+            self._max_wait = max(self._max_wait, waited)
+            self._condition.notify_all()
+
+        self._holders.nr_slots = nr_slots
+        try:
+            yield
+        finally:
+            self._holders.nr_slots = 0
+            self._release_slots(slot_files)
+            with self._condition:
+                self._nr_running -= nr_slots
+                self._condition.notify_all()
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        """Return the current queue depth and the wait time statistics of this app worker."""
+        with self._condition:
+            return {
+                "max_processes": self.max_processes,
+                "running_processes": self._nr_running,
+                "queue_depth": len(self._queue),
+                "served_requests": self._nr_served,
+                "mean_wait_seconds": (
+                    self._total_wait / self._nr_served if self._nr_served else 0.0
+                ),
+                "max_wait_seconds": self._max_wait,
+            }
+
+
+D4TOOLS_SCHEDULER = D4toolsScheduler(
+    max_processes=default_max_processes(), slots_dir=default_slots_dir()
+)
@@ -0,0 +1,53 @@
+import os
+from typing import Dict, Iterator
+
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+from fastapi.templating import Jinja2Templates
+
+TEMPLATE_RENDERING = "template"
+STREAMED_RENDERING = "stream"
+HTML_STREAM_CHUNK_SIZE = (
+    64 * 1024
+)  # Min number of characters sent at a time by streamed pages
+
+
+def get_html_rendering() -> str:
+    """Return how report pages are rendered, set by the REPORT_HTML_RENDERING env variable:
+    as a whole before being sent (template, default) or while being sent (stream)."""
+    return os.getenv("REPORT_HTML_RENDERING", TEMPLATE_RENDERING).lower()
+
+
+def get_html_chunks(
+    fragments: Iterator[str], chunk_size: int = HTML_STREAM_CHUNK_SIZE
+) -> Iterator[str]:
+    """Join the small fragments of text produced by a template into chunks of at least chunk_size characters."""
+    chunk: list = []
+    nr_chars: int = 0
+    for fragment in fragments:
+        chunk.append(fragment)
+        nr_chars += len(fragment)
+        if nr_chars >= chunk_size:
+            yield "".join(chunk)
+            chunk, nr_chars = [], 0
+    if chunk:
+        yield "".join(chunk)
+
+
+def get_html_response(
+    templates: Jinja2Templates, request: Request, name: str, context: Dict
+) -> Response:
+    """Return the response rendering a template. When pages are streamed, the beginning of the page is sent
+    while its following parts are still being rendered, instead of rendering the whole page into one string first.
+    """
+    if get_html_rendering() != STREAMED_RENDERING:
+        return templates.TemplateResponse(request=request, name=name, context=context)
+
+    template = templates.get_template(name)
+    return StreamingResponse(
+        get_html_chunks(
+            fragments=template.generate({"request": request, **context}),
+            chunk_size=HTML_STREAM_CHUNK_SIZE,
+        ),
+        media_type="text/html",
+    )
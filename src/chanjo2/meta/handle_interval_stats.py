@@ -0,0 +1,131 @@
+import os
+from array import array
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from chanjo2.constants import CHROMOSOMES
+from chanjo2.meta.handle_bed import RegionSet
+from chanjo2.meta.handle_cache import LRUCache, file_fingerprint
+from chanjo2.meta.handle_coverage_backend import (
+    get_chromosomes_mean,
+    get_coverage_backend,
+)
+from chanjo2.meta.handle_summary_index import SummaryIndex, get_summary_index
+from chanjo2.models.pydantic_models import is_valid_url
+
+DEPTH_HISTOGRAM_MAX_DEPTH = int(os.getenv("DEPTH_HISTOGRAM_MAX_DEPTH", 0))
+DEPTH_HISTOGRAM_CACHE = LRUCache(
+    max_size=int(os.getenv("DEPTH_HISTOGRAM_CACHE_SIZE", 8))
+)
+
+
+class DepthHistogram(NamedTuple):
+    """Mean coverage of the intervals of a region set and their cumulative depth histogram:
+    for each depth from 1 to max depth, the fraction of bases of every interval covered at least at that depth.
+    Fractions are stored as single precision floats to keep cached histograms small.
+    """
+
+    intervals_mean: array
+    cumulative_depths: List[array]
+
+    def completeness(self, thresholds: List[int]) -> Dict[int, array]:
+        """Return the coverage completeness columns of the intervals at the given thresholds, which must not exceed the max depth."""
+        nr_intervals: int = len(self.intervals_mean)
+        return {
+            threshold: (
+                array("d", self.cumulative_depths[threshold - 1])
+                if threshold > 0
+                else array("d", [1.0]) * nr_intervals
+            )
+            for threshold in thresholds
+        }
+
+
+def get_depth_histogram(
+    d4_file_path: str, region_set: RegionSet, chrom_prefix: str, max_depth: int
+) -> DepthHistogram:
+    """Return the cumulative depth histogram over the intervals of a region set, scanning the d4 file only if it's not cached."""
+
+    cache_key: tuple = (
+        file_fingerprint(d4_file_path),
+        region_set.digest,
+        chrom_prefix,
+        max_depth,
+    )
+    histogram: Optional[DepthHistogram] = DEPTH_HISTOGRAM_CACHE.get(cache_key)
+    if histogram is None:
+        depths: List[int] = list(range(1, max_depth + 1))
+        intervals_mean, intervals_completeness = get_coverage_backend().intervals_stats(
+            d4_file_path=d4_file_path,
+            region_set=region_set,
+            chrom_prefix=chrom_prefix,
+            thresholds=depths,
+        )
+        histogram = DepthHistogram(
+            intervals_mean=intervals_mean,
+            cumulative_depths=[
+                array("f", intervals_completeness[depth]) for depth in depths
+            ],
+        )
+        DEPTH_HISTOGRAM_CACHE.set(cache_key, histogram)
+    return histogram
+
+
+def get_intervals_stats(
+    d4_file_path: str,
+    thresholds: List[int],
+    region_set: RegionSet,
+    chrom_prefix: str,
+) -> Tuple[array, Dict[int, array]]:
+    """Compute mean coverage and coverage completeness over the intervals of a region set for a d4 file.
+
+    Returns the mean coverage of each interval and, for each threshold, the coverage completeness of each interval.
+    Both are columns with one value per row of the region set, in the same order as its intervals.
+    Stats are read from the summary index of the d4 file when it's up to date and contains all intervals and thresholds.
+    Otherwise, when a max depth is set with the DEPTH_HISTOGRAM_MAX_DEPTH env variable, thresholds up to that depth are
+    derived from a cached depth histogram, so that any set of thresholds is served by the same scan of the d4 file.
+    Queries without thresholds, and remote d4 files, whose completeness can't be computed, never scan a histogram.
+    """
+
+    if not region_set:
+        chromosomes_mean_cov = get_chromosomes_mean(
+            d4_file_path=d4_file_path, chromosomes=CHROMOSOMES
+        )
+        return array("d", [chrom_cov[1] for chrom_cov in chromosomes_mean_cov]), {}
+
+    summary_index: Optional[SummaryIndex] = get_summary_index(d4_file_path)
+    if summary_index:
+        index_stats: Optional[Tuple[array, Dict[int, array]]] = (
+            summary_index.intervals_stats(region_set=region_set, thresholds=thresholds)
+        )
+        if index_stats:
+            return index_stats
+
+    if (
+        thresholds
+        and DEPTH_HISTOGRAM_MAX_DEPTH > 0
+        and max(thresholds) <= DEPTH_HISTOGRAM_MAX_DEPTH
+        and is_valid_url(d4_file_path) is False
+    ):
+        histogram: DepthHistogram = get_depth_histogram(
+            d4_file_path=d4_file_path,
+            region_set=region_set,
+            chrom_prefix=chrom_prefix,
+            max_depth=DEPTH_HISTOGRAM_MAX_DEPTH,
+        )
+        return histogram.intervals_mean, histogram.completeness(thresholds)
+
+    return get_coverage_backend().intervals_stats(
+        d4_file_path=d4_file_path,
+        region_set=region_set,
+        chrom_prefix=chrom_prefix,
+        thresholds=thresholds,
+    )
+
+
+def get_interval_completeness(
+    intervals_completeness: Dict[int, array], row: int
+) -> Dict[int, float]:
+    """Return the coverage completeness of one interval by threshold, from the completeness columns of a region set."""
+    return {
+        threshold: column[row] for threshold, column in intervals_completeness.items()
+    }
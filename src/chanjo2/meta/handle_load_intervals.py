@@ -1,6 +1,10 @@
+import json
 import logging
-from typing import Iterator, List, Optional, Union
+import os
+import tempfile
+from typing import Dict, Iterator, List, Optional, Tuple, Union
 
+from sqlalchemy import Table
 from sqlalchemy.orm import Session
 from tqdm import tqdm
 
@@ -11,24 +15,76 @@ from chanjo2.constants import (
     TRANSCRIPTS_FILE_HEADER_37,
 )
 from chanjo2.crud.intervals import (
-    bulk_insert_exons,
-    bulk_insert_genes,
-    bulk_insert_transcripts,
+    STAGING_LOAD_ID_COLUMN,
+    bulk_insert_intervals,
     count_intervals_for_build,
+    count_staged_intervals,
+    delete_intervals_by_id,
     delete_intervals_for_build,
+    delete_staged_intervals,
+    get_build_interval_rows,
+    get_staging_table,
+    increment_intervals_version,
+    insert_gene_ensembl_ids,
+    load_intervals_data_infile,
+    new_staging_load_id,
+    replace_intervals_for_build,
+    update_intervals_by_id,
 )
 from chanjo2.meta.handle_bed import resource_lines
-from chanjo2.models import SQLExon, SQLGene, SQLTranscript
-from chanjo2.models.pydantic_models import (
-    Builds,
-    ExonBase,
-    IntervalType,
-    TranscriptBase,
-)
+from chanjo2.models import SQLExon, SQLGene, SQLGeneEnsemblId, SQLTranscript
+from chanjo2.models.pydantic_models import Builds, IntervalType
 
 LOG = logging.getLogger(__name__)
 MAX_NR_OF_RECORDS = 10_000
 CHROM_SEPARATOR: str = "[success]"
+MYSQL_NULL: str = "\\N"
+
+GENES_COLUMNS: Tuple[str, ...] = (
+    "build",
+    "chromosome",
+    "start",
+    "stop",
+    "ensembl_ids",
+    "hgnc_symbol",
+    "hgnc_id",
+)
+TRANSCRIPTS_COLUMNS: Tuple[str, ...] = (
+    "build",
+    "chromosome",
+    "ensembl_gene_id",
+    "ensembl_id",
+    "start",
+    "stop",
+    "refseq_mrna",
+    "refseq_mrna_pred",
+    "refseq_ncrna",
+    "refseq_mane_select",
+    "refseq_mane_plus_clinical",
+)
+EXONS_COLUMNS: Tuple[str, ...] = (
+    "build",
+    "chromosome",
+    "ensembl_gene_id",
+    "ensembl_transcript_id",
+    "ensembl_id",
+    "start",
+    "stop",
+    "rank_in_transcript",
+)
+
+# Columns identifying the same interval in two Ensembl releases
+GENES_KEY_COLUMNS: Tuple[str, ...] = ("ensembl_ids",)
+TRANSCRIPTS_KEY_COLUMNS: Tuple[str, ...] = ("ensembl_id",)
+EXONS_KEY_COLUMNS: Tuple[str, ...] = ("ensembl_transcript_id", "ensembl_id")
+
+
+def use_load_data_infile(session: Session) -> bool:
+    """Return True if intervals should be loaded into a MySQL database from a generated TSV file with LOAD DATA LOCAL INFILE."""
+    return (
+        os.getenv("INTERVALS_LOAD_DATA_INFILE", "false").lower() == "true"
+        and session.get_bind().dialect.name == "mysql"
+    )
 
 
 def update_interval_table(
@@ -36,6 +92,7 @@ def update_interval_table(
     build: Builds,
     file_path: Optional[str],
     session: Session,
+    incremental: bool = False,
 ) -> None:
     """This function is runned in background and is responsible for updating a specific interval table of the database."""
 
@@ -43,13 +100,29 @@ def update_interval_table(
     interval_lines: Iterator[str] = resource_lines(file_path=file_path)
 
     if interval_type == IntervalType.GENES:
-        update_genes(build=build, lines=interval_lines, nlines=nlines, session=session)
+        update_genes(
+            build=build,
+            lines=interval_lines,
+            nlines=nlines,
+            session=session,
+            incremental=incremental,
+        )
     elif interval_type == IntervalType.TRANSCRIPTS:
         update_transcripts(
-            build=build, lines=interval_lines, nlines=nlines, session=session
+            build=build,
+            lines=interval_lines,
+            nlines=nlines,
+            session=session,
+            incremental=incremental,
         )
     elif interval_type == IntervalType.EXONS:
-        update_exons(build=build, lines=interval_lines, nlines=nlines, session=session)
+        update_exons(
+            build=build,
+            lines=interval_lines,
+            nlines=nlines,
+            session=session,
+            incremental=incremental,
+        )
 
 
 def _replace_empty_cols(line: str, nr_expected_columns: int) -> List[Union[str, None]]:
@@ -63,68 +136,336 @@ def _replace_empty_cols(line: str, nr_expected_columns: int) -> List[Union[str,
     return cols
 
 
-def update_genes(build: Builds, session: Session, lines: Iterator, nlines: int) -> None:
-    """Loads genes into the database, replacing existing ones."""
+def _interval_lines_items(lines: Iterator[str], header: List[str]) -> Iterator[List]:
+    """Return the columns of the interval lines of a file, skipping chromosome separators and repeated headers."""
+    for line in lines:
+        line = line.strip()
+        if line == CHROM_SEPARATOR:
+            continue
+        items: List = _replace_empty_cols(line=line, nr_expected_columns=len(header))
+        if items == header:
+            continue
+        yield items
 
-    LOG.warning(f"Updating genes. Genome build --> {build.value}")
 
-    header = next(lines).split("\t")
-    expected_header = GENES_FILE_HEADER
-    if header != expected_header:
+def _stage_interval_rows(
+    session: Session,
+    staging_table: Table,
+    columns: Tuple[str, ...],
+    rows: Iterator[tuple],
+    nlines: int,
+    desc: str,
+) -> int:
+    """Insert rows of interval database values into a staging table, either in Core insert batches or, on MySQL if enabled, with one LOAD DATA LOCAL INFILE of a generated TSV file.
+    Return the number of rows.
+    """
+    nr_rows: int = 0
+    with tqdm(total=nlines - 1, desc=desc, unit="line") as pbar:
+        if use_load_data_infile(session=session):
+            with tempfile.NamedTemporaryFile(
+                mode="w", suffix=".tsv", encoding="utf-8"
+            ) as tsv_file:
+                for row in rows:
+                    tsv_file.write(
+                        "\t".join(
+                            MYSQL_NULL if value is None else str(value) for value in row
+                        )
+                    )
+                    tsv_file.write("\n")
+                    nr_rows += 1
+                    pbar.update(1)
+                tsv_file.flush()
+                load_intervals_data_infile(
+                    db=session,
+                    table=staging_table,
+                    columns=columns,
+                    file_path=tsv_file.name,
+                )
+            return nr_rows
+
+        rows_bulk: List[tuple] = []
+        for row in rows:
+            rows_bulk.append(row)
+            nr_rows += 1
+
+            # Bulk insert when threshold is reached
+            if len(rows_bulk) >= MAX_NR_OF_RECORDS:
+                bulk_insert_intervals(
+                    db=session,
+                    table=staging_table,
+                    columns=columns,
+                    rows=rows_bulk,
+                )
+                session.commit()
+                rows_bulk = []
+
+            pbar.update(1)
+
+        # Insert remaining rows
+        if rows_bulk:
+            bulk_insert_intervals(
+                db=session, table=staging_table, columns=columns, rows=rows_bulk
+            )
+            session.commit()
+    return nr_rows
+
+
+def _load_staged_intervals(
+    session: Session,
+    interval_type: Union[SQLGene, SQLTranscript, SQLExon],
+    build: Builds,
+    columns: Tuple[str, ...],
+    rows: Iterator[tuple],
+    nlines: int,
+    desc: str,
+) -> Tuple[Table, str]:
+    """Load intervals of a genome build into the staging table of their type and check that all of them were saved.
+    Intervals being read by reports are not modified until the staged ones replace them.
+    Return the staging table and the ID of the load identifying its rows, which are deleted if the load fails.
+    """
+    staging_table: Table = get_staging_table(db=session, interval_type=interval_type)
+    load_id: str = new_staging_load_id()
+
+    try:
+        nr_rows: int = _stage_interval_rows(
+            session=session,
+            staging_table=staging_table,
+            columns=(STAGING_LOAD_ID_COLUMN, *columns),
+            rows=((load_id, *row) for row in rows),
+            nlines=nlines,
+            desc=desc,
+        )
+    except Exception:
+        session.rollback()
+        delete_staged_intervals(
+            db=session, staging_table=staging_table, load_id=load_id
+        )
+        raise
+    nr_staged_rows: int = count_staged_intervals(
+        db=session, staging_table=staging_table, load_id=load_id
+    )
+    if nr_rows == 0 or nr_staged_rows != nr_rows:
+        delete_staged_intervals(
+            db=session, staging_table=staging_table, load_id=load_id
+        )
         raise ValueError(
-            f"Ensembl genes file has an unexpected format:{header}. Expected format: {GENES_FILE_HEADER}"
+            f"{nr_staged_rows} of {nr_rows} {interval_type.__tablename__} lines were loaded in build {build.value}, keeping the existing ones."
         )
+    return staging_table, load_id
 
-    LOG.warning(f"Deleting genes, transcripts, exons in build {build.value}")
-    delete_intervals_for_build(db=session, interval_type=SQLGene, build=build)
 
-    genes_bulk: List[SQLGene] = []
+def _update_changed_intervals(
+    session: Session,
+    interval_type: Union[SQLGene, SQLTranscript, SQLExon],
+    build: Builds,
+    columns: Tuple[str, ...],
+    key_columns: Tuple[str, ...],
+    rows: Iterator[tuple],
+    nlines: int,
+    desc: str,
+    referencing_types: Tuple[SQLGeneEnsemblId, ...] = (),
+) -> Dict[str, int]:
+    """Compare intervals parsed from a file with those of a genome build, matched by key columns, and insert, update or delete only those that changed.
+    If any interval changed, rows of the genome build in tables with a foreign key to the intervals (referencing_types) are deleted first.
+    Changed intervals keep their ID. Changes, and the new version of the build intervals if any interval changed, are not committed.
+    Their number is returned by type of change.
+    """
+    key_positions: List[int] = [columns.index(column) for column in key_columns]
+    nr_saved_intervals: int = 0
+    saved_intervals: Dict[tuple, Tuple[int, tuple]] = {}
+    for interval_id, row in get_build_interval_rows(
+        db=session, interval_type=interval_type, columns=columns, build=build
+    ):
+        saved_intervals[tuple(row[position] for position in key_positions)] = (
+            interval_id,
+            row,
+        )
+        nr_saved_intervals += 1
+    if len(saved_intervals) != nr_saved_intervals:
+        raise ValueError(
+            f"Saved {interval_type.__tablename__} in build {build.value} are not unique by {', '.join(key_columns)}, load them without incremental mode."
+        )
 
-    with tqdm(total=nlines - 1, desc="Processing gene lines", unit="line") as pbar:
-        for line in lines:
-            line = line.strip()
-            if line == CHROM_SEPARATOR:
-                continue
-            items: List = _replace_empty_cols(
-                line=line, nr_expected_columns=len(header)
-            )
-            if items == header:
-                continue
-            sql_gene = SQLGene(
-                build=build,
-                chromosome=items[0],
-                start=int(items[1]),
-                stop=int(items[2]),
-                ensembl_ids=[items[3]],
-                hgnc_symbol=items[4],
-                hgnc_id=items[5],
+    seen_keys: set = set()
+    inserted_rows: List[tuple] = []
+    updated_rows: List[Tuple[int, tuple]] = []
+    with tqdm(total=nlines - 1, desc=desc, unit="line") as pbar:
+        for row in rows:
+            key: tuple = tuple(row[position] for position in key_positions)
+            if key in seen_keys:
+                raise ValueError(
+                    f"Loaded {interval_type.__tablename__} are not unique by {', '.join(key_columns)}, load them without incremental mode."
+                )
+            seen_keys.add(key)
+            saved_interval: Optional[Tuple[int, tuple]] = saved_intervals.pop(key, None)
+            if saved_interval is None:
+                inserted_rows.append(row)
+            elif saved_interval[1] != row:
+                updated_rows.append((saved_interval[0], row))
+            pbar.update(1)
+
+    if not seen_keys:
+        raise ValueError(
+            f"No {interval_type.__tablename__} lines were loaded in build {build.value}, keeping the existing ones."
+        )
+    deleted_ids: List[int] = [
+        interval_id for interval_id, _ in saved_intervals.values()
+    ]
+
+    if inserted_rows or updated_rows or deleted_ids:
+        for referencing_type in referencing_types:
+            delete_intervals_for_build(
+                db=session, interval_type=referencing_type, build=build
             )
+        increment_intervals_version(db=session, build=build)
+
+    for batch_start in range(0, len(inserted_rows), MAX_NR_OF_RECORDS):
+        bulk_insert_intervals(
+            db=session,
+            table=interval_type.__table__,
+            columns=columns,
+            rows=inserted_rows[batch_start : batch_start + MAX_NR_OF_RECORDS],
+        )
+    if updated_rows:
+        update_intervals_by_id(
+            db=session,
+            interval_type=interval_type,
+            columns=columns,
+            id_rows=updated_rows,
+        )
+    delete_intervals_by_id(
+        db=session, interval_type=interval_type, interval_ids=deleted_ids
+    )
 
-            genes_bulk.append(sql_gene)
+    changes: Dict[str, int] = {
+        "inserted": len(inserted_rows),
+        "updated": len(updated_rows),
+        "deleted": len(deleted_ids),
+    }
+    LOG.warning(
+        f"Updating {interval_type.__tablename__} in build {build.value}: {changes['inserted']} inserted, {changes['updated']} updated, {changes['deleted']} deleted."
+    )
+    return changes
 
-            # Bulk insert when threshold is reached
-            if len(genes_bulk) >= MAX_NR_OF_RECORDS:
-                bulk_insert_genes(db=session, genes=genes_bulk)
-                genes_bulk = []
 
-            pbar.update(1)
+def _load_intervals(
+    session: Session,
+    interval_type: Union[SQLGene, SQLTranscript, SQLExon],
+    build: Builds,
+    columns: Tuple[str, ...],
+    key_columns: Tuple[str, ...],
+    rows: Iterator[tuple],
+    nlines: int,
+    desc: str,
+    incremental: bool,
+    referencing_types: Tuple[SQLGeneEnsemblId, ...] = (),
+) -> Optional[Dict[str, int]]:
+    """Replace the intervals of a genome build with the staged ones or, in incremental mode, only insert, update and delete those that changed.
+    Rows of the genome build in tables with a foreign key to the intervals (referencing_types) are deleted first, in the same transaction, and should be inserted again by the caller.
+    Changes to the intervals read by reports, and the new version of the build intervals, are not committed. In incremental mode, return the number of changed intervals by type of change.
+    """
+    if incremental:
+        return _update_changed_intervals(
+            session=session,
+            interval_type=interval_type,
+            build=build,
+            columns=columns,
+            key_columns=key_columns,
+            rows=rows,
+            nlines=nlines,
+            desc=desc,
+            referencing_types=referencing_types,
+        )
+
+    staging_table, load_id = _load_staged_intervals(
+        session=session,
+        interval_type=interval_type,
+        build=build,
+        columns=columns,
+        rows=rows,
+        nlines=nlines,
+        desc=desc,
+    )
+    LOG.warning(f"Replacing {interval_type.__tablename__} in build {build.value}")
+    for referencing_type in referencing_types:
+        delete_intervals_for_build(
+            db=session, interval_type=referencing_type, build=build
+        )
+    replace_intervals_for_build(
+        db=session,
+        interval_type=interval_type,
+        staging_table=staging_table,
+        columns=columns,
+        build=build,
+        load_id=load_id,
+        batch_size=MAX_NR_OF_RECORDS,
+    )
+    increment_intervals_version(db=session, build=build)
+    return None
+
+
+def update_genes(
+    build: Builds,
+    session: Session,
+    lines: Iterator,
+    nlines: int,
+    incremental: bool = False,
+) -> Optional[Dict[str, int]]:
+    """Loads genes into the database, replacing existing ones or, in incremental mode, updating only those that changed.
+    Return the number of changed genes by type of change in incremental mode."""
+
+    LOG.warning(f"Updating genes. Genome build --> {build.value}")
 
-    # Insert remaining genes
-    if genes_bulk:
-        bulk_insert_genes(db=session, genes=genes_bulk)
+    header = next(lines).split("\t")
+    expected_header = GENES_FILE_HEADER
+    if header != expected_header:
+        raise ValueError(
+            f"Ensembl genes file has an unexpected format:{header}. Expected format: {GENES_FILE_HEADER}"
+        )
 
-    pbar.close()
+    changes: Optional[Dict[str, int]] = _load_intervals(
+        session=session,
+        interval_type=SQLGene,
+        build=build,
+        columns=GENES_COLUMNS,
+        key_columns=GENES_KEY_COLUMNS,
+        rows=(
+            (
+                build.value,
+                items[0],
+                int(items[1]),
+                int(items[2]),
+                json.dumps([items[3]]),
+                items[4],
+                int(items[5]) if items[5] else None,
+            )
+            for items in _interval_lines_items(lines=lines, header=header)
+        ),
+        nlines=nlines,
+        desc="Processing gene lines",
+        incremental=incremental,
+        referencing_types=(SQLGeneEnsemblId,),
+    )
+    if changes is None or any(changes.values()):
+        insert_gene_ensembl_ids(db=session, build=build)
+    session.commit()
 
     nr_loaded_genes: int = count_intervals_for_build(
         db=session, interval_type=SQLGene, build=build
     )
     LOG.warning(f"{nr_loaded_genes} genes loaded into the database.")
+    return changes
 
 
 def update_transcripts(
-    build: Builds, session: Session, lines: [Iterator], nlines: int
-) -> None:
-    """Loads transcripts into the database."""
+    build: Builds,
+    session: Session,
+    lines: [Iterator],
+    nlines: int,
+    incremental: bool = False,
+) -> Optional[Dict[str, int]]:
+    """Loads transcripts into the database, replacing existing ones or, in incremental mode, updating only those that changed.
+    Return the number of changed transcripts by type of change in incremental mode."""
 
     LOG.warning(f"Updating transcripts. Genome build --> {build.value}")
 
@@ -137,63 +478,50 @@ def update_transcripts(
             f"Ensembl transcripts file has an unexpected format:{header}. Expected format: {expected_header}"
         )
 
-    LOG.warning(f"Deleting transcripts in build {build.value}")
-    delete_intervals_for_build(db=session, interval_type=SQLTranscript, build=build)
-
-    transcripts_bulk: List[TranscriptBase] = []
-
-    with tqdm(
-        total=nlines - 1, desc="Processing transcripts lines", unit="line"
-    ) as pbar:
-        for line in lines:
-            line = line.strip()
-            if line == CHROM_SEPARATOR:
-                continue
-            items: List = _replace_empty_cols(
-                line=line, nr_expected_columns=len(header)
-            )
-            if items == header:
-                continue
-            transcript = SQLTranscript(
-                chromosome=items[0],
-                ensembl_gene_id=items[1],
-                ensembl_id=items[2],
-                start=int(items[3]),
-                stop=int(items[4]),
-                refseq_mrna=items[5],
-                refseq_mrna_pred=items[6],
-                refseq_ncrna=items[7],
-                refseq_mane_select=items[8] if build == Builds.build_38 else None,
-                refseq_mane_plus_clinical=(
-                    items[9] if build == Builds.build_38 else None
-                ),
-                build=build,
+    changes: Optional[Dict[str, int]] = _load_intervals(
+        session=session,
+        interval_type=SQLTranscript,
+        build=build,
+        columns=TRANSCRIPTS_COLUMNS,
+        key_columns=TRANSCRIPTS_KEY_COLUMNS,
+        rows=(
+            (
+                build.value,
+                items[0],
+                items[1],
+                items[2],
+                int(items[3]),
+                int(items[4]),
+                items[5],
+                items[6],
+                items[7],
+                items[8] if build == Builds.build_38 else None,
+                items[9] if build == Builds.build_38 else None,
             )
+            for items in _interval_lines_items(lines=lines, header=header)
+        ),
+        nlines=nlines,
+        desc="Processing transcripts lines",
+        incremental=incremental,
+    )
+    session.commit()
 
-            transcripts_bulk.append(transcript)
-
-            # Bulk insert when threshold is reached
-            if len(transcripts_bulk) > MAX_NR_OF_RECORDS:
-                bulk_insert_transcripts(db=session, transcripts=transcripts_bulk)
-                transcripts_bulk = []
-
-            pbar.update(1)
-
-    # Insert remaining genes
-    if transcripts_bulk:
-        bulk_insert_transcripts(db=session, transcripts=transcripts_bulk)
-
-    pbar.close()
     nr_loaded_transcripts: int = count_intervals_for_build(
         db=session, interval_type=SQLTranscript, build=build
     )
     LOG.warning(f"{nr_loaded_transcripts} transcripts loaded into the database.")
+    return changes
 
 
 def update_exons(
-    build: Builds, session: Session, lines: [Iterator], nlines: int
-) -> None:
-    """Loads exons into the database."""
+    build: Builds,
+    session: Session,
+    lines: [Iterator],
+    nlines: int,
+    incremental: bool = False,
+) -> Optional[Dict[str, int]]:
+    """Loads exons into the database, replacing existing ones or, in incremental mode, updating only those that changed.
+    Return the number of changed exons by type of change in incremental mode."""
 
     LOG.warning(f"Updating exons. Genome build --> {build.value}")
 
@@ -204,47 +532,33 @@ def update_exons(
             f"Ensembl exons file has an unexpected format:{header}. Expected format: {EXONS_FILE_HEADER}"
         )
 
-    LOG.warning(f"Deleting exons in build {build.value}")
-    delete_intervals_for_build(db=session, interval_type=SQLExon, build=build)
-
-    exons_bulk: List[ExonBase] = []
-
-    with tqdm(total=nlines - 1, desc="Processing exons lines", unit="line") as pbar:
-        for line in lines:
-            line = line.strip()
-            if line == CHROM_SEPARATOR:
-                continue
-            items: List = _replace_empty_cols(
-                line=line, nr_expected_columns=len(header)
+    changes: Optional[Dict[str, int]] = _load_intervals(
+        session=session,
+        interval_type=SQLExon,
+        build=build,
+        columns=EXONS_COLUMNS,
+        key_columns=EXONS_KEY_COLUMNS,
+        rows=(
+            (
+                build.value,
+                items[0],
+                items[1],
+                items[2],
+                items[3],
+                int(items[4]),
+                int(items[5]),
+                int(items[-1]),
             )
-            if items == header:
-                continue
-            exon = SQLExon(
-                chromosome=items[0],
-                ensembl_gene_id=items[1],
-                ensembl_transcript_id=items[2],
-                ensembl_id=items[3],
-                start=int(items[4]),
-                stop=int(items[5]),
-                rank_in_transcript=int(items[-1]),
-                build=build,
-            )
-
-            exons_bulk.append(exon)
-
-            # Bulk insert when threshold is reached
-            if len(exons_bulk) > MAX_NR_OF_RECORDS:
-                bulk_insert_exons(db=session, exons=exons_bulk)
-                exons_bulk = []
-
-            pbar.update(1)
-
-    # Insert remaining genes
-    if exons_bulk:
-        bulk_insert_exons(db=session, exons=exons_bulk)
+            for items in _interval_lines_items(lines=lines, header=header)
+        ),
+        nlines=nlines,
+        desc="Processing exons lines",
+        incremental=incremental,
+    )
+    session.commit()
 
-    pbar.close()
     nr_loaded_exons: int = count_intervals_for_build(
         db=session, interval_type=SQLExon, build=build
     )
     LOG.warning(f"{nr_loaded_exons} exons loaded into the database.")
+    return changes
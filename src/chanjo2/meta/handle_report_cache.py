@@ -0,0 +1,115 @@
+import inspect
+import json
+import logging
+import os
+from functools import wraps
+from typing import Callable, Dict, Hashable, Optional, Tuple, Union
+
+from chanjo2.crud.intervals import get_intervals_version
+from chanjo2.meta.handle_cache import TTLCache, file_fingerprint
+from chanjo2.models.pydantic_models import (
+    Builds,
+    GeneReportForm,
+    ReportQuery,
+    ReportQuerySample,
+    is_valid_url,
+)
+
+LOG = logging.getLogger(__name__)
+
+REPORT_CACHE = TTLCache(
+    max_size=int(os.getenv("REPORT_CACHE_SIZE", 64)),
+    ttl=float(os.getenv("REPORT_CACHE_TTL", 3600)),
+    max_bytes=int(os.getenv("REPORT_CACHE_MAX_MB", 256)) * 1024 * 1024,
+)
+
+
+def has_remote_coverage_files(query: Union[ReportQuery, GeneReportForm]) -> bool:
+    """Return True if the coverage file of any sample of a query is a URL, whose changes can't be detected."""
+    return any(is_valid_url(sample.coverage_file_path) for sample in query.samples)
+
+
+def get_sample_cache_key(sample: ReportQuerySample) -> Tuple:
+    """Return the part of a report cache key identifying a sample and the current version of its coverage file."""
+    return (
+        sample.name,
+        sample.case_name,
+        # A date that is not provided defaults to the time of the request, and would never match
+        (
+            str(sample.analysis_date)
+            if "analysis_date" in sample.model_fields_set
+            else None
+        ),
+        file_fingerprint(sample.coverage_file_path),
+    )
+
+
+def get_report_cache_key(
+    report_name: str,
+    query: Union[ReportQuery, GeneReportForm],
+    build: Builds,
+    intervals_version: int,
+    options: Dict,
+) -> Hashable:
+    """Return the key of a report in the cache: the query parameters, the coverage files of its samples and the version of the build intervals
+    saved in the database, which changes whenever any app worker reloads them."""
+    return (
+        report_name,
+        json.dumps(
+            query.model_dump(mode="json", exclude={"samples"}),
+            sort_keys=True,
+        ),
+        tuple(get_sample_cache_key(sample) for sample in query.samples),
+        Builds(build).value,
+        intervals_version,
+        tuple(sorted(options.items())),
+    )
+
+
+def cached_report(
+    set_samples_coverage_files: Callable, build: Optional[Builds] = None
+) -> Callable:
+    """Decorator serving reports from the report cache when the same query is repeated over unchanged coverage files and intervals.
+
+    The decorated function receives the query as first argument and a database session as second argument. The coverage files of samples
+    missing one are set with set_samples_coverage_files before the cache is looked up. Reports are computed over the
+    intervals of the build of the query, unless a build is given. Arguments that are functions, such as progress callbacks,
+    are not part of the cache key. Reports over remote (URL) coverage files are not cached, since their changes can't be detected.
+    Cached reports are shared between requests and must not be modified.
+    """
+
+    def decorator(report_function: Callable) -> Callable:
+        report_signature: inspect.Signature = inspect.signature(report_function)
+
+        @wraps(report_function)
+        def wrapper(*args, **kwargs) -> Dict:
+            bound_arguments: inspect.BoundArguments = report_signature.bind(
+                *args, **kwargs
+            )
+            bound_arguments.apply_defaults()
+            query, session, *_ = bound_arguments.arguments.values()
+            set_samples_coverage_files(session=session, samples=query.samples)
+            if has_remote_coverage_files(query):
+                return report_function(*args, **kwargs)
+
+            report_build: Builds = build or query.build
+            cache_key: Hashable = get_report_cache_key(
+                report_name=report_function.__name__,
+                query=query,
+                build=report_build,
+                intervals_version=get_intervals_version(db=session, build=report_build),
+                options={
+                    option: value
+                    for option, value in list(bound_arguments.arguments.items())[2:]
+                    if callable(value) is False
+                },
+            )
+            report: Optional[Dict] = REPORT_CACHE.get(cache_key)
+            if report is None:
+                report = report_function(*args, **kwargs)
+                REPORT_CACHE.set(cache_key, report)
+            return report
+
+        return wrapper
+
+    return decorator
@@ -1,17 +1,30 @@
 import logging
+import os
 from collections import OrderedDict
-from typing import Dict, List, Optional, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Dict, List, Optional, Tuple, Union
 
 from sqlalchemy.orm import Session
 
 from chanjo2 import __version__
-from chanjo2.crud.intervals import get_genes, get_hgnc_gene, set_sql_intervals
+from chanjo2.meta.handle_annotation_cache import (
+    TRANSCRIPT_TYPES,
+    get_cached_genes,
+    get_cached_hgnc_gene,
+    get_cached_sql_intervals,
+)
+from chanjo2.meta.handle_bed import RegionSet
+from chanjo2.meta.handle_coverage_backend import get_chromosomes_prefix
+from chanjo2.meta.handle_coverage_matrix import CoverageMatrix, get_coverage_matrix
 from chanjo2.meta.handle_d4 import (
-    get_chromosomes_prefix,
-    get_gene_overview_stats,
     get_report_sample_interval_coverage,
-    get_samples_sex_metrics,
+    get_sample_intervals_and_sex_stats,
+    get_sex_metrics,
+    get_sql_intervals_region_set,
 )
+from chanjo2.meta.handle_report_cache import cached_report
+from chanjo2.meta.handle_report_table import IncompleteCoverageRows, ReportIntervals
 from chanjo2.models import SQLExon, SQLGene, SQLTranscript
 from chanjo2.models.pydantic_models import (
     Builds,
@@ -22,9 +35,10 @@ from chanjo2.models.pydantic_models import (
     SampleSexRow,
     TranscriptTag,
 )
-from chanjo2.resources import get_sex_chroms_bed_file
+from chanjo2.resources import get_sex_chroms_interval_ids_coords
 
 LOG = logging.getLogger(__name__)
+REPORT_SAMPLES_WORKERS = int(os.getenv("REPORT_SAMPLES_WORKERS", 4))
 INTERVAL_TYPE_SQL_TYPE: Dict[IntervalType, Union[SQLGene, SQLTranscript, SQLExon]] = {
     IntervalType.GENES: SQLGene,
     IntervalType.TRANSCRIPTS: SQLTranscript,
@@ -63,21 +77,26 @@ def _serialize_sample(sample: ReportQuerySample) -> Dict[str, str]:
     }
 
 
+@cached_report(set_samples_coverage_files=set_samples_coverage_files)
 def get_report_data(
-    query: ReportQuery, session: Session, is_overview: Optional[bool] = False
+    query: ReportQuery,
+    session: Session,
+    is_overview: Optional[bool] = False,
+    progress: Optional[Callable[[int], None]] = None,
 ) -> Dict:
-    """Return the information that will be displayed in the coverage report or in the genes overview report.."""
+    """Return the information that will be displayed in the coverage report or in the genes overview report..
+    If provided, progress is called with the number of samples processed so far every time a sample is done.
+    """
 
     set_samples_coverage_files(session=session, samples=query.samples)
 
     if any([query.ensembl_gene_ids, query.hgnc_gene_ids, query.hgnc_gene_symbols]):
-        genes: List[SQLGene] = get_genes(
+        genes: List[SQLGene] = get_cached_genes(
             db=session,
             build=query.build,
             ensembl_ids=query.ensembl_gene_ids,
             hgnc_ids=query.hgnc_gene_ids,
             hgnc_symbols=query.hgnc_gene_symbols,
-            limit=None,
         )
     else:
         genes = []
@@ -98,15 +117,9 @@ def get_report_data(
             "samples": [_serialize_sample(sample) for sample in query.samples],
         },
         "completeness_rows": [],
-        "incomplete_coverage_rows": [],
         "default_level_completeness_rows": [],
     }
 
-    # Add coverage_report - specific data
-    data["sex_rows"] = get_report_sex_rows(
-        samples=query.samples, build=query.build, interval_type=query.interval_type
-    )
-
     data["errors"] = [
         get_missing_genes_from_db(
             sql_genes=genes,
@@ -124,7 +137,7 @@ def get_report_data(
 
     sql_intervals: list = []
     if gene_ids_mapping:
-        sql_intervals = set_sql_intervals(
+        sql_intervals = get_cached_sql_intervals(
             db=session,
             interval_type=INTERVAL_TYPE_SQL_TYPE[query.interval_type],
             genes=genes,
@@ -135,21 +148,102 @@ def get_report_data(
             ],
         )
 
-    for sample in query.samples:
-        get_report_sample_interval_coverage(
-            d4_file_path=sample.coverage_file_path,
-            sample_name=sample.name,
-            gene_ids_mapping=gene_ids_mapping,
+    # Intervals are prepared once and shared by all samples
+    with get_sql_intervals_region_set(
+        sql_intervals=sql_intervals
+    ) as region_set, get_report_stats_region_set(
+        region_set=region_set, query=query
+    ) as stats_region_set:
+        report_intervals = ReportIntervals(
             sql_intervals=sql_intervals,
-            completeness_thresholds=(
-                [query.default_level] if is_overview else query.completeness_thresholds
-            ),
-            default_threshold=query.default_level,
-            report_data=data,
+            gene_ids_mapping=gene_ids_mapping,
+            region_set=region_set,
+        )
+        data["incomplete_coverage_rows"] = IncompleteCoverageRows(
+            report_intervals=report_intervals
         )
+        get_sample_data = partial(
+            get_report_sample_data,
+            query=query,
+            report_intervals=report_intervals,
+            region_set=region_set,
+            stats_region_set=stats_region_set,
+            is_overview=is_overview,
+        )
+        # Samples are computed in parallel and their results merged in the order of the query
+        data["sex_rows"] = []
+        with ThreadPoolExecutor(
+            max_workers=max(1, min(REPORT_SAMPLES_WORKERS, len(query.samples)))
+        ) as executor:
+            for nr_processed_samples, (sex_row, sample_data) in enumerate(
+                executor.map(get_sample_data, query.samples), start=1
+            ):
+                data["sex_rows"].append(sex_row)
+                for key, rows in sample_data.items():
+                    data[key] += rows
+                if progress:
+                    progress(nr_processed_samples)
+
     return data
 
 
+def get_report_stats_region_set(region_set: RegionSet, query: ReportQuery) -> RegionSet:
+    """Return the region set whose stats are computed for each sample: the report intervals followed,
+    unless the report is over genes, by the sex chromosomes regions of the interval type and build of the report.
+    """
+    if query.interval_type == IntervalType.GENES:
+        return region_set
+    return region_set.joined(
+        get_sex_chroms_interval_ids_coords(
+            build=query.build.value, interval_type=query.interval_type.value
+        )
+    )
+
+
+def get_report_sample_data(
+    sample: ReportQuerySample,
+    query: ReportQuery,
+    report_intervals: ReportIntervals,
+    region_set: RegionSet,
+    stats_region_set: RegionSet,
+    is_overview: bool,
+) -> Tuple[SampleSexRow, Dict]:
+    """Return the sex line and the coverage report rows of one sample."""
+    sample_data: Dict = {
+        "completeness_rows": [],
+        "incomplete_coverage_rows": IncompleteCoverageRows(
+            report_intervals=report_intervals
+        ),
+        "default_level_completeness_rows": [],
+    }
+    completeness_thresholds: List[int] = (
+        [query.default_level] if is_overview else query.completeness_thresholds
+    )
+    intervals_coverage, intervals_coverage_completeness, sex_chroms_coverage = (
+        get_sample_intervals_and_sex_stats(
+            d4_file_path=sample.coverage_file_path,
+            thresholds=completeness_thresholds,
+            region_set=region_set,
+            stats_region_set=stats_region_set,
+            chrom_prefix=get_chromosomes_prefix(sample.coverage_file_path),
+        )
+    )
+    sex_row: SampleSexRow = get_report_sample_sex_row(
+        sample=sample, sex_metrics=get_sex_metrics(sex_chroms_coverage)
+    )
+    get_report_sample_interval_coverage(
+        sample_name=sample.name,
+        report_intervals=report_intervals,
+        region_set=region_set,
+        intervals_coverage=intervals_coverage,
+        intervals_coverage_completeness=intervals_coverage_completeness,
+        completeness_thresholds=completeness_thresholds,
+        default_threshold=query.default_level,
+        report_data=sample_data,
+    )
+    return sex_row, sample_data
+
+
 #### Functions used to create coverage report data
 
 
@@ -174,46 +268,64 @@ def get_missing_genes_from_db(
     )
 
 
-def get_report_sex_rows(
-    samples: List[ReportQuerySample],
-    build: Builds,
-    interval_type: IntervalType,
-) -> List[Dict]:
-    """Create and return the contents for the sample sex lines in the coverage report."""
-    sample_sex_rows: D4FileList = []
-    for sample in samples:
+def get_report_sample_sex_row(
+    sample: ReportQuerySample, sex_metrics: Dict
+) -> SampleSexRow:
+    """Create and return the contents for the sex line of one sample in the coverage report."""
+
+    return SampleSexRow(
+        **{
+            "sample": sample.name,
+            "case": sample.case_name,
+            "analysis_date": sample.analysis_date,
+            "predicted_sex": sex_metrics["predicted_sex"],
+            "x_coverage": sex_metrics["x_coverage"],
+            "y_coverage": sex_metrics["y_coverage"],
+        }
+    )
 
-        chr_prefix = get_chromosomes_prefix(sample.coverage_file_path)
-        bed_file_path = None
 
-        if interval_type != IntervalType.GENES:
-            bed_file_path = get_sex_chroms_bed_file(
-                build=build.value, interval_type=interval_type.value, prefix=chr_prefix
-            )
+#### Functions used to create a coverage matrix ####
 
-        sample_sex_metrics: Dict = get_samples_sex_metrics(
-            d4_file_path=sample.coverage_file_path,
-            chr_prefix=chr_prefix,
-            bed_file_path=bed_file_path,
-        )
 
-        sample_sex_row: SampleSexRow = SampleSexRow(
-            **{
-                "sample": sample.name,
-                "case": sample.case_name,
-                "analysis_date": sample.analysis_date,
-                "predicted_sex": sample_sex_metrics["predicted_sex"],
-                "x_coverage": sample_sex_metrics["x_coverage"],
-                "y_coverage": sample_sex_metrics["y_coverage"],
-            }
+@cached_report(set_samples_coverage_files=set_samples_coverage_files)
+def get_genes_coverage_matrix(query: ReportQuery, session: Session) -> CoverageMatrix:
+    """Returns mean coverage and coverage completeness over the genes of a query, or over their transcripts or exons, for all samples of the query."""
+
+    set_samples_coverage_files(session=session, samples=query.samples)
+
+    sql_intervals: list = []
+    if any([query.ensembl_gene_ids, query.hgnc_gene_ids, query.hgnc_gene_symbols]):
+        genes: List[SQLGene] = get_cached_genes(
+            db=session,
+            build=query.build,
+            ensembl_ids=query.ensembl_gene_ids,
+            hgnc_ids=query.hgnc_gene_ids,
+            hgnc_symbols=query.hgnc_gene_symbols,
         )
-        sample_sex_rows.append(sample_sex_row)
-    return sample_sex_rows
+        if genes:
+            sql_intervals = get_cached_sql_intervals(
+                db=session,
+                interval_type=INTERVAL_TYPE_SQL_TYPE[query.interval_type],
+                genes=genes,
+                transcript_tags=[
+                    TranscriptTag.REFSEQ_MANE_PLUS_CLINICAL,
+                    TranscriptTag.REFSEQ_MANE_SELECT,
+                    TranscriptTag.REFSEQ_MRNA,
+                ],
+            )
+
+    return get_coverage_matrix(
+        sql_intervals=sql_intervals,
+        samples=query.samples,
+        completeness_thresholds=query.completeness_thresholds,
+    )
 
 
 #### Functions used to create a gene overview report ####
 
 
+@cached_report(set_samples_coverage_files=set_samples_coverage_files)
 def get_gene_overview_coverage_stats(form_data: GeneReportForm, session: Session):
     """Returns coverage stats over the intervals of one gene for one or more samples."""
 
@@ -228,7 +340,7 @@ def get_gene_overview_coverage_stats(form_data: GeneReportForm, session: Session
 
     set_samples_coverage_files(session=session, samples=form_data.samples)
 
-    gene: SQLGene = get_hgnc_gene(
+    gene: SQLGene = get_cached_hgnc_gene(
         build=form_data.build, hgnc_id=form_data.hgnc_gene_id, db=session
     )
     if gene is None:
@@ -236,20 +348,22 @@ def get_gene_overview_coverage_stats(form_data: GeneReportForm, session: Session
         return gene_stats
 
     gene_stats["gene"] = gene
-    transcripts_intervals = set_sql_intervals(
+    transcripts_intervals = get_cached_sql_intervals(
         db=session,
         interval_type=SQLTranscript,
         genes=[gene],
         transcript_tags=[],
     )
-    exons_intervals = set_sql_intervals(db=session, interval_type=SQLExon, genes=[gene])
+    exons_intervals = get_cached_sql_intervals(
+        db=session, interval_type=SQLExon, genes=[gene]
+    )
     sql_intervals = transcripts_intervals + exons_intervals
 
-    samples_coverage_by_interval = get_gene_overview_stats(
+    samples_coverage_by_interval = get_coverage_matrix(
         sql_intervals=sql_intervals,
         samples=form_data.samples,
         completeness_thresholds=form_data.completeness_thresholds,
-    )
+    ).get_intervals_samples_stats()
 
     for sql_interval in sql_intervals:
         interval_length: int = abs(sql_interval.stop - sql_interval.start)
@@ -257,7 +371,7 @@ def get_gene_overview_coverage_stats(form_data: GeneReportForm, session: Session
             f"{sql_interval.chromosome}:{sql_interval.start}-{sql_interval.stop}"
         )
 
-        if type(sql_interval) == SQLTranscript:
+        if isinstance(sql_interval, TRANSCRIPT_TYPES):
             gene_stats["transcript_coverage_stats"][sql_interval.ensembl_id] = {
                 "interval_type": "transcript",
                 "mane_select": sql_interval.refseq_mane_select,
@@ -283,19 +397,21 @@ def get_gene_overview_coverage_stats(form_data: GeneReportForm, session: Session
     return gene_stats
 
 
+@cached_report(
+    set_samples_coverage_files=set_samples_coverage_files, build=Builds.build_38
+)
 def get_mane_overview_coverage_stats(query: ReportQuery, session: Session) -> Dict:
     """Returns coverage stats over the MANE transcripts of a list of genes."""
 
     set_samples_coverage_files(session=session, samples=query.samples)
     genes = []
     if any([query.ensembl_gene_ids, query.hgnc_gene_ids, query.hgnc_gene_symbols]):
-        genes: List[SQLGene] = get_genes(
+        genes: List[SQLGene] = get_cached_genes(
             db=session,
             build=Builds.build_38,
             ensembl_ids=query.ensembl_gene_ids,
             hgnc_ids=query.hgnc_gene_ids,
             hgnc_symbols=query.hgnc_gene_symbols,
-            limit=None,
         )
 
     gene_mappings = {}
@@ -325,7 +441,7 @@ def get_mane_overview_coverage_stats(query: ReportQuery, session: Session) -> Di
 
     sql_intervals = []
     if genes:
-        sql_intervals = set_sql_intervals(
+        sql_intervals = get_cached_sql_intervals(
             db=session,
             interval_type=SQLTranscript,
             genes=genes,
@@ -335,11 +451,11 @@ def get_mane_overview_coverage_stats(query: ReportQuery, session: Session) -> Di
             ],
         )
 
-    mane_samples_coverage_stats_by_transcript = get_gene_overview_stats(
+    mane_samples_coverage_stats_by_transcript = get_coverage_matrix(
         sql_intervals=sql_intervals,
         samples=query.samples,
         completeness_thresholds=query.completeness_thresholds,
-    )
+    ).get_intervals_samples_stats()
 
     genes_transcripts = {}
 
@@ -0,0 +1,287 @@
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Iterator, Optional
+
+from chanjo2.models.pydantic_models import ReportJob, ReportJobStatus, ReportJobType
+
+LOG = logging.getLogger(__name__)
+
+REPORT_JOBS_WORKERS = int(os.getenv("REPORT_JOBS_WORKERS", 2))
+REPORT_JOBS_RETENTION_HOURS = float(os.getenv("REPORT_JOBS_RETENTION_HOURS", 24))
+INTERRUPTED_JOB_MSG = (
+    "The job was interrupted by a restart of the app worker computing it"
+)
+
+JOBS_TABLE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS report_jobs (
+    job_id TEXT PRIMARY KEY,
+    report_type TEXT NOT NULL,
+    status TEXT NOT NULL,
+    nr_samples INTEGER NOT NULL,
+    nr_processed_samples INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    worker TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    result TEXT
+)
+"""
+
+
+def default_jobs_db_path() -> str:
+    """Path to the SQLite file storing report jobs and their results, set by the REPORT_JOBS_DB env variable.
+    Defaults to a file in the chanjo2 folder of the cache folder of the user running the app.
+    """
+    cache_dir: str = os.getenv("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.getenv("REPORT_JOBS_DB") or os.path.join(
+        cache_dir, "chanjo2", "report_jobs.sqlite"
+    )
+
+
+def create_private_file(file_path: str) -> None:
+    """Create a file readable and writable only by the user running the app, in a folder created only accessible to this user,
+    unless they already exist. Raise a PermissionError if the file belongs to another user.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(file_path)), mode=0o700, exist_ok=True)
+    file_descriptor: int = os.open(file_path, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        if os.fstat(file_descriptor).st_uid != os.getuid():
+            raise PermissionError(f"{file_path} belongs to another user")
+    finally:
+        os.close(file_descriptor)
+
+
+def get_process_start_time(pid: int) -> Optional[str]:
+    """Return the start time of a process of this host, in clock ticks after boot, or None if it can't be read from /proc."""
+    try:
+        with open(f"/proc/{pid}/stat") as stat_file:
+            # The process name, in parentheses, may contain spaces: fields are counted after it
+            return stat_file.read().rsplit(")", 1)[1].split()[19]
+    except (OSError, IndexError):
+        return None
+
+
+def get_worker_id() -> str:
+    """Return an ID of the current app worker: the host name, the process ID and the start time of the process,
+    so that a process reusing the ID of a stopped worker is not taken for it.
+    """
+    pid: int = os.getpid()
+    return f"{socket.gethostname()}:{pid}:{get_process_start_time(pid) or ''}"
+
+
+def is_worker_alive(worker_id: str) -> bool:
+    """Check if an app worker running on this host is still running, with the same process start time if it's known.
+    Workers of other hosts are assumed to be running.
+    """
+    host_name, pid, *start_time = worker_id.split(":")
+    if host_name != socket.gethostname():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # The process exists but belongs to another user
+        pass
+    if not start_time or not start_time[0]:
+        return True
+    # The process ID may have been reused by another process since the worker stopped
+    process_start_time: Optional[str] = get_process_start_time(int(pid))
+    return process_start_time is None or process_start_time == start_time[0]
+
+
+class ReportJobStore:
+    """Status, progress and results of report jobs, saved in a local SQLite file shared by all app workers of a host,
+    so that they are still available after a worker restarts. Results are saved as JSON report data.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path: str = db_path
+        create_private_file(db_path)
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(JOBS_TABLE_SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Open a connection to the store, committing the changes made through it when the context is exited without errors."""
+        connection: sqlite3.Connection = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def create(self, report_type: ReportJobType, nr_samples: int) -> ReportJob:
+        """Save a new queued job and return it."""
+        job_id: str = uuid.uuid4().hex
+        now: float = time.time()
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT INTO report_jobs (job_id, report_type, status, nr_samples, worker, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job_id,
+                    ReportJobType(report_type).value,
+                    ReportJobStatus.QUEUED.value,
+                    nr_samples,
+                    get_worker_id(),
+                    now,
+                    now,
+                ),
+            )
+        return self.get(job_id)
+
+    def update(self, job_id: str, **fields) -> None:
+        """Update the status, progress, error or result of a job."""
+        fields["updated_at"] = time.time()
+        with self._connect() as connection:
+            connection.execute(
+                f"UPDATE report_jobs SET {', '.join(f'{field} = ?' for field in fields)} WHERE job_id = ?",
+                (*fields.values(), job_id),
+            )
+
+    def get(self, job_id: str) -> Optional[ReportJob]:
+        """Return a job, or None if it doesn't exist. Unfinished jobs of workers that are not running anymore are reported as failed."""
+        with self._connect() as connection:
+            row: Optional[tuple] = connection.execute(
+                "SELECT job_id, report_type, status, nr_samples, nr_processed_samples, error, worker, created_at, updated_at "
+                "FROM report_jobs WHERE job_id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+
+        (
+            job_id,
+            report_type,
+            status,
+            nr_samples,
+            nr_processed_samples,
+            error,
+            worker,
+            created_at,
+            updated_at,
+        ) = row
+        if status in [
+            ReportJobStatus.QUEUED.value,
+            ReportJobStatus.RUNNING.value,
+        ] and not is_worker_alive(worker):
+            status, error = ReportJobStatus.FAILED.value, INTERRUPTED_JOB_MSG
+
+        return ReportJob(
+            job_id=job_id,
+            report_type=report_type,
+            status=status,
+            nr_samples=nr_samples,
+            nr_processed_samples=nr_processed_samples,
+            error=error,
+            created_at=datetime.fromtimestamp(created_at),
+            updated_at=datetime.fromtimestamp(updated_at),
+        )
+
+    def get_result(self, job_id: str) -> Any:
+        """Return the report data computed by a job, or None if it's not available."""
+        with self._connect() as connection:
+            row: Optional[tuple] = connection.execute(
+                "SELECT result FROM report_jobs WHERE job_id = ? AND status = ?",
+                (job_id, ReportJobStatus.DONE.value),
+            ).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return json.loads(row[0])
+
+    def delete_expired(self, retention_hours: float) -> None:
+        """Remove the jobs that were last updated more than retention_hours ago, with their results."""
+        with self._connect() as connection:
+            connection.execute(
+                "DELETE FROM report_jobs WHERE updated_at < ?",
+                (time.time() - retention_hours * 3600,),
+            )
+
+
+class ReportJobRunner:
+    """Computes report jobs in the background on a pool of threads of the app worker, saving their progress and results to a job store."""
+
+    def __init__(self, max_workers: int, db_path: str):
+        self.max_workers: int = max_workers
+        self.db_path: str = db_path
+        self._store: Optional[ReportJobStore] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def store(self) -> ReportJobStore:
+        """Job store, created on first use."""
+        with self._lock:
+            if self._store is None:
+                self._store = ReportJobStore(db_path=self.db_path)
+            return self._store
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=max(1, self.max_workers),
+                    thread_name_prefix="report_job",
+                )
+            return self._executor
+
+    def submit(
+        self,
+        report_type: ReportJobType,
+        nr_samples: int,
+        compute_report: Callable[[Callable[[int], None]], Any],
+    ) -> ReportJob:
+        """Save a new job and compute its report in the background.
+
+        compute_report receives a function to be called with the number of samples processed so far, and returns the report data,
+        made only of values that can be saved as JSON.
+        """
+        self.store.delete_expired(retention_hours=REPORT_JOBS_RETENTION_HOURS)
+        job: ReportJob = self.store.create(
+            report_type=report_type, nr_samples=nr_samples
+        )
+        self._get_executor().submit(self._run, job.job_id, nr_samples, compute_report)
+        return job
+
+    def _run(
+        self,
+        job_id: str,
+        nr_samples: int,
+        compute_report: Callable[[Callable[[int], None]], Any],
+    ) -> None:
+        """Compute the report of a job and save its result, or the error that prevented computing it."""
+        self.store.update(job_id, status=ReportJobStatus.RUNNING.value)
+        try:
+            report_data: Any = compute_report(
+                lambda nr_processed_samples: self.store.update(
+                    job_id, nr_processed_samples=nr_processed_samples
+                )
+            )
+            self.store.update(
+                job_id,
+                status=ReportJobStatus.DONE.value,
+                nr_processed_samples=nr_samples,
+                result=json.dumps(report_data),
+            )
+        except Exception as ex:
+            LOG.exception(f"Report job {job_id} failed")
+            self.store.update(
+                job_id, status=ReportJobStatus.FAILED.value, error=str(ex)
+            )
+
+
+REPORT_JOB_RUNNER = ReportJobRunner(
+    max_workers=REPORT_JOBS_WORKERS, db_path=default_jobs_db_path()
+)
@@ -0,0 +1,168 @@
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from chanjo2.meta.handle_annotation_cache import TRANSCRIPT_TYPES
+from chanjo2.meta.handle_bed import RegionSet
+from chanjo2.models import SQLExon, SQLGene, SQLTranscript
+
+# Row of the incompletely covered intervals table: gene symbol, HGNC ID, interval ID, RefSeq IDs, sample and completeness [%]
+IncompleteCoverageRow = Tuple[str, Optional[int], str, dict, str, float]
+
+
+class ReportIntervals:
+    """Genes and intervals of a coverage report, stored once for each report and shared by all its samples.
+
+    Each report interval is an interval ID of the report region set, with the index of its gene in the genes table,
+    the row of its stats in the region set and, for transcripts, its RefSeq IDs.
+    Intervals are stored in the order of the SQL intervals, and every interval ID only once.
+    """
+
+    def __init__(
+        self,
+        sql_intervals: List[Union[SQLGene, SQLTranscript, SQLExon]],
+        gene_ids_mapping: Dict[str, dict],
+        region_set: RegionSet,
+    ):
+        self.gene_symbols: List[str] = []
+        self.gene_hgnc_ids: List[Optional[int]] = []
+        self.interval_ids: List[str] = []
+        self.interval_genes = array("l")
+        self.interval_refseq: List[dict] = []
+        self.region_rows = array("q")
+
+        region_indexes: Dict[str, int] = (
+            region_set.interval_indexes if region_set else {}
+        )
+        gene_indexes: Dict[str, int] = {}
+        interval_indexes: Dict[str, int] = {}
+        for interval in sql_intervals:
+            if hasattr(interval, "ensembl_ids"):
+                ensembl_ids = interval.ensembl_ids
+            else:
+                ensembl_ids = [interval.ensembl_id]
+
+            for ensembl_id in ensembl_ids:
+                if ensembl_id not in region_indexes or ensembl_id in interval_indexes:
+                    continue
+                interval_ensembl_gene: str = (
+                    ensembl_id
+                    if ensembl_id.startswith("ENSG")
+                    else interval.ensembl_gene_id
+                )
+                gene: dict = gene_ids_mapping[interval_ensembl_gene]
+                if gene["hgnc_symbol"] not in gene_indexes:
+                    gene_indexes[gene["hgnc_symbol"]] = len(self.gene_symbols)
+                    self.gene_symbols.append(gene["hgnc_symbol"])
+                    self.gene_hgnc_ids.append(gene["hgnc_id"])
+                interval_indexes[ensembl_id] = len(self.interval_ids)
+                self.interval_ids.append(ensembl_id)
+                self.interval_genes.append(gene_indexes[gene["hgnc_symbol"]])
+                self.interval_refseq.append(
+                    {
+                        "mane_select": interval.refseq_mane_select,
+                        "mane_plus_clinical": interval.refseq_mane_plus_clinical,
+                        "mrna": interval.refseq_mrna,
+                    }
+                    if isinstance(interval, TRANSCRIPT_TYPES)
+                    else {}
+                )
+                self.region_rows.append(region_indexes[ensembl_id])
+
+    def __len__(self) -> int:
+        return len(self.interval_ids)
+
+
+class IncompleteCoverageRows:
+    """Intervals of a coverage report that are not fully covered at its default level, for one or more samples.
+
+    Rows are stored as columns of indexes into the report intervals and the sample names, and of completeness values,
+    so that a report over many intervals and samples holds a few arrays instead of one tuple for each row.
+    Iterating over the table returns its rows as tuples, in the order they were added.
+    """
+
+    def __init__(self, report_intervals: ReportIntervals):
+        self.report_intervals: ReportIntervals = report_intervals
+        self.samples: List[str] = []
+        self.interval_indexes = array("l")
+        self.sample_indexes = array("l")
+        self.completeness = array("d")
+
+    def add_sample(self, sample_name: str, default_completeness: array) -> None:
+        """Add the intervals of a sample that are not fully covered, given the completeness column of its region set at the default level."""
+        sample_index: int = len(self.samples)
+        self.samples.append(sample_name)
+        for interval_index, region_row in enumerate(self.report_intervals.region_rows):
+            interval_completeness: float = default_completeness[region_row]
+            if interval_completeness < 1:
+                self.interval_indexes.append(interval_index)
+                self.sample_indexes.append(sample_index)
+                self.completeness.append(round(interval_completeness * 100, 2))
+
+    def sample_gene_symbols(self, sample_name: str) -> List[str]:
+        """Return the sorted symbols of the genes with intervals not fully covered in a sample."""
+        sample_index: int = self.samples.index(sample_name)
+        return sorted(
+            {
+                self.report_intervals.gene_symbols[
+                    self.report_intervals.interval_genes[interval_index]
+                ]
+                for interval_index, row_sample_index in zip(
+                    self.interval_indexes, self.sample_indexes
+                )
+                if row_sample_index == sample_index
+            }
+        )
+
+    def __iadd__(self, other: "IncompleteCoverageRows") -> "IncompleteCoverageRows":
+        """Append the rows of another table over the same report intervals."""
+        sample_offset: int = len(self.samples)
+        self.samples += other.samples
+        self.interval_indexes.extend(other.interval_indexes)
+        self.sample_indexes.extend(
+            array(
+                "l",
+                [sample_index + sample_offset for sample_index in other.sample_indexes],
+            )
+        )
+        self.completeness.extend(other.completeness)
+        return self
+
+    def __len__(self) -> int:
+        return len(self.completeness)
+
+    def _get_row(self, row: int) -> IncompleteCoverageRow:
+        intervals: ReportIntervals = self.report_intervals
+        interval_index: int = self.interval_indexes[row]
+        gene_index: int = intervals.interval_genes[interval_index]
+        return (
+            intervals.gene_symbols[gene_index],
+            intervals.gene_hgnc_ids[gene_index],
+            intervals.interval_ids[interval_index],
+            intervals.interval_refseq[interval_index],
+            self.samples[self.sample_indexes[row]],
+            self.completeness[row],
+        )
+
+    def __iter__(self) -> Iterator[IncompleteCoverageRow]:
+        return (self._get_row(row) for row in range(len(self)))
+
+    def sorted_rows(self) -> Iterator[IncompleteCoverageRow]:
+        """Return the rows sorted by gene, interval, sample and completeness, without building them all first."""
+        intervals: ReportIntervals = self.report_intervals
+
+        def row_key(row: int) -> tuple:
+            interval_index: int = self.interval_indexes[row]
+            gene_index: int = intervals.interval_genes[interval_index]
+            return (
+                intervals.gene_symbols[gene_index],
+                intervals.gene_hgnc_ids[gene_index],
+                intervals.interval_ids[interval_index],
+                self.samples[self.sample_indexes[row]],
+                self.completeness[row],
+            )
+
+        return (self._get_row(row) for row in sorted(range(len(self)), key=row_key))
+
+    def to_list(self) -> List[IncompleteCoverageRow]:
+        """Return the rows as a list of tuples, for JSON exports."""
+        return list(self)
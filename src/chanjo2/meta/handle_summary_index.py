@@ -0,0 +1,217 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from chanjo2.constants import DEFAULT_COMPLETENESS_LEVELS
+from chanjo2.crud.intervals import get_build_interval_ids_coords
+from chanjo2.meta.handle_bed import RegionSet, sort_interval_ids_coords
+from chanjo2.meta.handle_cache import LRUCache, file_fingerprint
+from chanjo2.meta.handle_coverage_backend import (
+    get_chromosomes_prefix,
+    get_coverage_backend,
+)
+from chanjo2.models import SQLExon, SQLGene, SQLTranscript
+from chanjo2.models.pydantic_models import Builds, IntervalType
+from chanjo2.resources import get_sex_chroms_interval_ids_coords
+
+LOG = logging.getLogger(__name__)
+
+SUMMARY_INDEX_VERSION = 1
+SUMMARY_INDEX_SUFFIX = ".chanjo2_index"
+SUMMARY_INDEX_CACHE = LRUCache(max_size=int(os.getenv("SUMMARY_INDEX_CACHE_SIZE", 16)))
+
+FLOAT_ARRAY_TYPE = "f"  # Stats are stored as single precision floats
+
+
+def get_summary_index_path(d4_file_path: str) -> str:
+    """Return the path to the summary index of a d4 file: next to the file itself,
+    or in the folder set by the SUMMARY_INDEX_DIR env variable."""
+    index_dir: Optional[str] = os.getenv("SUMMARY_INDEX_DIR")
+    if not index_dir:
+        return f"{d4_file_path}{SUMMARY_INDEX_SUFFIX}"
+    path_hash: str = hashlib.sha1(os.path.abspath(d4_file_path).encode()).hexdigest()
+    return os.path.join(
+        index_dir,
+        f"{os.path.basename(d4_file_path)}.{path_hash[:12]}{SUMMARY_INDEX_SUFFIX}",
+    )
+
+
+def get_interval_key(interval_id: str, coords: Tuple[str, int, int]) -> str:
+    """Return the key of an interval in a summary index, made of its Ensembl ID and its coordinates."""
+    return f"{interval_id}:{coords[0]}:{coords[1]}-{coords[2]}"
+
+
+class SummaryIndex:
+    """Mean coverage and coverage completeness at the default completeness levels
+    of every gene, transcript and exon of a genome build, precomputed for one d4 file.
+    """
+
+    def __init__(
+        self,
+        build: str,
+        d4_size: int,
+        d4_mtime_ns: int,
+        interval_keys: List[str],
+        intervals_mean: array,
+        intervals_completeness: Dict[int, array],
+    ):
+        self.build: str = build
+        self.d4_size: int = d4_size
+        self.d4_mtime_ns: int = d4_mtime_ns
+        self.interval_keys: List[str] = interval_keys
+        self.intervals_mean: array = intervals_mean
+        self.intervals_completeness: Dict[int, array] = intervals_completeness
+        self.interval_rows: Dict[str, int] = {
+            interval_key: row for row, interval_key in enumerate(interval_keys)
+        }
+
+    def is_valid_for(self, d4_file_path: str) -> bool:
+        """Check that the index was computed from the current version of a d4 file."""
+        _, _, d4_size, d4_mtime_ns = file_fingerprint(d4_file_path)
+        return (self.d4_size, self.d4_mtime_ns) == (d4_size, d4_mtime_ns)
+
+    def intervals_stats(
+        self, region_set: RegionSet, thresholds: List[int]
+    ) -> Optional[Tuple[array, Dict[int, array]]]:
+        """Return the mean coverage and coverage completeness columns of the intervals of a region set,
+        or None if any of its intervals or thresholds is missing from the index."""
+        if any(
+            threshold not in self.intervals_completeness for threshold in thresholds
+        ):
+            return None
+        rows: List[Optional[int]] = [
+            self.interval_rows.get(get_interval_key(interval_id, coords))
+            for interval_id, coords in region_set.interval_ids_coords
+        ]
+        if None in rows:
+            return None
+        return array("d", [self.intervals_mean[row] for row in rows]), {
+            threshold: array(
+                "d", [self.intervals_completeness[threshold][row] for row in rows]
+            )
+            for threshold in thresholds
+        }
+
+    def write(self, index_path: str) -> None:
+        """Write the index to a file, replacing any previous version of it at once."""
+        keys_block: bytes = "\n".join(self.interval_keys).encode()
+        header: dict = {
+            "version": SUMMARY_INDEX_VERSION,
+            "build": self.build,
+            "d4_size": self.d4_size,
+            "d4_mtime_ns": self.d4_mtime_ns,
+            "thresholds": list(self.intervals_completeness.keys()),
+            "nr_intervals": len(self.interval_keys),
+            "keys_size": len(keys_block),
+        }
+        with tempfile.NamedTemporaryFile(
+            dir=os.path.dirname(os.path.abspath(index_path)), delete=False
+        ) as index_file:
+            try:
+                index_file.write(json.dumps(header).encode() + b"\n")
+                index_file.write(keys_block)
+                for column in [self.intervals_mean] + list(
+                    self.intervals_completeness.values()
+                ):
+                    array(FLOAT_ARRAY_TYPE, column).tofile(index_file)
+            except Exception:
+                os.remove(index_file.name)
+                raise
+        os.replace(index_file.name, index_path)
+
+    @classmethod
+    def read(cls, index_path: str) -> "SummaryIndex":
+        """Read an index from a file."""
+        with open(index_path, "rb") as index_file:
+            header: dict = json.loads(index_file.readline())
+            if header["version"] != SUMMARY_INDEX_VERSION:
+                raise ValueError(
+                    f"Unsupported summary index version: {header['version']}"
+                )
+            keys_block: str = index_file.read(header["keys_size"]).decode()
+            columns: List[array] = []
+            for _ in range(len(header["thresholds"]) + 1):
+                column = array(FLOAT_ARRAY_TYPE)
+                column.fromfile(index_file, header["nr_intervals"])
+                columns.append(column)
+
+        return cls(
+            build=header["build"],
+            d4_size=header["d4_size"],
+            d4_mtime_ns=header["d4_mtime_ns"],
+            interval_keys=keys_block.split("\n") if keys_block else [],
+            intervals_mean=columns[0],
+            intervals_completeness=dict(zip(header["thresholds"], columns[1:])),
+        )
+
+
+def get_summary_index(d4_file_path: str) -> Optional[SummaryIndex]:
+    """Return the summary index of a d4 file if there is one and it's up to date with the file."""
+    index_path: str = get_summary_index_path(d4_file_path)
+    if not os.path.isfile(index_path):
+        return None
+
+    index_fingerprint: tuple = file_fingerprint(index_path)
+    summary_index: Optional[SummaryIndex] = SUMMARY_INDEX_CACHE.get(index_fingerprint)
+    if summary_index is None:
+        try:
+            summary_index = SummaryIndex.read(index_path)
+        except (OSError, ValueError, KeyError, EOFError) as ex:
+            LOG.warning(f"Could not read summary index {index_path}: {ex}")
+            return None
+        SUMMARY_INDEX_CACHE.set(index_fingerprint, summary_index)
+
+    if summary_index.is_valid_for(d4_file_path) is False:
+        return None
+    return summary_index
+
+
+def build_summary_index(db: Session, build: Builds, d4_file_path: str) -> str:
+    """Compute mean coverage and coverage completeness at the default completeness levels
+    over all genes, transcripts, exons and sex chromosomes report regions of a genome build, and save them in the summary index of a d4 file.
+    """
+    LOG.info(f"Building {build} summary index for {d4_file_path}")
+    _, _, d4_size, d4_mtime_ns = file_fingerprint(d4_file_path)
+
+    interval_ids_coords: List[Tuple[str, Tuple[str, int, int]]] = []
+    for interval_type in [SQLGene, SQLTranscript, SQLExon]:
+        interval_ids_coords += get_build_interval_ids_coords(
+            db=db, interval_type=interval_type, build=build
+        )
+    # Sex chromosomes regions used by the coverage reports over transcripts and exons
+    for interval_type in [IntervalType.TRANSCRIPTS, IntervalType.EXONS]:
+        interval_ids_coords += get_sex_chroms_interval_ids_coords(
+            build=Builds(build).value, interval_type=interval_type.value
+        )
+
+    with RegionSet(
+        interval_ids_coords=sort_interval_ids_coords(set(interval_ids_coords))
+    ) as region_set:
+        intervals_mean, intervals_completeness = get_coverage_backend().intervals_stats(
+            d4_file_path=d4_file_path,
+            region_set=region_set,
+            chrom_prefix=get_chromosomes_prefix(d4_file_path),
+            thresholds=DEFAULT_COMPLETENESS_LEVELS,
+        )
+        interval_keys: List[str] = [
+            get_interval_key(interval_id, coords)
+            for interval_id, coords in region_set.interval_ids_coords
+        ]
+
+    index_path: str = get_summary_index_path(d4_file_path)
+    SummaryIndex(
+        build=Builds(build).value,
+        d4_size=d4_size,
+        d4_mtime_ns=d4_mtime_ns,
+        interval_keys=interval_keys,
+        intervals_mean=intervals_mean,
+        intervals_completeness=intervals_completeness,
+    ).write(index_path)
+    LOG.info(f"Summary index with {len(interval_keys)} intervals saved to {index_path}")
+    return index_path
@@ -1,9 +1,15 @@
 import math
-from statistics import mean
-from typing import List, Optional, Union
+import subprocess
+from array import array
+from typing import IO, List, Optional, Sequence, Tuple, Union
 
+D4TOOLS_STAT_COORDS_COLUMNS = 3  # chromosome, start and stop precede the stats values
+D4TOOLS_OUTPUT_CHUNK_SIZE = 1 << 20  # Max characters of d4tools output parsed at a time
 
-def get_mean(float_list: List[float], round_by: Optional[int] = 2) -> Union[float, str]:
+
+def get_mean(
+    float_list: Sequence[float], round_by: Optional[int] = 2
+) -> Union[float, str]:
     """Return the mean value from a list of floats, optionally rounded.
     Returns 'NA' if the list has no valid numbers.
     Converts inf/-inf to string 'inf'/'-inf'."""
@@ -14,7 +20,7 @@ def get_mean(float_list: List[float], round_by: Optional[int] = 2) -> Union[floa
     if not clean_list:
         return "NA"
 
-    mean_value = mean(clean_list)
+    mean_value = sum(clean_list) / len(clean_list)
 
     # Round only if round_by is not None
     if round_by is not None and math.isfinite(mean_value):
@@ -25,3 +31,87 @@ def get_mean(float_list: List[float], round_by: Optional[int] = 2) -> Union[floa
         return str(mean_value)
 
     return mean_value
+
+
+def _split_d4tools_stat_output(stdout: str, nr_stats: int) -> Tuple[List[str], int]:
+    """Split the output of a d4tools stat command into its fields, checking that every line has the expected number of columns."""
+    fields: List[str] = stdout.split()
+    nr_columns: int = D4TOOLS_STAT_COORDS_COLUMNS + nr_stats
+    if len(fields) % nr_columns:
+        raise ValueError(
+            f"d4tools stat output doesn't have {nr_columns} columns on every line"
+        )
+    return fields, nr_columns
+
+
+def parse_d4tools_stat_columns(stdout: str, nr_stats: int) -> List[array]:
+    """Parse the whole output of a d4tools stat command at once into one column of floats for each stat, skipping the coordinates."""
+    fields, nr_columns = _split_d4tools_stat_output(stdout=stdout, nr_stats=nr_stats)
+    return [
+        array("d", map(float, fields[column::nr_columns]))
+        for column in range(D4TOOLS_STAT_COORDS_COLUMNS, nr_columns)
+    ]
+
+
+def parse_d4tools_stat_table(
+    stdout: str, nr_stats: int
+) -> Tuple[List[str], array, array, List[array]]:
+    """Parse the whole output of a d4tools stat command at once into typed columns:
+    chromosomes, starts, stops and one column of floats for each of the nr_stats values following the coordinates.
+    """
+    fields, nr_columns = _split_d4tools_stat_output(stdout=stdout, nr_stats=nr_stats)
+    return (
+        fields[0::nr_columns],
+        array("q", map(int, fields[1::nr_columns])),
+        array("q", map(int, fields[2::nr_columns])),
+        [
+            array("d", map(float, fields[column::nr_columns]))
+            for column in range(D4TOOLS_STAT_COORDS_COLUMNS, nr_columns)
+        ],
+    )
+
+
+def parse_d4tools_stat_stream(
+    stream: IO[str], nr_stats: int, with_coords: bool = False
+) -> Tuple[List[str], array, array, List[array]]:
+    """Parse the output of a d4tools stat command while it's produced, one chunk of whole lines at a time,
+    so that the text held in memory doesn't depend on the number of intervals.
+    Returns the same columns as parse_d4tools_stat_table, with empty coordinates unless with_coords is True.
+    """
+    chroms: List[str] = []
+    starts = array("q")
+    stops = array("q")
+    stats: List[array] = [array("d") for _ in range(nr_stats)]
+
+    while True:
+        lines: List[str] = stream.readlines(D4TOOLS_OUTPUT_CHUNK_SIZE)
+        if not lines:
+            break
+        chunk: str = "".join(lines)
+        if with_coords:
+            chunk_chroms, chunk_starts, chunk_stops, chunk_stats = (
+                parse_d4tools_stat_table(stdout=chunk, nr_stats=nr_stats)
+            )
+            chroms += chunk_chroms
+            starts.extend(chunk_starts)
+            stops.extend(chunk_stops)
+        else:
+            chunk_stats = parse_d4tools_stat_columns(stdout=chunk, nr_stats=nr_stats)
+        for column, chunk_column in zip(stats, chunk_stats):
+            column.extend(chunk_column)
+
+    return chroms, starts, stops, stats
+
+
+def stream_d4tools_stat(
+    command: List[str], nr_stats: int, with_coords: bool = False
+) -> Tuple[List[str], array, array, List[array]]:
+    """Run a d4tools stat command and parse its output as it's produced. Raises CalledProcessError if the command fails."""
+    # SonarCloud: the paths in the command are validated upstream
+    with subprocess.Popen(command, stdout=subprocess.PIPE, text=True) as process:
+        stats_columns = parse_d4tools_stat_stream(
+            stream=process.stdout, nr_stats=nr_stats, with_coords=with_coords
+        )
+    if process.returncode:
+        raise subprocess.CalledProcessError(returncode=process.returncode, cmd=command)
+    return stats_columns
@@ -1,3 +1,5 @@
 from chanjo2.models.sql_models import Exon as SQLExon
 from chanjo2.models.sql_models import Gene as SQLGene
+from chanjo2.models.sql_models import GeneEnsemblId as SQLGeneEnsemblId
+from chanjo2.models.sql_models import IntervalsVersion as SQLIntervalsVersion
 from chanjo2.models.sql_models import Transcript as SQLTranscript
@@ -393,3 +393,28 @@ class SampleSexRow(BaseModel):
     predicted_sex: str
     x_coverage: float
     y_coverage: float
+
+
+class ReportJobType(str, Enum):
+    REPORT = "report"
+    OVERVIEW = "overview"
+    GENE_OVERVIEW = "gene_overview"
+    MANE_OVERVIEW = "mane_overview"
+
+
+class ReportJobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class ReportJob(BaseModel):
+    job_id: str
+    report_type: ReportJobType
+    status: ReportJobStatus
+    nr_samples: int
+    nr_processed_samples: int = 0
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
@@ -1,6 +1,15 @@
 from dataclasses import dataclass
 
-from sqlalchemy import JSON, Column, Enum, ForeignKey, Index, Integer, String
+from sqlalchemy import (
+    JSON,
+    Column,
+    Enum,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    UniqueConstraint,
+)
 
 from chanjo2.dbutil import Base
 from chanjo2.models.pydantic_models import Builds
@@ -39,6 +48,26 @@ class Gene(Base):
     )
 
 
+@dataclass
+class GeneEnsemblId(Base):
+    """Used to associate each Ensembl ID of a gene to the gene, so that genes can be found by Ensembl ID with an indexed lookup."""
+
+    __tablename__ = "gene_ensembl_ids"
+    id = Column(Integer, primary_key=True, index=True)
+    gene_id = Column(Integer, ForeignKey("genes.id"), nullable=False, index=True)
+    ensembl_id = Column(String(24), nullable=False)
+    build = Column(
+        Enum(Builds, values_callable=lambda x: Builds.get_enum_values()), index=True
+    )
+
+    __table_args__ = (
+        Index("gene_ensembl_idx_ensembl_id_build", "ensembl_id", "build"),
+        UniqueConstraint(
+            "gene_id", "ensembl_id", name="gene_ensembl_unique_gene_id_ensembl_id"
+        ),
+    )
+
+
 @dataclass
 class Transcript(Base):
     """Used to define a transcript entity."""
@@ -89,3 +118,15 @@ class Exon(Base):
             "ensembl_transcript_id",
         ),
     )
+
+
+@dataclass
+class IntervalsVersion(Base):
+    """Used to count the changes to the intervals of a genome build, so that all app workers can tell when the intervals they hold in memory are obsolete."""
+
+    __tablename__ = "intervals_versions"
+    build = Column(
+        Enum(Builds, values_callable=lambda x: Builds.get_enum_values()),
+        primary_key=True,
+    )
+    version = Column(Integer, nullable=False, default=0)
@@ -1,5 +1,10 @@
+from functools import lru_cache
+from typing import Tuple
+
 from importlib_resources import files
 
+from chanjo2.meta.handle_bed import bed_file_regions
+
 BASE_PATH: str = "chanjo2.resources"
 
 
@@ -8,3 +13,18 @@ def get_sex_chroms_bed_file(build: str, interval_type: str, prefix: str) -> str:
 
     file_name = f"{prefix}XY_{interval_type}_{build}_noPAR.bed"
     return str(files(BASE_PATH).joinpath(file_name))
+
+
+@lru_cache
+def get_sex_chroms_interval_ids_coords(
+    build: str, interval_type: str
+) -> Tuple[Tuple[str, Tuple[str, int, int]], ...]:
+    """Return the regions of the XY BED file of a build and interval type, without chr prefix, identified by their coordinates."""
+    return tuple(
+        (f"{chrom}:{start}-{stop}", (chrom, start, stop))
+        for chrom, start, stop in bed_file_regions(
+            file_path=get_sex_chroms_bed_file(
+                build=build, interval_type=interval_type, prefix=""
+            )
+        )
+    )
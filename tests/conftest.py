@@ -19,6 +19,8 @@ from chanjo2.dbutil import DEMO_CONNECT_ARGS, get_session
 from chanjo2.demo import d4_demo_path, gene_panel_path
 from chanjo2.main import Base, app, engine
 from chanjo2.meta.handle_bed import bed_file_interval_id_coords
+from chanjo2.meta.handle_annotation_cache import ANNOTATION_CACHE
+from chanjo2.meta.handle_report_cache import REPORT_CACHE
 from chanjo2.models import sql_models
 from chanjo2.models.sql_models import Gene as SQLGene
 
@@ -73,7 +75,10 @@ class Endpoints(str):
     INTERVAL_COVERAGE = "/coverage/d4/interval/"
     INTERVALS_FILE_COVERAGE = "/coverage/d4/interval_file/"
     GENES_COVERAGE_SUMMARY = "/coverage/d4/genes/summary"
+    GENES_COVERAGE_MATRIX = "/coverage/d4/genes/matrix"
     GET_SAMPLES_PREDICTED_SEX = "/coverage/samples/predicted_sex"
+    D4TOOLS_SCHEDULER_STATS = "/coverage/d4tools/scheduler"
+    D4_SUMMARY_INDEX = "/coverage/d4/summary_index"
     REPORT_DEMO = "/report/demo/"
     REPORT = "/report"
     GENE_OVERVIEW = "/gene_overview"
@@ -82,6 +87,16 @@ class Endpoints(str):
     OVERVIEW_DEMO = "/overview/demo"
     MANE_OVERVIEW_DEMO = "/mane_overview/demo"
     MANE_OVERVIEW = "/mane_overview"
+    REPORT_JOBS = "/report/jobs"
+    OVERVIEW_JOBS = "/overview/jobs"
+    GENE_OVERVIEW_JOBS = "/gene_overview/jobs"
+
+
+@pytest.fixture(autouse=True)
+def clear_report_cache():
+    """Make sure that every test computes its reports instead of reading them from the cache of a previous test."""
+    REPORT_CACHE.clear()
+    ANNOTATION_CACHE.clear()
 
 
 @pytest.fixture
@@ -1,10 +1,21 @@
 from typing import Dict, List
 
+from pytest_mock.plugin import MockerFixture
+from sqlalchemy import event
 from sqlalchemy.orm import sessionmaker
 
 from chanjo2.constants import BUILD_37
-from chanjo2.crud.intervals import get_gene_intervals
-from chanjo2.models import SQLTranscript
+from chanjo2.crud.intervals import (
+    get_gene_intervals,
+    get_genes,
+    insert_missing_gene_ensembl_ids,
+)
+from chanjo2.meta.handle_bed import resource_lines
+from chanjo2.meta.handle_load_intervals import update_genes
+from chanjo2.models import SQLGene, SQLGeneEnsemblId, SQLTranscript
+from chanjo2.models.pydantic_models import Builds
+
+GENES_FILE_PATH = "src/chanjo2/demo/intervals/genes_38.tsv"
 
 
 def test_get_gene_intervals_all_transcripts(
@@ -41,3 +52,194 @@ def test_get_gene_intervals_refseq_mrna_transcripts(
     # THEN they should have a refseq_mrna ID
     for transcript in transcripts:
         assert transcript.refseq_mrna
+
+
+def test_get_genes_by_ensembl_ids(
+    demo_session: sessionmaker, genomic_ids_per_build: Dict[str, List]
+):
+    """Retrieve genes by Ensembl ID using the indexed gene_ensembl_ids table."""
+
+    # GIVEN that the Ensembl IDs of the demo genes were saved when the genes were loaded
+    ensembl_ids: List[str] = genomic_ids_per_build[BUILD_37]["ensembl_gene_ids"]
+    assert demo_session.query(SQLGeneEnsemblId).filter(
+        SQLGeneEnsemblId.ensembl_id.in_(ensembl_ids),
+        SQLGeneEnsemblId.build == BUILD_37,
+    ).count() == len(ensembl_ids)
+
+    # WHEN genes get collected by Ensembl ID
+    genes: List[SQLGene] = get_genes(
+        db=demo_session,
+        build=BUILD_37,
+        ensembl_ids=ensembl_ids,
+        hgnc_ids=None,
+        hgnc_symbols=None,
+        limit=None,
+    )
+
+    # THEN one gene should be returned for each Ensembl ID
+    assert sorted(
+        ensembl_id for gene in genes for ensembl_id in gene.ensembl_ids
+    ) == sorted(ensembl_ids)
+
+
+def test_get_gene_intervals_in_chunks(
+    demo_session: sessionmaker,
+    genomic_ids_per_build: Dict[str, List],
+    mocker: MockerFixture,
+):
+    """Test that querying intervals with gene lists longer than the IN query chunk size returns the same intervals."""
+
+    # GIVEN the transcripts and genes of a list of genes, queried with one IN list
+    hgnc_ids: List[int] = genomic_ids_per_build[BUILD_37]["hgnc_ids"]
+    transcripts: List[SQLTranscript] = get_gene_intervals(
+        db=demo_session,
+        build=BUILD_37,
+        interval_type=SQLTranscript,
+        hgnc_ids=hgnc_ids,
+    )
+    genes: List[SQLGene] = get_genes(
+        db=demo_session,
+        build=BUILD_37,
+        ensembl_ids=None,
+        hgnc_ids=hgnc_ids,
+        hgnc_symbols=None,
+        limit=None,
+    )
+
+    # GIVEN an IN query chunk size shorter than the list of genes
+    mocker.patch("chanjo2.crud.intervals.IN_QUERY_CHUNK_SIZE", 2)
+
+    # THEN the same transcripts should be returned when querying by HGNC IDs or by Ensembl gene IDs in chunks
+    chunked_transcripts: List[SQLTranscript] = get_gene_intervals(
+        db=demo_session,
+        build=BUILD_37,
+        interval_type=SQLTranscript,
+        hgnc_ids=hgnc_ids,
+    )
+    assert transcripts
+    assert sorted(
+        transcript.ensembl_id for transcript in chunked_transcripts
+    ) == sorted(transcript.ensembl_id for transcript in transcripts)
+    chunked_transcripts: List[SQLTranscript] = get_gene_intervals(
+        db=demo_session,
+        build=BUILD_37,
+        interval_type=SQLTranscript,
+        ensembl_gene_ids=[
+            ensembl_id for gene in genes for ensembl_id in gene.ensembl_ids
+        ],
+    )
+    assert sorted(
+        transcript.ensembl_id for transcript in chunked_transcripts
+    ) == sorted(transcript.ensembl_id for transcript in transcripts)
+
+    # AND the same genes
+    chunked_genes: List[SQLGene] = get_genes(
+        db=demo_session,
+        build=BUILD_37,
+        ensembl_ids=None,
+        hgnc_ids=hgnc_ids,
+        hgnc_symbols=None,
+        limit=None,
+    )
+    assert sorted(gene.hgnc_id for gene in chunked_genes) == sorted(
+        gene.hgnc_id for gene in genes
+    )
+
+    # AND the number of returned genes should not exceed the limit
+    assert (
+        len(
+            get_genes(
+                db=demo_session,
+                build=BUILD_37,
+                ensembl_ids=None,
+                hgnc_ids=hgnc_ids,
+                hgnc_symbols=None,
+                limit=3,
+            )
+        )
+        == 3
+    )
+
+
+def test_get_gene_intervals_by_ensembl_gene_ids_and_filter_in_chunks(
+    demo_session: sessionmaker,
+    genomic_ids_per_build: Dict[str, List],
+    mocker: MockerFixture,
+):
+    """Test that querying intervals by Ensembl gene IDs and HGNC IDs, both longer than the IN query chunk size, splits both lists into chunks."""
+
+    # GIVEN the transcripts of a list of genes, queried with one IN list for each type of gene ID
+    hgnc_ids: List[int] = genomic_ids_per_build[BUILD_37]["hgnc_ids"]
+    ensembl_gene_ids: List[str] = [
+        f"ENSG{number:011}" for number in range(10)
+    ] + genomic_ids_per_build[BUILD_37]["ensembl_gene_ids"]
+    transcripts: List[SQLTranscript] = get_gene_intervals(
+        db=demo_session,
+        build=BUILD_37,
+        interval_type=SQLTranscript,
+        hgnc_ids=hgnc_ids,
+        ensembl_gene_ids=ensembl_gene_ids,
+    )
+
+    # GIVEN an IN query chunk size shorter than both lists
+    chunk_size: int = 2
+    mocker.patch("chanjo2.crud.intervals.IN_QUERY_CHUNK_SIZE", chunk_size)
+    statements_parameters: List[tuple] = []
+
+    def save_parameters(conn, cursor, statement, parameters, context, executemany):
+        statements_parameters.append(parameters)
+
+    event.listen(demo_session.get_bind(), "before_cursor_execute", save_parameters)
+
+    # WHEN querying the transcripts in chunks
+    try:
+        chunked_transcripts: List[SQLTranscript] = get_gene_intervals(
+            db=demo_session,
+            build=BUILD_37,
+            interval_type=SQLTranscript,
+            hgnc_ids=hgnc_ids,
+            ensembl_gene_ids=ensembl_gene_ids,
+        )
+    finally:
+        event.remove(demo_session.get_bind(), "before_cursor_execute", save_parameters)
+
+    # THEN the same transcripts should be returned
+    assert transcripts
+    assert sorted(
+        transcript.ensembl_id for transcript in chunked_transcripts
+    ) == sorted(transcript.ensembl_id for transcript in transcripts)
+
+    # AND no statement should contain more than one chunk of each list, besides the genome builds
+    assert statements_parameters
+    assert max(len(parameters) for parameters in statements_parameters) <= (
+        2 * chunk_size + 2
+    )
+
+
+def test_insert_missing_gene_ensembl_ids_indexed_by_other_worker(
+    session: sessionmaker, mocker: MockerFixture
+):
+    """Test filling the gene Ensembl IDs table when another app worker starting at the same time has just filled it."""
+
+    # GIVEN genes whose Ensembl IDs were indexed by another app worker
+    update_genes(
+        build=Builds.build_38,
+        session=session,
+        lines=resource_lines(GENES_FILE_PATH),
+        nlines=sum(1 for _ in open(GENES_FILE_PATH)),
+    )
+    nr_gene_ensembl_ids: int = session.query(SQLGeneEnsemblId).count()
+
+    # GIVEN that this worker found the table empty before the other worker filled it
+    mocker.patch(
+        "chanjo2.crud.intervals.count_intervals_for_build",
+        side_effect=lambda db, interval_type, build: (
+            0 if interval_type == SQLGeneEnsemblId else 1
+        ),
+    )
+
+    # WHEN filling the table
+    insert_missing_gene_ensembl_ids(db=session)
+
+    # THEN no Ensembl ID should be saved twice
+    assert session.query(SQLGeneEnsemblId).count() == nr_gene_ensembl_ids
@@ -414,3 +414,79 @@ def test_get_samples_predicted_sex(
 
     # AND a predicted sex as a string
     assert sex_info["predicted_sex"] == Sex.FEMALE
+
+
+def test_d4tools_scheduler_stats(client: TestClient, endpoints: Type):
+    """Test the endpoint returning the queue stats of the d4tools scheduler."""
+
+    # GIVEN a query to the d4tools scheduler endpoint
+    response = client.get(endpoints.D4TOOLS_SCHEDULER_STATS)
+
+    # THEN the request should be successful
+    assert response.status_code == status.HTTP_200_OK
+    scheduler_stats = response.json()
+
+    # AND contain the queue depth and wait time stats
+    for key in [
+        "max_processes",
+        "running_processes",
+        "queue_depth",
+        "served_requests",
+        "mean_wait_seconds",
+        "max_wait_seconds",
+    ]:
+        assert key in scheduler_stats
+
+
+def test_d4_summary_index_d4_not_found(
+    mock_coverage_file: str, client: TestClient, endpoints: Type
+):
+    """Test the endpoint building the summary index of a d4 file that doesn't exist."""
+
+    # GIVEN a query to build the summary index of a non-existing d4 file
+    response = client.post(
+        f"{endpoints.D4_SUMMARY_INDEX}/{BUILD_37}?coverage_file_path={mock_coverage_file}"
+    )
+
+    # THEN the response should return the expected error
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    assert response.json()["detail"] == WRONG_COVERAGE_FILE_MSG
+
+
+def test_d4_genes_coverage_matrix(demo_client: TestClient, endpoints: Type):
+    """Test the endpoint returning the coverage stats of the transcripts of a list of genes in a list of samples as JSON columns."""
+
+    # GIVEN a query over the transcripts of the demo genes for two samples
+    query = {
+        "build": BUILD_37,
+        "samples": [
+            {
+                "name": sample_name,
+                "coverage_file_path": DEMO_SAMPLE["coverage_file_path"],
+            }
+            for sample_name in [DEMO_SAMPLE["name"], "another_sample"]
+        ],
+        "hgnc_gene_ids": DEMO_HGNC_IDS,
+        "completeness_thresholds": COVERAGE_COMPLETENESS_THRESHOLDS,
+        "interval_type": "transcripts",
+    }
+
+    # WHEN sending a request to the coverage matrix endpoint
+    response = demo_client.post(endpoints.GENES_COVERAGE_MATRIX, json=query)
+
+    # THEN the request should be successful
+    assert response.status_code == status.HTTP_200_OK
+    matrix: dict = response.json()
+    nr_intervals: int = len(matrix["interval_ids"])
+    assert nr_intervals
+    assert matrix["samples"] == [DEMO_SAMPLE["name"], "another_sample"]
+
+    # AND return one column of stats with one value for each interval for each sample and threshold
+    assert [len(column) for column in matrix["mean_coverage"]] == [nr_intervals] * 2
+    for threshold in COVERAGE_COMPLETENESS_THRESHOLDS:
+        assert [len(column) for column in matrix["completeness"][str(threshold)]] == [
+            nr_intervals
+        ] * 2
+
+    # AND samples with the same coverage file should have the same stats
+    assert matrix["mean_coverage"][0] == matrix["mean_coverage"][1]
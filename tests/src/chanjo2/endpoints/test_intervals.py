@@ -60,6 +60,34 @@ def test_load_genes(
     assert GeneBase(**result[0])
 
 
+@pytest.mark.parametrize("build, path", BUILD_EXONS_RESOURCE)
+def test_load_exons_incremental(
+    build: str,
+    path: str,
+    client: TestClient,
+    endpoints: Type,
+):
+    """Test the endpoint that adds exons to the database, loading the same exons again in incremental mode."""
+
+    # GIVEN a database with the exons of a demo file
+    nr_exons: int = len(list(resource_lines(path))) - 1
+    client.post(f"{endpoints.LOAD_EXONS}{build.value}?file_path={path}")
+
+    # WHEN loading the same exons in incremental mode
+    response: Response = client.post(
+        f"{endpoints.LOAD_EXONS}{build.value}?file_path={path}&incremental=true"
+    )
+
+    # THEN it should return success
+    assert response.status_code == status.HTTP_200_OK
+
+    # THEN the exons should still be in the database
+    response: Response = client.post(
+        endpoints.EXONS, json={"build": build, "limit": nr_exons + 1}
+    )
+    assert len(response.json()) == nr_exons
+
+
 @pytest.mark.parametrize("build", Builds.get_enum_values())
 def test_genes_multiple_filters(
     build: str,
@@ -3,6 +3,7 @@ from typing import Dict, List, Type
 from fastapi import status
 from fastapi.testclient import TestClient
 from requests.models import Response
+from sqlalchemy.orm import sessionmaker
 
 from chanjo2.constants import (
     BUILD_37,
@@ -11,7 +12,14 @@ from chanjo2.constants import (
     HTTP_D4_COMPLETENESS_ERROR,
     WRONG_COVERAGE_FILE_MSG,
 )
-from chanjo2.demo import DEMO_COVERAGE_QUERY_FORM, HTTP_SERVER_D4_file, d4_demo_path
+from chanjo2.demo import (
+    DEMO_COVERAGE_QUERY_FORM,
+    DEMO_GENE_OVERVIEW_QUERY_FORM,
+    HTTP_SERVER_D4_file,
+    d4_demo_path,
+)
+from chanjo2.meta.handle_report_contents import get_gene_overview_coverage_stats
+from chanjo2.models.pydantic_models import GeneReportForm
 
 
 def test_demo_overview(client: TestClient, endpoints: Type):
@@ -94,6 +102,24 @@ def test_demo_gene_overview(client: TestClient, endpoints: Type):
     assert response.template.name == "gene-overview.html"
 
 
+def test_demo_gene_overview_cached_stats(
+    client: TestClient, endpoints: Type, demo_session: sessionmaker
+):
+    """Test that rendering the demo gene overview page does not modify the cached gene overview stats."""
+
+    # GIVEN two requests to the demo gene overview endpoint
+    for _ in range(2):
+        response: Response = client.get(endpoints.GENE_OVERVIEW_DEMO)
+        assert response.status_code == status.HTTP_200_OK
+
+    # THEN the cached stats of the demo gene should not contain the request of the pages
+    cached_stats: dict = get_gene_overview_coverage_stats(
+        form_data=GeneReportForm(**DEMO_GENE_OVERVIEW_QUERY_FORM),
+        session=demo_session,
+    )
+    assert "request" not in cached_stats
+
+
 def test_gene_overview_http_d4_with_completeness(
     client: TestClient, endpoints: Type, genomic_ids_per_build: Dict[str, List]
 ):
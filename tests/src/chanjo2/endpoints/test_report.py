@@ -1,15 +1,22 @@
+import asyncio
 import copy
 import os
+import time
 from typing import Callable, Type
 
 import respx
 from fastapi import status
 from fastapi.testclient import TestClient
+from httpx import ASGITransport, AsyncClient
 from httpx import Response as http_response
 from requests.models import Response
 
 from chanjo2.constants import HTTP_D4_COMPLETENESS_ERROR
 from chanjo2.demo import DEMO_COVERAGE_QUERY_FORM, HTTP_SERVER_D4_file, d4_demo_path
+from chanjo2.endpoints import report
+from chanjo2.main import app
+from chanjo2.meta import handle_html_rendering
+from chanjo2.meta.handle_html_rendering import STREAMED_RENDERING
 
 
 def test_demo_report(client: TestClient, endpoints: Type):
@@ -41,6 +48,63 @@ def test_report_form_data(client: TestClient, endpoints: Type):
     assert response.template.name == "report.html"
 
 
+def test_report_does_not_block_other_requests(
+    client: TestClient, endpoints: Type, monkeypatch
+):
+    """Test that other requests are served while a coverage report is being computed."""
+
+    # GIVEN that computing a report takes some time
+    get_report_data: Callable = report.get_report_data
+
+    def slow_get_report_data(*args, **kwargs):
+        time.sleep(1)
+        return get_report_data(*args, **kwargs)
+
+    monkeypatch.setattr(report, "get_report_data", slow_get_report_data)
+
+    async def send_requests():
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://testserver"
+        ) as async_client:
+            report_request = asyncio.create_task(
+                async_client.post(endpoints.REPORT, data=DEMO_COVERAGE_QUERY_FORM)
+            )
+            await asyncio.sleep(0.2)
+            heartbeat_response = await async_client.get("/")
+            report_was_computing: bool = report_request.done() is False
+            return heartbeat_response, report_was_computing, await report_request
+
+    # WHEN the heartbeat endpoint is called while a report is computed
+    heartbeat_response, report_was_computing, report_response = asyncio.run(
+        send_requests()
+    )
+
+    # THEN the heartbeat should respond before the report is ready
+    assert heartbeat_response.status_code == status.HTTP_200_OK
+    assert report_was_computing
+    assert report_response.status_code == status.HTTP_200_OK
+
+
+def test_report_streamed_rendering(client: TestClient, endpoints: Type, monkeypatch):
+    """Test that a coverage report rendered while being sent is the same page as when rendered as a whole."""
+
+    # GIVEN a report rendered as a whole
+    response: Response = client.post(endpoints.REPORT, data=DEMO_COVERAGE_QUERY_FORM)
+
+    # WHEN the same report is streamed
+    monkeypatch.setenv("REPORT_HTML_RENDERING", STREAMED_RENDERING)
+    monkeypatch.setattr(handle_html_rendering, "HTML_STREAM_CHUNK_SIZE", 1024)
+    streamed_response: Response = client.post(
+        endpoints.REPORT, data=DEMO_COVERAGE_QUERY_FORM
+    )
+
+    # THEN the streamed page should be the same
+    assert streamed_response.status_code == status.HTTP_200_OK
+    assert streamed_response.headers["content-type"].startswith("text/html")
+    assert "content-length" not in streamed_response.headers
+    assert streamed_response.text == response.text
+
+
 @respx.mock
 def test_report_form_data_auth_token_via_form(
     auth_protected_client: TestClient,
@@ -0,0 +1,123 @@
+import time
+from typing import Type
+
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+from requests.models import Response
+from sqlalchemy.orm import sessionmaker
+
+from chanjo2.dbutil import get_session_factory
+from chanjo2.demo import DEMO_COVERAGE_QUERY_FORM, DEMO_GENE_OVERVIEW_QUERY_FORM
+from chanjo2.endpoints import report_jobs
+from chanjo2.endpoints.report_jobs import REPORT_JOB_NOT_FOUND_MSG
+from chanjo2.main import app
+from chanjo2.meta.handle_report_jobs import ReportJobRunner
+from chanjo2.models.pydantic_models import ReportJobStatus
+
+
+@pytest.fixture(name="jobs_client")
+def jobs_client_fixture(
+    client: TestClient, session: sessionmaker, tmp_path, monkeypatch
+):
+    """Returns a client whose report jobs are saved to a temporary store and use the test database."""
+    monkeypatch.setattr(
+        report_jobs,
+        "REPORT_JOB_RUNNER",
+        ReportJobRunner(max_workers=1, db_path=str(tmp_path / "jobs.sqlite")),
+    )
+    app.dependency_overrides[get_session_factory] = lambda: lambda: session
+    yield client
+    app.dependency_overrides.pop(get_session_factory)
+
+
+def wait_for_job(client: TestClient, job_id: str, endpoints: Type) -> dict:
+    """Poll the status of a report job until it's done or failed."""
+    for _ in range(100):
+        job: dict = client.get(f"{endpoints.REPORT_JOBS}/{job_id}").json()
+        if job["status"] in [ReportJobStatus.DONE, ReportJobStatus.FAILED]:
+            return job
+        time.sleep(0.1)
+    return job
+
+
+def test_report_job(jobs_client: TestClient, endpoints: Type):
+    """Test computing a coverage report in the background and fetching its HTML page and data."""
+
+    # GIVEN a report job created with the same form as the report endpoint
+    response: Response = jobs_client.post(
+        endpoints.REPORT_JOBS, data=DEMO_COVERAGE_QUERY_FORM
+    )
+
+    # THEN the job should be accepted right away
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    job_id: str = response.json()["job_id"]
+
+    # AND be done after a while, with all samples processed
+    job: dict = wait_for_job(client=jobs_client, job_id=job_id, endpoints=endpoints)
+    assert job["status"] == ReportJobStatus.DONE
+    assert job["nr_processed_samples"] == job["nr_samples"]
+
+    # THEN its report should be returned as HTML page
+    html_response: Response = jobs_client.get(f"{endpoints.REPORT_JOBS}/{job_id}/html")
+    assert html_response.status_code == status.HTTP_200_OK
+    assert html_response.template.name == "report.html"
+
+    # AND as JSON data
+    json_response: Response = jobs_client.get(f"{endpoints.REPORT_JOBS}/{job_id}/json")
+    assert json_response.status_code == status.HTTP_200_OK
+    assert "completeness_rows" in json_response.json()
+
+
+def test_overview_job_html(jobs_client: TestClient, endpoints: Type):
+    """Test computing a genes overview page in the background."""
+
+    # GIVEN a genes overview job
+    response: Response = jobs_client.post(
+        endpoints.OVERVIEW_JOBS, data=DEMO_COVERAGE_QUERY_FORM
+    )
+    job_id: str = response.json()["job_id"]
+    wait_for_job(client=jobs_client, job_id=job_id, endpoints=endpoints)
+
+    # THEN its result should be returned as a genes overview page
+    html_response: Response = jobs_client.get(f"{endpoints.REPORT_JOBS}/{job_id}/html")
+    assert html_response.status_code == status.HTTP_200_OK
+    assert html_response.template.name == "overview.html"
+
+
+def test_gene_overview_job_after_gene_overview(
+    jobs_client: TestClient, endpoints: Type
+):
+    """Test computing a gene overview page in the background after the same page was returned by the gene overview endpoint."""
+
+    # GIVEN a gene overview page returned by the gene overview endpoint, and cached
+    response: Response = jobs_client.post(
+        endpoints.GENE_OVERVIEW, data=DEMO_GENE_OVERVIEW_QUERY_FORM
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    # WHEN computing the same page with a gene overview job
+    response: Response = jobs_client.post(
+        endpoints.GENE_OVERVIEW_JOBS, data=DEMO_GENE_OVERVIEW_QUERY_FORM
+    )
+    job_id: str = response.json()["job_id"]
+
+    # THEN the job should be done
+    job: dict = wait_for_job(client=jobs_client, job_id=job_id, endpoints=endpoints)
+    assert job["status"] == ReportJobStatus.DONE
+
+    # AND its result should be returned as a gene overview page
+    html_response: Response = jobs_client.get(f"{endpoints.REPORT_JOBS}/{job_id}/html")
+    assert html_response.status_code == status.HTTP_200_OK
+    assert html_response.template.name == "gene-overview.html"
+
+
+def test_report_job_not_found(jobs_client: TestClient, endpoints: Type):
+    """Test the status of a report job that doesn't exist."""
+
+    # WHEN asking for the status of a job that doesn't exist
+    response: Response = jobs_client.get(f"{endpoints.REPORT_JOBS}/not_a_job")
+
+    # THEN a 404 error should be returned
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    assert response.json()["detail"] == REPORT_JOB_NOT_FOUND_MSG
@@ -0,0 +1,173 @@
+import threading
+from typing import List
+
+from pytest_mock.plugin import MockerFixture
+from sqlalchemy.orm import Session, sessionmaker
+
+from chanjo2.crud.intervals import (
+    get_genes,
+    increment_intervals_version,
+    set_sql_intervals,
+)
+from chanjo2.dbutil import SessionLocal
+from chanjo2.demo import BUILD_37, DEMO_HGNC_IDS
+from chanjo2.meta.handle_annotation_cache import (
+    BuildAnnotations,
+    get_build_annotations,
+    get_cached_genes,
+    get_cached_sql_intervals,
+)
+from chanjo2.models import SQLExon, SQLGene, SQLTranscript
+from chanjo2.models.pydantic_models import Builds, TranscriptTag
+
+TRANSCRIPT_TAGS: List[TranscriptTag] = [
+    TranscriptTag.REFSEQ_MANE_SELECT,
+    TranscriptTag.REFSEQ_MRNA,
+]
+
+
+def test_get_cached_intervals(demo_session: sessionmaker):
+    """Test that genes, transcripts and exons returned by the annotation cache are the same as those in the database."""
+
+    # GIVEN the genes of a list of HGNC IDs from the annotation cache and from the database
+    cached_genes = get_cached_genes(
+        db=demo_session,
+        build=BUILD_37,
+        ensembl_ids=None,
+        hgnc_ids=DEMO_HGNC_IDS,
+        hgnc_symbols=None,
+    )
+    sql_genes: List[SQLGene] = get_genes(
+        db=demo_session,
+        build=BUILD_37,
+        ensembl_ids=None,
+        hgnc_ids=DEMO_HGNC_IDS,
+        hgnc_symbols=None,
+        limit=None,
+    )
+
+    # THEN the same genes should be returned
+    assert cached_genes
+    assert sorted(
+        (gene.hgnc_id, gene.hgnc_symbol, gene.ensembl_ids, gene.start, gene.stop)
+        for gene in cached_genes
+    ) == sorted(
+        (gene.hgnc_id, gene.hgnc_symbol, gene.ensembl_ids, gene.start, gene.stop)
+        for gene in sql_genes
+    )
+
+    # AND the same tagged transcripts and exons of these genes
+    for interval_type, transcript_tags, fields in [
+        (
+            SQLTranscript,
+            TRANSCRIPT_TAGS,
+            ["ensembl_id", "refseq_mane_select", "refseq_mrna", "start", "stop"],
+        ),
+        (
+            SQLExon,
+            None,
+            ["ensembl_id", "ensembl_transcript_id", "rank_in_transcript", "start"],
+        ),
+    ]:
+        cached_intervals = get_cached_sql_intervals(
+            db=demo_session,
+            interval_type=interval_type,
+            genes=cached_genes,
+            transcript_tags=transcript_tags,
+        )
+        sql_intervals = set_sql_intervals(
+            db=demo_session,
+            interval_type=interval_type,
+            genes=sql_genes,
+            transcript_tags=transcript_tags or [],
+        )
+        assert cached_intervals
+        assert sorted(
+            tuple(getattr(interval, field) for field in fields)
+            for interval in cached_intervals
+        ) == sorted(
+            tuple(getattr(interval, field) for field in fields)
+            for interval in sql_intervals
+        )
+
+
+def test_annotation_cache_reloaded(demo_session: sessionmaker, mocker: MockerFixture):
+    """Test that the annotation cache of a build is read from the database once, until the intervals of the build are reloaded by any app worker."""
+
+    # GIVEN a spy on the function reading the intervals of a build from the database
+    load_spy = mocker.spy(BuildAnnotations, "load")
+
+    # WHEN querying genes of the same build twice
+    for _ in range(2):
+        get_cached_genes(
+            db=demo_session,
+            build=BUILD_37,
+            ensembl_ids=None,
+            hgnc_ids=DEMO_HGNC_IDS,
+            hgnc_symbols=None,
+        )
+
+    # THEN the intervals should be read once
+    assert load_spy.call_count == 1
+
+    # WHEN the intervals of the build are reloaded, by another app worker
+    increment_intervals_version(db=demo_session, build=BUILD_37)
+    demo_session.commit()
+    get_cached_genes(
+        db=demo_session,
+        build=BUILD_37,
+        ensembl_ids=None,
+        hgnc_ids=DEMO_HGNC_IDS,
+        hgnc_symbols=None,
+    )
+
+    # THEN they should be read again
+    assert load_spy.call_count == 2
+
+
+def test_annotation_cache_builds_loaded_separately(
+    demo_session: sessionmaker, mocker: MockerFixture
+):
+    """Test that the cached annotations of a build are returned while another build is being loaded."""
+
+    # GIVEN the cached annotations of build 37
+    get_build_annotations(db=demo_session, build=BUILD_37)
+
+    # GIVEN a load of the annotations of build 38 that hasn't finished yet
+    loading = threading.Event()
+    release = threading.Event()
+    load = BuildAnnotations.load
+
+    def slow_load(annotations: BuildAnnotations, db: Session) -> BuildAnnotations:
+        if Builds(annotations.build) == Builds.build_38:
+            loading.set()
+            release.wait(timeout=10)
+        return load(annotations, db=db)
+
+    mocker.patch.object(BuildAnnotations, "load", slow_load)
+    build_38_session: Session = SessionLocal()
+    build_38_load = threading.Thread(
+        target=get_build_annotations,
+        kwargs={"db": build_38_session, "build": Builds.build_38},
+    )
+    build_38_load.start()
+    assert loading.wait(timeout=10)
+
+    # WHEN requesting the annotations of build 37
+    build_37_session: Session = SessionLocal()
+    build_37_request = threading.Thread(
+        target=get_build_annotations,
+        kwargs={"db": build_37_session, "build": BUILD_37},
+    )
+    build_37_request.start()
+    build_37_request.join(timeout=5)
+
+    # THEN they should be returned without waiting for build 38
+    try:
+        assert build_37_request.is_alive() is False
+    finally:
+        release.set()
+        build_38_load.join()
+        build_37_request.join()
+        build_37_session.close()
+        build_38_session.close()
@@ -0,0 +1,83 @@
+from array import array
+from os.path import isfile
+from typing import List, Tuple
+
+from chanjo2.meta.handle_bed import RegionSet
+
+INTERVAL_IDS_COORDS: List[Tuple[str, Tuple[str, int, int]]] = [
+    ("interval_1", ("1", 100, 200)),
+    ("interval_2", ("X", 300, 400)),
+]
+
+
+def test_region_set_bed_file_shared():
+    """Test that a region set writes its intervals only once for each chromosome prefix."""
+
+    # GIVEN a region set
+    with RegionSet(interval_ids_coords=INTERVAL_IDS_COORDS) as region_set:
+        # WHEN its bed file is requested twice with the same chromosome prefix
+        bed_path: str = region_set.bed_file_path(chrom_prefix="chr")
+
+        # THEN the same file should be returned
+        assert region_set.bed_file_path(chrom_prefix="chr") == bed_path
+
+        # AND it should contain the prefixed intervals
+        with open(bed_path) as bed_file:
+            assert bed_file.read().splitlines() == [
+                "chr1\t100\t200",
+                "chrX\t300\t400",
+            ]
+
+    # THEN the file should be deleted when the region set is closed
+    assert isfile(bed_path) is False
+
+
+def test_region_set_shared_coordinates():
+    """Test that intervals with the same coordinates are written once and their stats expanded to every interval."""
+
+    # GIVEN a region set with two intervals sharing the same coordinates
+    shared_interval: Tuple[str, Tuple[str, int, int]] = ("interval_3", ("1", 100, 200))
+    with RegionSet(
+        interval_ids_coords=INTERVAL_IDS_COORDS[:1]
+        + [shared_interval]
+        + INTERVAL_IDS_COORDS[1:]
+    ) as region_set:
+        # THEN its bed file should contain each region only once
+        with open(region_set.bed_file_path(chrom_prefix="")) as bed_file:
+            assert bed_file.read().splitlines() == ["1\t100\t200", "X\t300\t400"]
+        assert region_set.nr_regions == 2
+
+        # AND stats computed over the regions should be expanded to all its intervals
+        assert region_set.expand(array("d", [10.0, 20.0])) == array(
+            "d", [10.0, 10.0, 20.0]
+        )
+        assert region_set.expand_columns({10: array("d", [0.5, 1.0])}) == {
+            10: array("d", [0.5, 0.5, 1.0])
+        }
+
+
+def test_region_set_unsorted_intervals():
+    """Test that the regions of unsorted intervals are sorted and their stats returned in the order of the intervals."""
+
+    # GIVEN a region set whose chrX intervals come before and after the intervals on other chromosomes
+    with RegionSet(
+        interval_ids_coords=[
+            ("interval_x1", ("X", 500, 600)),
+            ("interval_7", ("7", 100, 200)),
+            ("interval_1", ("1", 100, 200)),
+            ("interval_x2", ("X", 300, 400)),
+        ]
+    ) as region_set:
+        # THEN its bed file should contain the regions sorted by chrom, start and stop
+        with open(region_set.bed_file_path(chrom_prefix="chr")) as bed_file:
+            assert bed_file.read().splitlines() == [
+                "chr1\t100\t200",
+                "chr7\t100\t200",
+                "chrX\t300\t400",
+                "chrX\t500\t600",
+            ]
+
+        # AND stats computed over the sorted regions should be returned in the order of the intervals
+        assert region_set.expand(array("d", [1.0, 7.0, 30.0, 50.0])) == array(
+            "d", [50.0, 7.0, 1.0, 30.0]
+        )
@@ -0,0 +1,72 @@
+from pathlib import PosixPath
+
+from chanjo2.meta.handle_cache import LRUCache, TTLCache, file_fingerprint
+
+
+def test_lru_cache_eviction():
+    """Test that the LRU cache evicts the least recently used entry when full."""
+
+    # GIVEN a cache that can hold 2 items, containing 2 items
+    cache = LRUCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+
+    # WHEN the oldest item is used and a third one is added
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    # THEN the least recently used item should be evicted
+    assert "b" not in cache
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_ttl_cache_expiry_and_memory_cap(mocker):
+    """Test that the TTL cache drops expired entries and evicts the least recently used ones when over its memory cap."""
+
+    # GIVEN a cache whose memory cap can hold two values
+    cache = TTLCache(max_size=10, ttl=60, max_bytes=2500)
+    monotonic = mocker.patch("chanjo2.meta.handle_cache.time.monotonic")
+    monotonic.return_value = 0
+
+    # WHEN a third value is added
+    for key in ["a", "b", "c"]:
+        cache.set(key, "x" * 1000)
+
+    # THEN the least recently used value should be evicted
+    assert "a" not in cache
+    assert cache.get("b") and cache.get("c")
+    assert cache.nr_bytes <= 2500
+
+    # WHEN the TTL has passed
+    monotonic.return_value = 61
+
+    # THEN the values should be expired
+    assert cache.get("b") is None
+    assert "c" not in cache
+    assert cache.nr_bytes == 0
+
+
+def test_file_fingerprint_changes_with_file(coverage_path: PosixPath):
+    """Test that a file fingerprint changes when the file is modified."""
+
+    # GIVEN the fingerprint of a file
+    fingerprint: tuple = file_fingerprint(str(coverage_path))
+
+    # WHEN the file content changes
+    coverage_path.write_text("some longer content")
+
+    # THEN its fingerprint should change
+    assert file_fingerprint(str(coverage_path)) != fingerprint
+
+
+def test_file_fingerprint_remote_file(remote_coverage_file: str):
+    """Test the fingerprint of a file that is not on disk."""
+
+    # THEN the fingerprint should only contain its path
+    assert file_fingerprint(remote_coverage_file) == (
+        remote_coverage_file,
+        None,
+        None,
+        None,
+    )
@@ -0,0 +1,109 @@
+from pytest_mock.plugin import MockerFixture
+
+from chanjo2.meta import handle_coverage_backend
+from chanjo2.meta.handle_coverage_backend import (
+    CHROMOSOMES_MEAN_CACHE,
+    D4_HEADER_CACHE,
+    D4toolsBackend,
+    _configured_coverage_backend,
+    get_chromosomes_mean,
+    get_d4_header,
+)
+from chanjo2.meta.handle_bed import RegionSet
+from chanjo2.meta.handle_coverage_stats import D4Header
+
+
+def test_configured_coverage_backend_default(monkeypatch):
+    """Test that d4tools is the coverage backend used when none is configured."""
+
+    # GIVEN no COVERAGE_BACKEND env variable
+    monkeypatch.delenv("COVERAGE_BACKEND", raising=False)
+
+    # THEN the d4tools backend should be used
+    assert isinstance(_configured_coverage_backend(), D4toolsBackend)
+
+
+def test_configured_coverage_backend_pyd4_not_installed(monkeypatch):
+    """Test that the app falls back to d4tools when pyd4 is configured but not installed."""
+
+    # GIVEN an app configured to use pyd4, without pyd4 installed
+    monkeypatch.setenv("COVERAGE_BACKEND", "pyd4")
+    monkeypatch.setattr(handle_coverage_backend, "D4File", None)
+
+    # THEN the d4tools backend should be used
+    assert isinstance(_configured_coverage_backend(), D4toolsBackend)
+
+
+def test_get_d4_header_cached(real_coverage_path: str, mocker: MockerFixture):
+    """Test that the header of a d4 file is read only once as long as the file doesn't change."""
+
+    # GIVEN an empty d4 header cache
+    D4_HEADER_CACHE.clear()
+    spy_header = mocker.spy(handle_coverage_backend.get_coverage_backend(), "header")
+
+    # WHEN reading the header of the same d4 file twice
+    header: D4Header = get_d4_header(real_coverage_path)
+    assert get_d4_header(real_coverage_path) == header
+
+    # THEN the coverage backend should read it only once
+    assert spy_header.call_count == 1
+
+    # AND the header should contain chromosomes and their length
+    assert header.chromosomes
+    assert header.lengths[header.chromosomes[0]]
+
+
+def test_get_chromosomes_mean_cached(real_coverage_path: str, mocker: MockerFixture):
+    """Test that the mean coverage of all chromosomes of a d4 file is computed once and reused for any chromosome."""
+
+    # GIVEN an empty chromosomes mean cache
+    CHROMOSOMES_MEAN_CACHE.clear()
+    spy_chromosomes_mean = mocker.spy(
+        handle_coverage_backend.get_coverage_backend(), "chromosomes_mean"
+    )
+
+    # WHEN requesting the mean coverage of different chromosomes of the same d4 file
+    x_y_mean = get_chromosomes_mean(
+        d4_file_path=real_coverage_path, chromosomes=["X", "Y"]
+    )
+    chrom_1_mean = get_chromosomes_mean(
+        d4_file_path=real_coverage_path, chromosomes=["1"]
+    )
+
+    # THEN the coverage backend should scan the file only once
+    assert spy_chromosomes_mean.call_count == 1
+
+    # AND the requested chromosomes should be returned in the requested order
+    assert [chrom for chrom, _ in x_y_mean] == ["X", "Y"]
+    assert [chrom for chrom, _ in chrom_1_mean] == ["1"]
+
+
+def test_d4tools_intervals_stats_shared_coordinates(
+    real_coverage_path: str, mocker: MockerFixture
+):
+    """Test that the d4tools backend computes the stats of intervals sharing their coordinates only once."""
+
+    # GIVEN a region set with two intervals sharing the same coordinates
+    with RegionSet(
+        interval_ids_coords=[
+            ("transcript_1", ("7", 44000000, 44100000)),
+            ("transcript_2", ("7", 44000000, 44100000)),
+        ]
+    ) as region_set:
+        stats_spy = mocker.spy(handle_coverage_backend, "get_d4tools_intervals_stats")
+
+        # WHEN computing its stats
+        intervals_mean, intervals_completeness = D4toolsBackend().intervals_stats(
+            d4_file_path=real_coverage_path,
+            region_set=region_set,
+            chrom_prefix="",
+            thresholds=[10],
+        )
+
+        # THEN d4tools should compute them over one region
+        assert len(stats_spy.spy_return[0]) == 1
+
+        # AND each interval should get the stats of its region
+        assert len(intervals_mean) == 2
+        assert intervals_mean[0] == intervals_mean[1]
+        assert intervals_completeness[10][0] == intervals_completeness[10][1]
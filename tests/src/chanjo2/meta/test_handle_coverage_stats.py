@@ -1,4 +1,12 @@
-from chanjo2.meta.handle_coverage_stats import get_chromosomes_prefix
+import threading
+from typing import List
+
+from pytest_mock.plugin import MockerFixture
+
+from chanjo2.meta import handle_coverage_stats
+from chanjo2.meta.handle_coverage_backend import get_chromosomes_prefix
+from chanjo2.meta.handle_coverage_stats import get_d4tools_intervals_stats
+from chanjo2.meta.handle_d4tools_scheduler import D4toolsScheduler
 
 
 def test_get_chromosomes_prefix(
@@ -9,3 +17,42 @@ def test_get_chromosomes_prefix(
     # GIVEN a d4 file with no "chr" prefix
     # THEN the get_chromosomes_prefix function should return an empty string
     assert get_chromosomes_prefix(real_coverage_path) == ""
+
+
+def test_get_d4tools_intervals_stats_one_process(
+    tmp_path, mocker: MockerFixture, real_coverage_path: str
+):
+    """Test that the mean coverage and completeness scans run one after the other when only one d4tools process may run at a time."""
+
+    # GIVEN a scheduler running one d4tools process at a time
+    mocker.patch.object(
+        handle_coverage_stats,
+        "D4TOOLS_SCHEDULER",
+        D4toolsScheduler(max_processes=1, slots_dir=str(tmp_path)),
+    )
+    scan_threads: List[threading.Thread] = []
+
+    def scan(name: str):
+        """Record the thread running a scan."""
+
+        def run_scan(**kwargs):
+            scan_threads.append(threading.current_thread())
+            return name
+
+        return run_scan
+
+    mocker.patch.object(handle_coverage_stats, "stream_d4tools_mean", scan("mean"))
+    mocker.patch.object(
+        handle_coverage_stats, "stream_d4tools_perc_cov", scan("perc_cov")
+    )
+
+    # WHEN computing the stats over the intervals of a bed file
+    stats = get_d4tools_intervals_stats(
+        d4_file_path=real_coverage_path,
+        bed_file_path="intervals.bed",
+        completeness_thresholds=[10],
+    )
+
+    # THEN the scans should run one after the other, in the thread computing the stats
+    assert stats == ("mean", "perc_cov")
+    assert scan_threads == [threading.current_thread()] * 2
@@ -1,6 +1,15 @@
-from chanjo2.meta.handle_coverage_stats import get_chromosomes_prefix
-from chanjo2.meta.handle_d4 import predict_sex
-from chanjo2.models.pydantic_models import Sex
+from chanjo2.meta.handle_bed import RegionSet
+from chanjo2.meta.handle_coverage_backend import (
+    get_chromosomes_prefix,
+    get_coverage_backend,
+)
+from chanjo2.meta.handle_d4 import get_sample_intervals_and_sex_stats, predict_sex
+from chanjo2.meta.handle_interval_stats import get_intervals_stats
+from chanjo2.models.pydantic_models import Builds, IntervalType, Sex
+from chanjo2.resources import (
+    get_sex_chroms_bed_file,
+    get_sex_chroms_interval_ids_coords,
+)
 
 
 def test_predict_sex_male():
@@ -28,3 +37,104 @@ def test_get_chromosomes_prefix_empty(real_coverage_path):
     """Test the function that retrieves the suffix to prepend to the intervals based on the metadata of a d4 file."""
     chr_prefix: str = get_chromosomes_prefix(real_coverage_path)
     assert chr_prefix == ""
+
+
+def test_get_sample_intervals_and_sex_stats(real_coverage_path, mocker):
+    """Test the function that computes the stats of the report intervals and of the sex chromosomes in the same pass."""
+
+    # GIVEN a region set and the same intervals followed by the sex chromosomes regions of a report over exons
+    region_set = RegionSet(
+        interval_ids_coords=[("ENSE1", ("1", 11000, 12000)), ("ENSE2", ("7", 500, 900))]
+    )
+    stats_region_set: RegionSet = region_set.joined(
+        get_sex_chroms_interval_ids_coords(
+            build=Builds.build_37.value, interval_type=IntervalType.EXONS.value
+        )
+    )
+    backend = get_coverage_backend()
+    intervals_stats_spy = mocker.spy(backend, "intervals_stats")
+
+    # WHEN computing the stats of the intervals and of the sex chromosomes
+    intervals_mean, intervals_completeness, sex_chroms_coverage = (
+        get_sample_intervals_and_sex_stats(
+            d4_file_path=real_coverage_path,
+            thresholds=[10, 20],
+            region_set=region_set,
+            stats_region_set=stats_region_set,
+            chrom_prefix="",
+        )
+    )
+
+    # THEN the d4 file should be scanned once
+    assert intervals_stats_spy.call_count == 1
+
+    # THEN the stats should be the same as those computed separately
+    expected_mean, expected_completeness = get_intervals_stats(
+        d4_file_path=real_coverage_path,
+        thresholds=[10, 20],
+        region_set=region_set,
+        chrom_prefix="",
+    )
+    assert list(intervals_mean) == list(expected_mean)
+    assert {
+        threshold: list(column) for threshold, column in intervals_completeness.items()
+    } == {
+        threshold: list(column) for threshold, column in expected_completeness.items()
+    }
+    expected_sex_coverage = backend.chromosomes_mean(
+        d4_file_path=real_coverage_path,
+        chromosomes=["X", "Y"],
+        bed_file_path=get_sex_chroms_bed_file(
+            build=Builds.build_37.value,
+            interval_type=IntervalType.EXONS.value,
+            prefix="",
+        ),
+    )
+    assert [chrom for chrom, _ in sex_chroms_coverage] == ["X", "Y"]
+    for (_, mean), (_, expected) in zip(sex_chroms_coverage, expected_sex_coverage):
+        assert round(mean, 6) == round(expected, 6)
+
+
+def test_get_sample_intervals_and_sex_stats_chrx_intervals(real_coverage_path):
+    """Test that the stats of report intervals on chrX are not mixed up with those of the sex chromosomes regions joined after them."""
+
+    # GIVEN a region set with intervals on chrX placed after sex chromosomes regions in chromosome order
+    region_set = RegionSet(
+        interval_ids_coords=[
+            ("ENSE1", ("1", 11000, 12000)),
+            ("ENSE2", ("X", 150000000, 150001000)),
+            ("ENSE3", ("X", 155000000, 155000500)),
+        ]
+    )
+    sex_chroms_interval_ids_coords = get_sex_chroms_interval_ids_coords(
+        build=Builds.build_37.value, interval_type=IntervalType.EXONS.value
+    )
+    stats_region_set: RegionSet = region_set.joined(sex_chroms_interval_ids_coords)
+
+    # WHEN computing the stats of the intervals and of the sex chromosomes
+    intervals_mean, intervals_completeness, _ = get_sample_intervals_and_sex_stats(
+        d4_file_path=real_coverage_path,
+        thresholds=[10, 20],
+        region_set=region_set,
+        stats_region_set=stats_region_set,
+        chrom_prefix="",
+    )
+
+    # THEN the coverage tools should receive the joined regions sorted
+    assert stats_region_set.regions(chrom_prefix="") == sorted(
+        coords for _, coords in stats_region_set.interval_ids_coords
+    )
+
+    # AND the stats of the intervals should be the same as those computed separately
+    expected_mean, expected_completeness = get_intervals_stats(
+        d4_file_path=real_coverage_path,
+        thresholds=[10, 20],
+        region_set=region_set,
+        chrom_prefix="",
+    )
+    assert list(intervals_mean) == list(expected_mean)
+    assert {
+        threshold: list(column) for threshold, column in intervals_completeness.items()
+    } == {
+        threshold: list(column) for threshold, column in expected_completeness.items()
+    }
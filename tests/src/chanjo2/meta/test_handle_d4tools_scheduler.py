@@ -0,0 +1,132 @@
+import threading
+import time
+from typing import List
+
+import pytest
+
+from chanjo2.meta.handle_d4tools_scheduler import HIGH_PRIORITY, D4toolsScheduler
+
+
+def test_scheduler_limits_concurrency(tmp_path):
+    """Test that the scheduler never runs more processes at once than its number of slots."""
+
+    # GIVEN a scheduler with 2 slots
+    scheduler = D4toolsScheduler(max_processes=2, slots_dir=str(tmp_path))
+    running: List[int] = []
+    max_running: List[int] = [0]
+    lock = threading.Lock()
+
+    def run_process():
+        with scheduler.slots():
+            with lock:
+                running.append(1)
+                max_running[0] = max(max_running[0], len(running))
+            time.sleep(0.02)
+            with lock:
+                running.pop()
+
+    # WHEN 6 threads want to run a process at the same time
+    threads = [threading.Thread(target=run_process) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # THEN no more than 2 processes should have been running at the same time
+    assert max_running[0] <= 2
+
+    # AND the stats should show that all requests were served
+    stats = scheduler.stats()
+    assert stats["served_requests"] == 6
+    assert stats["queue_depth"] == 0
+    assert stats["running_processes"] == 0
+    assert stats["max_wait_seconds"] > 0
+
+
+def test_scheduler_serves_by_priority(tmp_path):
+    """Test that waiting high priority requests are served before requests queued earlier."""
+
+    # GIVEN a scheduler with one slot, which is busy
+    scheduler = D4toolsScheduler(max_processes=1, slots_dir=str(tmp_path))
+    served: List[str] = []
+    release = threading.Event()
+
+    def hold_slot():
+        with scheduler.slots():
+            release.wait()
+
+    def run_process(name: str, priority: int):
+        with scheduler.slots(priority=priority):
+            served.append(name)
+
+    holder = threading.Thread(target=hold_slot)
+    holder.start()
+    while scheduler.stats()["running_processes"] == 0:
+        time.sleep(0.01)
+
+    # WHEN a default priority and then a high priority request are queued
+    waiting = [
+        threading.Thread(target=run_process, args=("default", 10)),
+        threading.Thread(target=run_process, args=("high", HIGH_PRIORITY)),
+    ]
+    for thread in waiting:
+        thread.start()
+        while scheduler.stats()["queue_depth"] < waiting.index(thread) + 1:
+            time.sleep(0.01)
+    release.set()
+    for thread in [holder] + waiting:
+        thread.join()
+
+    # THEN the high priority request should be served first
+    assert served == ["high", "default"]
+
+
+def test_scheduler_failed_request_leaves_queue(tmp_path, monkeypatch):
+    """Test that a request failing while waiting for a slot doesn't block the following requests."""
+
+    # GIVEN a scheduler whose slot files can't be opened
+    scheduler = D4toolsScheduler(max_processes=1, slots_dir=str(tmp_path))
+
+    def fail_to_acquire_slots(nr_slots: int):
+        raise OSError("Too many open files")
+
+    monkeypatch.setattr(scheduler, "_try_acquire_slots", fail_to_acquire_slots)
+
+    # WHEN a request waits for a slot
+    with pytest.raises(OSError):
+        with scheduler.slots():
+            pass
+
+    # THEN it should leave the queue
+    assert scheduler.stats()["queue_depth"] == 0
+
+    # AND a following request should be served once slot files can be opened again
+    monkeypatch.undo()
+    served = threading.Event()
+
+    def run_process():
+        with scheduler.slots():
+            served.set()
+
+    thread = threading.Thread(target=run_process, daemon=True)
+    thread.start()
+    assert served.wait(timeout=5)
+
+
+def test_scheduler_nested_request(tmp_path):
+    """Test that a thread holding slots gets an error instead of waiting forever when requesting more slots."""
+
+    # GIVEN a scheduler allowing one process
+    scheduler = D4toolsScheduler(max_processes=1, slots_dir=str(tmp_path))
+
+    # WHEN a thread holding the slot requests another one
+    with scheduler.slots():
+        # THEN an error should be raised
+        with pytest.raises(RuntimeError):
+            with scheduler.slots():
+                pass
+
+    # AND the slot should be released when the outer request ends
+    assert scheduler.stats()["running_processes"] == 0
+    with scheduler.slots():
+        assert scheduler.stats()["running_processes"] == 1
@@ -0,0 +1,144 @@
+from typing import Dict, List, Tuple
+
+from pytest_mock.plugin import MockerFixture
+
+from chanjo2.meta import handle_interval_stats
+from chanjo2.meta.handle_bed import RegionSet
+from chanjo2.meta.handle_coverage_backend import get_coverage_backend
+from chanjo2.meta.handle_interval_stats import (
+    DEPTH_HISTOGRAM_CACHE,
+    get_interval_completeness,
+    get_intervals_stats,
+)
+
+COMPLETENESS_THRESHOLDS: List[int] = [10, 20]
+
+
+def test_get_intervals_stats(
+    real_coverage_path: str, bed_interval: Tuple[str, int, int]
+):
+    """Test the function that computes mean coverage and coverage completeness over intervals in one go."""
+
+    # GIVEN a genomic interval present in a d4 file
+    region_set = RegionSet(interval_ids_coords=[("an_interval", bed_interval)])
+
+    # WHEN computing its stats
+    with region_set:
+        intervals_coverage, intervals_completeness = get_intervals_stats(
+            d4_file_path=real_coverage_path,
+            thresholds=COMPLETENESS_THRESHOLDS,
+            region_set=region_set,
+            chrom_prefix="",
+        )
+
+    # THEN the mean coverage should be returned for the interval
+    assert len(intervals_coverage) == 1
+    assert isinstance(intervals_coverage[0], float)
+
+    # AND a completeness column should be returned for every threshold
+    assert list(intervals_completeness.keys()) == COMPLETENESS_THRESHOLDS
+    for column in intervals_completeness.values():
+        assert len(column) == 1
+
+    # AND the completeness of the interval should be available by threshold
+    interval_completeness: Dict[int, float] = get_interval_completeness(
+        intervals_completeness=intervals_completeness, row=0
+    )
+    assert list(interval_completeness.keys()) == COMPLETENESS_THRESHOLDS
+
+
+def test_get_intervals_stats_depth_histogram(
+    real_coverage_path: str,
+    bed_interval: Tuple[str, int, int],
+    monkeypatch,
+    mocker: MockerFixture,
+):
+    """Test that stats at different thresholds are derived from the same cached depth histogram."""
+
+    # GIVEN an app computing depth histograms up to 30x, with an empty histogram cache
+    monkeypatch.setattr(handle_interval_stats, "DEPTH_HISTOGRAM_MAX_DEPTH", 30)
+    DEPTH_HISTOGRAM_CACHE.clear()
+    spy_intervals_stats = mocker.spy(get_coverage_backend(), "intervals_stats")
+    region_set = RegionSet(interval_ids_coords=[("an_interval", bed_interval)])
+
+    # WHEN computing stats over the same interval with different thresholds
+    with region_set:
+        _, first_completeness = get_intervals_stats(
+            d4_file_path=real_coverage_path,
+            thresholds=COMPLETENESS_THRESHOLDS,
+            region_set=region_set,
+            chrom_prefix="",
+        )
+        _, second_completeness = get_intervals_stats(
+            d4_file_path=real_coverage_path,
+            thresholds=[30, 10],
+            region_set=region_set,
+            chrom_prefix="",
+        )
+
+    # THEN the d4 file should be scanned only once
+    assert spy_intervals_stats.call_count == 1
+
+    # AND completeness should be returned for the thresholds of each request
+    assert list(first_completeness.keys()) == COMPLETENESS_THRESHOLDS
+    assert list(second_completeness.keys()) == [30, 10]
+    assert first_completeness[10][0] == second_completeness[10][0]
+
+
+def test_get_intervals_stats_depth_histogram_without_thresholds(
+    real_coverage_path: str,
+    bed_interval: Tuple[str, int, int],
+    monkeypatch,
+    mocker: MockerFixture,
+):
+    """Test that the mean coverage of queries without thresholds is computed without scanning a depth histogram."""
+
+    # GIVEN an app computing depth histograms up to 30x, with an empty histogram cache
+    monkeypatch.setattr(handle_interval_stats, "DEPTH_HISTOGRAM_MAX_DEPTH", 30)
+    DEPTH_HISTOGRAM_CACHE.clear()
+    spy_intervals_stats = mocker.spy(get_coverage_backend(), "intervals_stats")
+    region_set = RegionSet(interval_ids_coords=[("an_interval", bed_interval)])
+
+    # WHEN computing the mean coverage of an interval, without thresholds
+    with region_set:
+        _, completeness = get_intervals_stats(
+            d4_file_path=real_coverage_path,
+            thresholds=[],
+            region_set=region_set,
+            chrom_prefix="",
+        )
+
+    # THEN only the mean coverage should be computed
+    assert completeness == {}
+    assert spy_intervals_stats.call_args.kwargs["thresholds"] == []
+    assert len(DEPTH_HISTOGRAM_CACHE) == 0
+
+
+def test_get_intervals_stats_depth_histogram_remote_file(
+    bed_interval: Tuple[str, int, int],
+    monkeypatch,
+    mocker: MockerFixture,
+):
+    """Test that the stats of remote d4 files are computed without scanning a depth histogram."""
+
+    # GIVEN an app computing depth histograms up to 30x, with an empty histogram cache
+    monkeypatch.setattr(handle_interval_stats, "DEPTH_HISTOGRAM_MAX_DEPTH", 30)
+    DEPTH_HISTOGRAM_CACHE.clear()
+    mocker.patch.object(handle_interval_stats, "get_summary_index", return_value=None)
+    intervals_stats = mocker.patch.object(
+        get_coverage_backend(), "intervals_stats", return_value=("mean", {})
+    )
+    region_set = RegionSet(interval_ids_coords=[("an_interval", bed_interval)])
+
+    # WHEN computing the stats of an interval of a d4 file served over HTTP
+    with region_set:
+        get_intervals_stats(
+            d4_file_path="https://example.com/sample.d4",
+            thresholds=[10],
+            region_set=region_set,
+            chrom_prefix="",
+        )
+
+    # THEN the backend should be called with the thresholds of the query only
+    assert intervals_stats.call_args.kwargs["thresholds"] == [10]
+    assert len(DEPTH_HISTOGRAM_CACHE) == 0
@@ -0,0 +1,393 @@
+from pathlib import PosixPath
+from typing import Dict, List
+
+import pytest
+from pytest_mock.plugin import MockerFixture
+from sqlalchemy import Table, create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from chanjo2.crud.intervals import (
+    STAGING_LOAD_ID_COLUMN,
+    bulk_insert_intervals,
+    count_staged_intervals,
+    delete_staged_intervals,
+    get_intervals_version,
+    get_staging_table,
+    new_staging_load_id,
+)
+from chanjo2.dbutil import Base
+from chanjo2.meta.handle_bed import resource_lines
+from chanjo2.meta.handle_load_intervals import (
+    EXONS_COLUMNS,
+    update_exons,
+    update_genes,
+)
+from chanjo2.models import SQLExon, SQLGene, SQLGeneEnsemblId
+from chanjo2.models.pydantic_models import Builds
+
+EXONS_FILE_PATH = "src/chanjo2/demo/intervals/exons_38.tsv"
+GENES_FILE_PATH = "src/chanjo2/demo/intervals/genes_38.tsv"
+
+
+@pytest.fixture(name="foreign_keys_session")
+def foreign_keys_session_fixture(tmp_path: PosixPath) -> Session:
+    """Returns a session of a SQLite database enforcing foreign keys, as MySQL InnoDB does."""
+    engine: Engine = create_engine(f"sqlite:///{tmp_path / 'foreign_keys.db'}")
+
+    @event.listens_for(engine, "connect")
+    def enable_foreign_keys(dbapi_connection, connection_record):
+        dbapi_connection.execute("PRAGMA foreign_keys=ON")
+
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def test_update_exons(session: sessionmaker):
+    """Test loading exons into the database with the Core bulk insert loader."""
+
+    # WHEN loading the demo exons of build 38
+    nlines: int = sum(1 for _ in open(EXONS_FILE_PATH))
+    update_exons(
+        build=Builds.build_38,
+        session=session,
+        lines=resource_lines(EXONS_FILE_PATH),
+        nlines=nlines,
+    )
+
+    # THEN one exon should be saved for each line of the file
+    exons: List[SQLExon] = session.query(SQLExon).all()
+    assert len(exons) == nlines - 1
+
+    # AND exons should contain the values of the file columns
+    first_line: List[str] = list(resource_lines(EXONS_FILE_PATH))[1].split("\t")
+    exon: SQLExon = (
+        session.query(SQLExon)
+        .filter_by(ensembl_transcript_id=first_line[2], ensembl_id=first_line[3])
+        .one()
+    )
+    assert exon.build == Builds.build_38
+    assert (exon.chromosome, exon.ensembl_gene_id, exon.ensembl_transcript_id) == (
+        first_line[0],
+        first_line[1],
+        first_line[2],
+    )
+    assert (exon.start, exon.stop, exon.rank_in_transcript) == (
+        int(first_line[4]),
+        int(first_line[5]),
+        int(first_line[-1]),
+    )
+
+
+def test_update_exons_load_data_infile(session: sessionmaker, mocker: MockerFixture):
+    """Test that exons are written to a TSV file loaded with LOAD DATA LOCAL INFILE when this is enabled on MySQL."""
+
+    # GIVEN a database where intervals are loaded with LOAD DATA LOCAL INFILE
+    mocker.patch(
+        "chanjo2.meta.handle_load_intervals.use_load_data_infile", return_value=True
+    )
+    tsv_lines: List[str] = []
+
+    def load_tsv_file(db, table, columns, file_path):
+        """Insert the lines of the TSV file into the table, as LOAD DATA would on MySQL."""
+        with open(file_path) as tsv_file:
+            tsv_lines.extend(tsv_file.read().splitlines())
+        bulk_insert_intervals(
+            db=db,
+            table=table,
+            columns=columns,
+            rows=[tuple(line.split("\t")) for line in tsv_lines],
+        )
+
+    load_data_infile = mocker.patch(
+        "chanjo2.meta.handle_load_intervals.load_intervals_data_infile",
+        side_effect=load_tsv_file,
+    )
+
+    # WHEN loading the demo exons of build 38
+    nlines: int = sum(1 for _ in open(EXONS_FILE_PATH))
+    update_exons(
+        build=Builds.build_38,
+        session=session,
+        lines=resource_lines(EXONS_FILE_PATH),
+        nlines=nlines,
+    )
+
+    # THEN the exons should be loaded from one file, with the load ID and the exons columns
+    load_data_infile.assert_called_once()
+    assert load_data_infile.call_args.kwargs["columns"] == (
+        STAGING_LOAD_ID_COLUMN,
+        *EXONS_COLUMNS,
+    )
+
+    # AND the file should contain one line for each exon, with the values of the columns
+    assert len(tsv_lines) == nlines - 1
+    assert session.query(SQLExon).count() == nlines - 1
+    first_line: List[str] = list(resource_lines(EXONS_FILE_PATH))[1].split("\t")
+    assert tsv_lines[0].split("\t")[1:] == [
+        Builds.build_38.value,
+        *first_line[:6],
+        first_line[-1],
+    ]
+
+
+def test_update_exons_keeps_loaded_exons(session: sessionmaker, mocker: MockerFixture):
+    """Test that loaded exons are kept when the new exons could not all be loaded."""
+
+    # GIVEN a database with the demo exons of build 38
+    nlines: int = sum(1 for _ in open(EXONS_FILE_PATH))
+    update_exons(
+        build=Builds.build_38,
+        session=session,
+        lines=resource_lines(EXONS_FILE_PATH),
+        nlines=nlines,
+    )
+
+    # GIVEN that fewer exons than those of the file are saved into the staging table
+    mocker.patch(
+        "chanjo2.meta.handle_load_intervals.count_staged_intervals", return_value=1
+    )
+
+    # WHEN loading the exons again
+    with pytest.raises(ValueError):
+        update_exons(
+            build=Builds.build_38,
+            session=session,
+            lines=resource_lines(EXONS_FILE_PATH),
+            nlines=nlines,
+        )
+
+    # THEN the exons loaded before should still be in the database
+    assert session.query(SQLExon).count() == nlines - 1
+
+
+def test_update_exons_staged_by_other_load(
+    session: sessionmaker, mocker: MockerFixture
+):
+    """Test that exons replaced in several batches are those of the loaded file, without the rows staged by another load."""
+
+    # GIVEN a database with the demo exons of build 38
+    nlines: int = sum(1 for _ in open(EXONS_FILE_PATH))
+    update_exons(
+        build=Builds.build_38,
+        session=session,
+        lines=resource_lines(EXONS_FILE_PATH),
+        nlines=nlines,
+    )
+
+    # GIVEN an exon of the same build staged by another load running at the same time
+    staging_table: Table = get_staging_table(db=session, interval_type=SQLExon)
+    first_line: List[str] = list(resource_lines(EXONS_FILE_PATH))[1].split("\t")
+    other_load_id: str = new_staging_load_id()
+    bulk_insert_intervals(
+        db=session,
+        table=staging_table,
+        columns=(STAGING_LOAD_ID_COLUMN, *EXONS_COLUMNS),
+        rows=[
+            (
+                other_load_id,
+                Builds.build_38.value,
+                *first_line[:3],
+                "ENSE00000000001",
+                *first_line[4:6],
+                first_line[-1],
+            )
+        ],
+    )
+    session.commit()
+
+    # GIVEN that exons are replaced in batches smaller than the file
+    mocker.patch("chanjo2.meta.handle_load_intervals.MAX_NR_OF_RECORDS", 3)
+
+    # WHEN loading the exons again
+    update_exons(
+        build=Builds.build_38,
+        session=session,
+        lines=resource_lines(EXONS_FILE_PATH),
+        nlines=nlines,
+    )
+    session.commit()
+
+    # THEN the build should contain only the exons of the file
+    assert session.query(SQLExon).count() == nlines - 1
+    assert session.query(SQLExon).filter_by(ensembl_id="ENSE00000000001").count() == 0
+
+    # AND the exon staged by the other load should be left in the staging table
+    assert (
+        count_staged_intervals(
+            db=session, staging_table=staging_table, load_id=other_load_id
+        )
+        == 1
+    )
+    delete_staged_intervals(
+        db=session, staging_table=staging_table, load_id=other_load_id
+    )
+
+
+def test_update_exons_incremental(session: sessionmaker, tmp_path: PosixPath):
+    """Test that exons updated in incremental mode are the same as those of a full reload, changing only the exons that differ."""
+
+    # GIVEN a database with the demo exons of build 38
+    nlines: int = sum(1 for _ in open(EXONS_FILE_PATH))
+    update_exons(
+        build=Builds.build_38,
+        session=session,
+        lines=resource_lines(EXONS_FILE_PATH),
+        nlines=nlines,
+    )
+    exon_ids: Dict[tuple, int] = {
+        (exon.ensembl_transcript_id, exon.ensembl_id): exon.id
+        for exon in session.query(SQLExon)
+    }
+    version: int = get_intervals_version(db=session, build=Builds.build_38)
+
+    # GIVEN a new release of the exons file, with one exon removed, one changed and one added
+    lines: List[str] = list(resource_lines(EXONS_FILE_PATH))
+    removed_exon: List[str] = lines.pop(1).split("\t")
+    changed_exon: List[str] = lines[1].split("\t")
+    changed_exon[5] = str(int(changed_exon[5]) + 10)
+    lines[1] = "\t".join(changed_exon)
+    added_exon: List[str] = changed_exon.copy()
+    added_exon[3] = "ENSE00000000001"
+    lines.append("\t".join(added_exon))
+    new_release_path: PosixPath = tmp_path / "exons_38.tsv"
+    new_release_path.write_text("\n".join(lines))
+
+    # WHEN updating the exons in incremental mode
+    changes: Dict[str, int] = update_exons(
+        build=Builds.build_38,
+        session=session,
+        lines=resource_lines(str(new_release_path)),
+        nlines=len(lines),
+        incremental=True,
+    )
+
+    # THEN one exon should be inserted, one updated and one deleted
+    assert changes == {"inserted": 1, "updated": 1, "deleted": 1}
+    assert get_intervals_version(db=session, build=Builds.build_38) == version + 1
+
+    # AND the exons should be those of the new release
+    updated_exons: List[SQLExon] = session.query(SQLExon).all()
+    assert sorted(
+        (exon.ensembl_transcript_id, exon.ensembl_id, exon.start, exon.stop)
+        for exon in updated_exons
+    ) == sorted(
+        (items[2], items[3], int(items[4]), int(items[5]))
+        for items in (line.split("\t") for line in lines[1:])
+    )
+    assert (removed_exon[2], removed_exon[3]) not in {
+        (exon.ensembl_transcript_id, exon.ensembl_id) for exon in updated_exons
+    }
+
+    # AND exons that were not added should keep their ID
+    for exon in updated_exons:
+        if exon.ensembl_id != added_exon[3]:
+            assert exon.id == exon_ids[(exon.ensembl_transcript_id, exon.ensembl_id)]
+
+    # WHEN updating the exons again with the same file
+    changes: Dict[str, int] = update_exons(
+        build=Builds.build_38,
+        session=session,
+        lines=resource_lines(str(new_release_path)),
+        nlines=len(lines),
+        incremental=True,
+    )
+
+    # THEN nothing should change and cached reports should stay valid, with the same intervals version
+    assert changes == {"inserted": 0, "updated": 0, "deleted": 0}
+    assert get_intervals_version(db=session, build=Builds.build_38) == version + 1
+
+
+def test_update_genes_incremental(session: sessionmaker):
+    """Test updating genes in incremental mode, matching them by Ensembl ID."""
+
+    # GIVEN a database with the demo genes of build 38
+    nlines: int = sum(1 for _ in open(GENES_FILE_PATH))
+    update_genes(
+        build=Builds.build_38,
+        session=session,
+        lines=resource_lines(GENES_FILE_PATH),
+        nlines=nlines,
+    )
+
+    # WHEN updating the genes in incremental mode with the same file
+    changes: Dict[str, int] = update_genes(
+        build=Builds.build_38,
+        session=session,
+        lines=resource_lines(GENES_FILE_PATH),
+        nlines=nlines,
+        incremental=True,
+    )
+
+    # THEN no gene should change
+    assert changes == {"inserted": 0, "updated": 0, "deleted": 0}
+    assert session.query(SQLGene).count() == nlines - 1
+    assert session.query(SQLGeneEnsemblId).count() == nlines - 1
+
+
+def test_update_genes_twice_foreign_keys(foreign_keys_session: Session):
+    """Test reloading genes of a genome build in a database enforcing the foreign key of the gene Ensembl IDs."""
+
+    # GIVEN a database with the demo genes of build 38
+    nlines: int = sum(1 for _ in open(GENES_FILE_PATH))
+    update_genes(
+        build=Builds.build_38,
+        session=foreign_keys_session,
+        lines=resource_lines(GENES_FILE_PATH),
+        nlines=nlines,
+    )
+
+    # WHEN loading the genes again
+    update_genes(
+        build=Builds.build_38,
+        session=foreign_keys_session,
+        lines=resource_lines(GENES_FILE_PATH),
+        nlines=nlines,
+    )
+
+    # THEN genes and their Ensembl IDs should be replaced
+    assert foreign_keys_session.query(SQLGene).count() == nlines - 1
+    assert foreign_keys_session.query(SQLGeneEnsemblId).count() == nlines - 1
+
+
+def test_update_genes_incremental_foreign_keys(
+    foreign_keys_session: Session, tmp_path: PosixPath
+):
+    """Test deleting genes in incremental mode in a database enforcing the foreign key of the gene Ensembl IDs."""
+
+    # GIVEN a database with the demo genes of build 38
+    nlines: int = sum(1 for _ in open(GENES_FILE_PATH))
+    update_genes(
+        build=Builds.build_38,
+        session=foreign_keys_session,
+        lines=resource_lines(GENES_FILE_PATH),
+        nlines=nlines,
+    )
+
+    # GIVEN a new release of the genes file, with one gene removed
+    lines: List[str] = list(resource_lines(GENES_FILE_PATH))
+    removed_gene: List[str] = lines.pop(1).split("\t")
+    new_release_path: PosixPath = tmp_path / "genes_38.tsv"
+    new_release_path.write_text("\n".join(lines))
+
+    # WHEN updating the genes in incremental mode
+    changes: Dict[str, int] = update_genes(
+        build=Builds.build_38,
+        session=foreign_keys_session,
+        lines=resource_lines(str(new_release_path)),
+        nlines=len(lines),
+        incremental=True,
+    )
+
+    # THEN the gene should be deleted, together with its Ensembl ID
+    assert changes == {"inserted": 0, "updated": 0, "deleted": 1}
+    ensembl_ids: List[str] = [
+        gene_ensembl_id.ensembl_id
+        for gene_ensembl_id in foreign_keys_session.query(SQLGeneEnsemblId)
+    ]
+    assert len(ensembl_ids) == nlines - 2
+    assert removed_gene[3] not in ensembl_ids
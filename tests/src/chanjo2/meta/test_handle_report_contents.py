@@ -1,8 +1,13 @@
 from typing import List, Tuple
 
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+
+from chanjo2.crud.intervals import increment_intervals_version
+from chanjo2.dbutil import SessionLocal
 
 from chanjo2.demo import DEMO_COVERAGE_QUERY_FORM
+from chanjo2.meta import handle_report_contents
+from chanjo2.meta.handle_report_cache import REPORT_CACHE
 from chanjo2.meta.handle_report_contents import (
     get_missing_genes_from_db,
     get_report_data,
@@ -58,3 +63,89 @@ def test_get_report_data(demo_session: sessionmaker):
 
     for expected_key in REPORT_EXPECTED_EXTRA_KEYS:
         assert expected_key in report_data["extras"]
+
+
+def test_get_report_data_parallel_samples(demo_session: sessionmaker, monkeypatch):
+    """Test that samples computed in parallel are reported in the same order and with the same stats as when computed one by one."""
+
+    # GIVEN a user query containing several samples
+    query = ReportQuery.as_form(DEMO_COVERAGE_QUERY_FORM)
+    for sample_nr in range(3):
+        extra_sample = query.samples[0].model_copy()
+        extra_sample.name = f"extra_sample_{sample_nr}"
+        query.samples.append(extra_sample)
+    sample_names: List[str] = [sample.name for sample in query.samples]
+
+    # WHEN computing the report data one sample at a time and in parallel
+    monkeypatch.setattr(handle_report_contents, "REPORT_SAMPLES_WORKERS", 1)
+    serial_report_data: dict = get_report_data(query=query, session=demo_session)
+    REPORT_CACHE.clear()
+    monkeypatch.setattr(handle_report_contents, "REPORT_SAMPLES_WORKERS", 4)
+    parallel_report_data: dict = get_report_data(query=query, session=demo_session)
+
+    # THEN the samples should be reported in the order of the query
+    assert [row[0] for row in parallel_report_data["completeness_rows"]] == sample_names
+    assert [row.sample for row in parallel_report_data["sex_rows"]] == sample_names
+
+    # AND the report contents should be the same
+    for key in [
+        "completeness_rows",
+        "incomplete_coverage_rows",
+        "default_level_completeness_rows",
+        "sex_rows",
+    ]:
+        assert list(parallel_report_data[key]) == list(serial_report_data[key])
+
+
+def test_get_report_data_cached(demo_session: sessionmaker, mocker):
+    """Test that repeated reports are read from the report cache until the intervals of their build are reloaded by any app worker."""
+
+    # GIVEN a user query
+    query = ReportQuery.as_form(DEMO_COVERAGE_QUERY_FORM)
+    sample_data_spy = mocker.spy(handle_report_contents, "get_report_sample_data")
+
+    # WHEN the same report is requested twice
+    report_data: dict = get_report_data(query=query, session=demo_session)
+    nr_computed_samples: int = sample_data_spy.call_count
+
+    # THEN the second report should be read from the cache
+    assert get_report_data(query=query, session=demo_session) is report_data
+    assert sample_data_spy.call_count == nr_computed_samples
+
+    # WHEN the same query is used for a genes overview
+    get_report_data(query=query, session=demo_session, is_overview=True)
+
+    # THEN the overview should be computed
+    assert sample_data_spy.call_count == 2 * nr_computed_samples
+
+    # WHEN the intervals of the build are reloaded by another app worker, with a session of its own
+    other_session: Session = SessionLocal()
+    try:
+        increment_intervals_version(db=other_session, build=query.build)
+        other_session.commit()
+    finally:
+        other_session.close()
+
+    # THEN the report should be computed again
+    assert get_report_data(query=query, session=demo_session) is not report_data
+    assert sample_data_spy.call_count == 3 * nr_computed_samples
+
+
+def test_get_report_data_remote_coverage_files_not_cached(
+    demo_session: sessionmaker, mocker
+):
+    """Test that reports over remote coverage files are always computed, since their changes can't be detected."""
+
+    # GIVEN a user query whose coverage files are considered remote
+    query = ReportQuery.as_form(DEMO_COVERAGE_QUERY_FORM)
+    mocker.patch("chanjo2.meta.handle_report_cache.is_valid_url", return_value=True)
+    sample_data_spy = mocker.spy(handle_report_contents, "get_report_sample_data")
+
+    # WHEN the same report is requested twice
+    get_report_data(query=query, session=demo_session)
+    nr_computed_samples: int = sample_data_spy.call_count
+    get_report_data(query=query, session=demo_session)
+
+    # THEN it should be computed twice and not be cached
+    assert sample_data_spy.call_count == 2 * nr_computed_samples
+    assert len(REPORT_CACHE) == 0
@@ -0,0 +1,104 @@
+import json
+import os
+import socket
+import stat
+
+from chanjo2.meta import handle_report_jobs
+from chanjo2.meta.handle_report_jobs import (
+    INTERRUPTED_JOB_MSG,
+    ReportJobStore,
+    default_jobs_db_path,
+)
+from chanjo2.models.pydantic_models import ReportJob, ReportJobStatus, ReportJobType
+
+
+def test_report_job_store_result(tmp_path):
+    """Test saving a report job and its result to the job store."""
+
+    # GIVEN a job store containing a job
+    store = ReportJobStore(db_path=str(tmp_path / "jobs.sqlite"))
+    job: ReportJob = store.create(report_type=ReportJobType.REPORT, nr_samples=2)
+    assert job.status == ReportJobStatus.QUEUED
+
+    # WHEN the job is done
+    store.update(
+        job.job_id,
+        status=ReportJobStatus.DONE.value,
+        result=json.dumps({"levels": {"10": "completeness_10"}}),
+    )
+
+    # THEN a new store over the same file should return the job and its result
+    new_store = ReportJobStore(db_path=str(tmp_path / "jobs.sqlite"))
+    assert new_store.get(job.job_id).status == ReportJobStatus.DONE
+    assert new_store.get_result(job.job_id) == {"levels": {"10": "completeness_10"}}
+
+
+def test_report_job_store_private_file(tmp_path, monkeypatch):
+    """Test that the default job store is created in the cache folder of the user, readable and writable only by this user."""
+
+    # GIVEN the default path of the job store, in a cache folder that doesn't exist yet
+    monkeypatch.delenv("REPORT_JOBS_DB", raising=False)
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    db_path: str = default_jobs_db_path()
+    assert db_path == str(tmp_path / "cache" / "chanjo2" / "report_jobs.sqlite")
+
+    # WHEN creating the store
+    ReportJobStore(db_path=db_path)
+
+    # THEN its folder should be accessible only to the user, and its file readable and writable only by the user
+    assert stat.S_IMODE(os.stat(os.path.dirname(db_path)).st_mode) == 0o700
+    assert stat.S_IMODE(os.stat(db_path).st_mode) == 0o600
+
+
+def test_report_job_store_interrupted_job(tmp_path, monkeypatch):
+    """Test that unfinished jobs of app workers that are not running anymore are reported as failed."""
+
+    # GIVEN a running job created by a worker that has stopped
+    monkeypatch.setattr(
+        handle_report_jobs,
+        "get_worker_id",
+        lambda: f"{socket.gethostname()}:999999999",
+    )
+    store = ReportJobStore(db_path=str(tmp_path / "jobs.sqlite"))
+    job: ReportJob = store.create(report_type=ReportJobType.OVERVIEW, nr_samples=1)
+    store.update(job.job_id, status=ReportJobStatus.RUNNING.value)
+
+    # THEN the job should be reported as failed
+    interrupted_job: ReportJob = store.get(job.job_id)
+    assert interrupted_job.status == ReportJobStatus.FAILED
+    assert interrupted_job.error == INTERRUPTED_JOB_MSG
+
+
+def test_report_job_store_worker_pid_reused(tmp_path, monkeypatch):
+    """Test that unfinished jobs of a stopped app worker whose process ID was reused by another process are reported as failed."""
+
+    # GIVEN a running job created by a worker whose process ID is now used by a process started at another time
+    pid: int = os.getpid()
+    monkeypatch.setattr(
+        handle_report_jobs,
+        "get_worker_id",
+        lambda: f"{socket.gethostname()}:{pid}:1",
+    )
+    monkeypatch.setattr(
+        handle_report_jobs, "get_process_start_time", lambda process_id: "2"
+    )
+    store = ReportJobStore(db_path=str(tmp_path / "jobs.sqlite"))
+    job: ReportJob = store.create(report_type=ReportJobType.OVERVIEW, nr_samples=1)
+    store.update(job.job_id, status=ReportJobStatus.RUNNING.value)
+
+    # THEN the job should be reported as failed
+    interrupted_job: ReportJob = store.get(job.job_id)
+    assert interrupted_job.status == ReportJobStatus.FAILED
+    assert interrupted_job.error == INTERRUPTED_JOB_MSG
+
+
+def test_report_job_store_running_worker(tmp_path):
+    """Test that unfinished jobs of the running app worker are not reported as failed."""
+
+    # GIVEN a running job created by this worker
+    store = ReportJobStore(db_path=str(tmp_path / "jobs.sqlite"))
+    job: ReportJob = store.create(report_type=ReportJobType.OVERVIEW, nr_samples=1)
+    store.update(job.job_id, status=ReportJobStatus.RUNNING.value)
+
+    # THEN the job should still be running
+    assert store.get(job.job_id).status == ReportJobStatus.RUNNING
@@ -0,0 +1,116 @@
+from array import array
+from typing import Dict, List
+
+from chanjo2.meta.handle_bed import RegionSet
+from chanjo2.meta.handle_report_table import IncompleteCoverageRows, ReportIntervals
+from chanjo2.models import SQLTranscript
+
+GENE_IDS_MAPPING: Dict[str, dict] = {
+    "ENSG1": {"hgnc_id": 1, "hgnc_symbol": "GENE1"},
+    "ENSG2": {"hgnc_id": 2, "hgnc_symbol": "GENE2"},
+}
+
+
+def get_report_intervals() -> ReportIntervals:
+    """Return the report intervals of three transcripts of two genes."""
+    sql_intervals: List[SQLTranscript] = [
+        SQLTranscript(
+            ensembl_id=ensembl_id,
+            ensembl_gene_id=ensembl_gene_id,
+            chromosome="1",
+            start=start,
+            stop=start + 100,
+            refseq_mane_select=refseq_mane_select,
+        )
+        for ensembl_id, ensembl_gene_id, start, refseq_mane_select in [
+            ("ENST2", "ENSG2", 500, None),
+            ("ENST1", "ENSG1", 100, "NM_1"),
+            ("ENST3", "ENSG1", 100, None),
+        ]
+    ]
+    region_set = RegionSet(
+        interval_ids_coords=[
+            ("ENST1", ("1", 100, 200)),
+            ("ENST3", ("1", 100, 200)),
+            ("ENST2", ("1", 500, 600)),
+        ]
+    )
+    return ReportIntervals(
+        sql_intervals=sql_intervals,
+        gene_ids_mapping=GENE_IDS_MAPPING,
+        region_set=region_set,
+    )
+
+
+def test_report_intervals():
+    """Test that report intervals store each gene once and point to the rows of their stats in the region set."""
+
+    # GIVEN the report intervals of three transcripts of two genes
+    report_intervals: ReportIntervals = get_report_intervals()
+
+    # THEN intervals should be in the order of the SQL intervals
+    assert report_intervals.interval_ids == ["ENST2", "ENST1", "ENST3"]
+    assert list(report_intervals.region_rows) == [2, 0, 1]
+
+    # AND each gene should be stored once
+    assert report_intervals.gene_symbols == ["GENE2", "GENE1"]
+    assert list(report_intervals.interval_genes) == [0, 1, 1]
+
+
+def test_incomplete_coverage_rows():
+    """Test that incompletely covered intervals of several samples are stored as columns and returned as rows."""
+
+    # GIVEN report intervals and two samples with a few intervals not fully covered
+    report_intervals: ReportIntervals = get_report_intervals()
+    sample_1_rows = IncompleteCoverageRows(report_intervals=report_intervals)
+    sample_1_rows.add_sample(
+        sample_name="sample_1", default_completeness=array("d", [0.5, 1.0, 1.0])
+    )
+    sample_2_rows = IncompleteCoverageRows(report_intervals=report_intervals)
+    sample_2_rows.add_sample(
+        sample_name="sample_2", default_completeness=array("d", [0.25, 1.0, 0.75])
+    )
+
+    # THEN the genes of each sample with intervals not fully covered should be returned
+    assert sample_1_rows.sample_gene_symbols("sample_1") == ["GENE1"]
+    assert sample_2_rows.sample_gene_symbols("sample_2") == ["GENE1", "GENE2"]
+
+    # WHEN merging the rows of the two samples
+    report_rows = IncompleteCoverageRows(report_intervals=report_intervals)
+    report_rows += sample_1_rows
+    report_rows += sample_2_rows
+
+    # THEN rows should be returned in the order they were added
+    assert report_rows.to_list() == [
+        (
+            "GENE1",
+            1,
+            "ENST1",
+            {"mane_select": "NM_1", "mane_plus_clinical": None, "mrna": None},
+            "sample_1",
+            50.0,
+        ),
+        (
+            "GENE2",
+            2,
+            "ENST2",
+            {"mane_select": None, "mane_plus_clinical": None, "mrna": None},
+            "sample_2",
+            75.0,
+        ),
+        (
+            "GENE1",
+            1,
+            "ENST1",
+            {"mane_select": "NM_1", "mane_plus_clinical": None, "mrna": None},
+            "sample_2",
+            25.0,
+        ),
+    ]
+
+    # AND sorted rows should be sorted by gene, interval and sample
+    assert [(row[2], row[4]) for row in report_rows.sorted_rows()] == [
+        ("ENST1", "sample_1"),
+        ("ENST1", "sample_2"),
+        ("ENST2", "sample_2"),
+    ]
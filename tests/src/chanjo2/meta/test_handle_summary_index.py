@@ -0,0 +1,103 @@
+from typing import List
+
+from pytest_mock.plugin import MockerFixture
+from sqlalchemy.orm import sessionmaker
+
+from chanjo2.constants import BUILD_37, DEFAULT_COMPLETENESS_LEVELS
+from chanjo2.meta.handle_coverage_backend import get_coverage_backend
+from chanjo2.meta.handle_d4 import get_sql_intervals_region_set
+from chanjo2.meta.handle_interval_stats import get_intervals_stats
+from chanjo2.meta.handle_summary_index import (
+    SummaryIndex,
+    build_summary_index,
+    get_summary_index,
+)
+from chanjo2.models.pydantic_models import IntervalType
+from chanjo2.models.sql_models import Gene as SQLGene
+from chanjo2.resources import get_sex_chroms_interval_ids_coords
+
+
+def test_build_summary_index(
+    session: sessionmaker,
+    demo_sql_genes: List[SQLGene],
+    real_coverage_path: str,
+    tmp_path,
+    monkeypatch,
+):
+    """Test building the summary index of a d4 file over the intervals of a genome build."""
+
+    # GIVEN a database containing some genes
+    for gene in demo_sql_genes:
+        gene.build = BUILD_37
+    session.add_all(demo_sql_genes)
+    session.commit()
+
+    # WHEN building the summary index of a d4 file
+    monkeypatch.setenv("SUMMARY_INDEX_DIR", str(tmp_path))
+    index_path: str = build_summary_index(
+        db=session, build=BUILD_37, d4_file_path=real_coverage_path
+    )
+
+    # THEN the index should be saved to disk with the stats of every gene and sex chromosomes report region
+    summary_index = SummaryIndex.read(index_path)
+    sex_chroms_regions = set(
+        get_sex_chroms_interval_ids_coords(
+            build=BUILD_37, interval_type=IntervalType.TRANSCRIPTS.value
+        )
+    ) | set(
+        get_sex_chroms_interval_ids_coords(
+            build=BUILD_37, interval_type=IntervalType.EXONS.value
+        )
+    )
+    assert len(summary_index.interval_keys) == len(demo_sql_genes) + len(
+        sex_chroms_regions
+    )
+    assert list(summary_index.intervals_completeness) == DEFAULT_COMPLETENESS_LEVELS
+    assert summary_index.is_valid_for(real_coverage_path)
+
+
+def test_get_intervals_stats_from_summary_index(
+    session: sessionmaker,
+    demo_sql_genes: List[SQLGene],
+    real_coverage_path: str,
+    tmp_path,
+    monkeypatch,
+    mocker: MockerFixture,
+):
+    """Test that interval stats are read from the summary index of a d4 file when available."""
+
+    # GIVEN a d4 file with a summary index containing some genes
+    for gene in demo_sql_genes:
+        gene.build = BUILD_37
+    session.add_all(demo_sql_genes)
+    session.commit()
+    monkeypatch.setenv("SUMMARY_INDEX_DIR", str(tmp_path))
+    build_summary_index(db=session, build=BUILD_37, d4_file_path=real_coverage_path)
+    assert get_summary_index(real_coverage_path)
+    spy_intervals_stats = mocker.spy(get_coverage_backend(), "intervals_stats")
+
+    # WHEN computing stats over a subset of these genes
+    with get_sql_intervals_region_set(sql_intervals=demo_sql_genes[:2]) as region_set:
+        intervals_mean, intervals_completeness = get_intervals_stats(
+            d4_file_path=real_coverage_path,
+            thresholds=[20, 10],
+            region_set=region_set,
+            chrom_prefix="",
+        )
+
+    # THEN the d4 file should not be scanned
+    assert spy_intervals_stats.call_count == 0
+
+    # AND stats should be returned for the requested genes and thresholds
+    assert len(intervals_mean) == 2
+    assert list(intervals_completeness) == [20, 10]
+
+
+def test_get_summary_index_missing(real_coverage_path: str, tmp_path, monkeypatch):
+    """Test that no summary index is returned for a d4 file that was never indexed."""
+
+    # GIVEN a folder without summary indexes
+    monkeypatch.setenv("SUMMARY_INDEX_DIR", str(tmp_path))
+
+    # THEN no index should be returned for a d4 file
+    assert get_summary_index(real_coverage_path) is None
@@ -1,6 +1,16 @@
+import io
 from math import inf, nan
 
-from chanjo2.meta.utils import get_mean
+import pytest
+
+from chanjo2.meta import utils
+from chanjo2.meta.utils import (
+    get_mean,
+    parse_d4tools_stat_stream,
+    parse_d4tools_stat_table,
+)
+
+D4TOOLS_PERC_COV_OUTPUT = "1\t100\t200\t1.0\t0.5\n1\t300\t400\t0.75\t0.25\n"
 
 
 def test_get_mean_floats():
@@ -32,3 +42,47 @@ def test_get_mean_nan():
     # get_mean should return a number
     result = get_mean(float_list=value_list)
     assert isinstance(result, float)
+
+
+def test_parse_d4tools_stat_table():
+    """Test parsing the output of a d4tools stat command into typed columns."""
+
+    # GIVEN the output of a d4tools perc_cov command with 2 thresholds
+    # WHEN parsing it into columns
+    chroms, starts, stops, stats = parse_d4tools_stat_table(
+        stdout=D4TOOLS_PERC_COV_OUTPUT, nr_stats=2
+    )
+
+    # THEN the coordinates should be returned as typed columns
+    assert chroms == ["1", "1"]
+    assert list(starts) == [100, 300]
+    assert list(stops) == [200, 400]
+
+    # AND one column of floats should be returned for each threshold
+    assert [list(column) for column in stats] == [[1.0, 0.75], [0.5, 0.25]]
+
+
+def test_parse_d4tools_stat_table_wrong_nr_stats():
+    """Test parsing the output of a d4tools stat command with the wrong number of stats."""
+
+    # GIVEN the output of a d4tools perc_cov command with 2 thresholds
+    # THEN parsing it as if it had 3 thresholds should raise an error
+    with pytest.raises(ValueError):
+        parse_d4tools_stat_table(stdout=D4TOOLS_PERC_COV_OUTPUT, nr_stats=3)
+
+
+def test_parse_d4tools_stat_stream(monkeypatch):
+    """Test parsing the output of a d4tools stat command one chunk of lines at a time."""
+
+    # GIVEN a parser reading a few characters of d4tools output at a time
+    monkeypatch.setattr(utils, "D4TOOLS_OUTPUT_CHUNK_SIZE", 10)
+
+    # WHEN parsing the output of a d4tools perc_cov command with 2 thresholds
+    chroms, starts, stops, stats = parse_d4tools_stat_stream(
+        stream=io.StringIO(D4TOOLS_PERC_COV_OUTPUT), nr_stats=2, with_coords=True
+    )
+
+    # THEN it should return the same columns as when parsing the whole output at once
+    assert (chroms, starts, stops, stats) == parse_d4tools_stat_table(
+        stdout=D4TOOLS_PERC_COV_OUTPUT, nr_stats=2
+    )